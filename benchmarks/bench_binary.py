@@ -0,0 +1,69 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_binary import read_binary, write_binary
+from budget_engine import EXPENSE_TYPES, INCOME_TYPES
+from budget_io import read_ledger, write_ledger
+from budget_store import RecordStore
+
+# Размер файла и время загрузки: JSON (json.load и потоковый read_ledger) против двоичного формата.
+# Запуск: python benchmarks/bench_binary.py [количество записей]
+
+
+def make_store(n, categories, seed):
+    rnd = random.Random(seed)
+    start = 738000
+    return RecordStore((rnd.randint(100, 500000), rnd.choice(categories), start + i * 1000 // n)
+                       for i in range(n))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    incomes = make_store(n // 10, INCOME_TYPES, 1)
+    expenses = make_store(n - n // 10, EXPENSE_TYPES, 2)
+    limits = {"Кафе": 500000}
+    goals = {"Отпуск": {"target": 10000000, "deadline_str": "01.07.2030", "saved": 250000}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "ledger.json")
+        binary_path = os.path.join(tmp, "ledger.budget")
+        _, json_write = timed(lambda: write_ledger(json_path, incomes, expenses, limits, goals))
+        _, binary_write = timed(lambda: write_binary(binary_path, incomes, expenses, limits, goals))
+
+        def load_json():
+            with open(json_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        _, json_load = timed(load_json)
+        from_json, stream_load = timed(lambda: read_ledger(json_path))
+        from_binary, binary_load = timed(lambda: read_binary(binary_path))
+
+        for key in ("incomes", "expenses"):
+            assert list(from_json[key]) == list(from_binary[key]), f"{key}: данные не совпадают"
+        assert from_json["limits"] == from_binary["limits"]
+        assert from_json["savings_goals"] == from_binary["savings_goals"]
+
+        json_size = os.path.getsize(json_path)
+        binary_size = os.path.getsize(binary_path)
+
+    print(f"записей: {n}")
+    print(f"JSON:      {json_size / 2 ** 20:7.1f} МБ, запись {json_write:.3f} с, "
+          f"json.load {json_load:.3f} с, read_ledger {stream_load:.3f} с")
+    print(f"двоичный:  {binary_size / 2 ** 20:7.1f} МБ, запись {binary_write:.3f} с, read_binary {binary_load:.3f} с")
+    print(f"размер меньше в {json_size / binary_size:.1f} раза, загрузка быстрее json.load в {json_load / binary_load:.0f} раз")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_engine import EXPENSE_TYPES
+from budget_money import format_money, to_kopecks
+from budget_store import RecordStore, np
+
+# Скорость агрегатов и точность: прежние суммы float в рублях против целых копеек.
+# Запуск: python benchmarks/bench_money.py [количество записей]
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rnd = random.Random(1)
+    rubles = [round(rnd.uniform(1, 5000), 2) for _ in range(n)]
+    categories = [rnd.choice(EXPENSE_TYPES) for _ in range(n)]
+
+    store = RecordStore(zip(map(to_kopecks, rubles), categories))
+    # Прежнее представление: те же колонки, но суммы — float в рублях
+    float_store = RecordStore()
+    float_store.amounts = array("d", rubles)
+    float_store.codes = store.codes
+    float_store.days = store.days
+    float_store.category_names = store.category_names
+    float_store.category_index = store.category_index
+
+    float_total, float_sum = timed(lambda: sum(float_store.amounts))
+    exact_total, int_sum = timed(store.total)
+    _, float_cats = timed(lambda: float_store.category_sums())
+    _, int_cats = timed(store.category_sums)
+
+    print(f"записей: {n} ({'numpy' if np is not None else 'чистый Python'})")
+    print(f"итог:                float {float_sum * 1000:8.2f} мс, копейки {int_sum * 1000:8.2f} мс")
+    print(f"суммы по категориям: float {float_cats * 1000:8.2f} мс, копейки {int_cats * 1000:8.2f} мс")
+
+    # Точность: итог float против точного итога в копейках
+    print(f"итог в копейках:     {format_money(exact_total)} руб.")
+    print(f"итог float:          {float_total:.6f} руб. (отклонение {float_total - exact_total / 100:+.2e})")
+    tenths = sum(array("d", [0.1] * n))
+    print(f"{n} x 0.10 руб.: float {tenths:.6f}, копейки {format_money(sum([10] * n))}")
+
+
+if __name__ == "__main__":
+    main()
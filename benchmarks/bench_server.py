@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from make_ledger import write_ledger_file
+
+# Нагрузочный тест сервера бюджета (budget_server.py): сервер запускается отдельным процессом на свободном
+# порту, N клиентов с постоянными соединениями шлют смесь чтений и изменений, подписчики читают поток
+# событий. Итог — запросов в секунду, задержки по видам запросов и число доставленных событий (JSON).
+# Запуск: python benchmarks/bench_server.py [-n 100000] [--clients 16] [--duration 10] [--writes 0.1]
+
+RESULT_FORMAT = 1
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "budget_server.py")
+# Доли видов чтения: суммы, страница записей, отчёт (тяжёлое чтение в пуле потоков)
+READ_MIX = (("totals", 0.55), ("records", 0.40), ("report", 0.05))
+PAGE = 50
+
+
+class Client:
+    def __init__(self, host, port, client_id):
+        self.host, self.port = host, port
+        self.client_id = client_id
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=None):
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nX-Client: {self.client_id}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                          + data)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        payload = json.loads(await self.reader.readexactly(length))
+        return status, payload
+
+    def close(self):
+        self.writer.close()
+
+
+def pick_read(rnd):
+    x = rnd.random()
+    for name, share in READ_MIX:
+        if x < share:
+            return name
+        x -= share
+    return READ_MIX[-1][0]
+
+
+async def worker(client, rnd, deadline, writes, sizes, stats):
+    while time.perf_counter() < deadline:
+        if rnd.random() < writes:
+            name = "write"
+            path = "/records/expenses"
+            body = {"records": [[rnd.randint(100, 500000) / 100, "Кафе", "15.12.2025"]]}
+            method = "POST"
+        else:
+            name = pick_read(rnd)
+            method, body = "GET", None
+            if name == "totals":
+                path = "/totals"
+            elif name == "records":
+                path = f"/records/expenses?start={rnd.randrange(max(1, sizes['expenses']))}&count={PAGE}"
+            else:
+                path = "/report"
+        start = time.perf_counter()
+        status, _ = await client.request(method, path, body)
+        stats.setdefault(name, []).append(time.perf_counter() - start)
+        if status != 200:
+            stats.setdefault("errors", []).append(status)
+
+
+async def subscriber(host, port, counter, stop):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /events HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    try:
+        while not stop.is_set():
+            try:
+                line = await asyncio.wait_for(reader.readline(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            # Считаются только события изменений: их должно быть по одному на запись у каждого подписчика
+            if line.startswith(b"data: ") and json.loads(line[6:])["type"] == "change":
+                counter["events"] += 1
+    finally:
+        writer.close()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def run_load(host, port, args):
+    probe = Client(host, port, "bench")
+    await probe.connect()
+    _, state = await probe.request("GET", "/state")
+    probe.close()
+    sizes = state["counts"]
+
+    stop = asyncio.Event()
+    counter = {"events": 0}
+    subscribers = [asyncio.create_task(subscriber(host, port, counter, stop)) for _ in range(args.subscribers)]
+    clients = [Client(host, port, f"bench-{i}") for i in range(args.clients)]
+    for client in clients:
+        await client.connect()
+    stats = {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(worker(client, random.Random(args.seed + i), deadline, args.writes, sizes, stats)
+                           for i, client in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    # Событиям последних изменений даётся время дойти до подписчиков
+    await asyncio.sleep(0.5)
+    stop.set()
+    await asyncio.gather(*subscribers)
+    for client in clients:
+        client.close()
+
+    errors = stats.pop("errors", [])
+    total = sum(len(times) for times in stats.values())
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "errors": len(errors),
+        "events_delivered": counter["events"],
+        "events_expected": len(stats.get("write", [])) * args.subscribers,
+        "latency_ms": {name: {"count": len(times), "p50": round(percentile(times, 0.5) * 1000, 3),
+                              "p95": round(percentile(times, 0.95) * 1000, 3),
+                              "max": round(max(times) * 1000, 3)}
+                       for name, times in sorted(stats.items())},
+    }
+
+
+def start_server(ledger_path):
+    process = subprocess.Popen([sys.executable, SERVER, "--port", "0", "--file", ledger_path],
+                               stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError("Сервер не запустился")
+    address = line.strip().rsplit("//", 1)[1]
+    host, port = address.rsplit(":", 1)
+    return process, host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера бюджета")
+    parser.add_argument("-n", "--records", type=int, default=100_000, help="записей в исходных данных")
+    parser.add_argument("--clients", type=int, default=16, help="одновременных клиентов")
+    parser.add_argument("--subscribers", type=int, default=2, help="подписчиков на поток событий")
+    parser.add_argument("--duration", type=float, default=10, help="длительность, с")
+    parser.add_argument("--writes", type=float, default=0.1, help="доля изменений среди запросов")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="файл для результата JSON (по умолчанию стандартный вывод)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        ledger_path = os.path.join(data_dir, "ledger.budget")
+        write_ledger_file(ledger_path, args.records, seed=args.seed)
+        process, host, port = start_server(ledger_path)
+        try:
+            load = asyncio.run(run_load(host, port, args))
+        finally:
+            process.terminate()
+            process.wait()
+
+    result = {
+        "format": RESULT_FORMAT,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"records": args.records, "clients": args.clients, "subscribers": args.subscribers,
+                   "duration": args.duration, "writes": args.writes, "seed": args.seed},
+        **load,
+    }
+    print(f"{load['requests']} запросов за {load['seconds']} с: {load['rps']} в секунду, ошибок {load['errors']}, "
+          f"событий {load['events_delivered']} из {load['events_expected']}", file=sys.stderr)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if load["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
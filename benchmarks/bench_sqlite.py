@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_engine import BudgetEngine, EXPENSE_TYPES
+from budget_sqlite import SQLiteEngine
+
+# Сравнение хранилища в памяти и SQLite: загрузка, добавление записи, суммы по категориям, лимиты.
+# Запуск: python benchmarks/bench_sqlite.py [количество записей]
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(name, engine, data):
+    load = timed(lambda: engine.load_dict(data))
+    add = timed(lambda: engine.add("expenses", 1000, "Кафе"), repeat=200)
+    sums = timed(lambda: engine.category_totals("expenses"), repeat=10)
+    limits = timed(lambda: engine.check_all_limits(), repeat=10)
+    print(f"{name:8} загрузка {load:.3f} с, добавление {add * 1000:.3f} мс, "
+          f"суммы по категориям {sums * 1000:.2f} мс, проверка лимитов {limits * 1000:.2f} мс")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rnd = random.Random(1)
+    data = {
+        "incomes": [[round(rnd.uniform(1000, 90000), 2), "Зарплата"] for _ in range(n // 10)],
+        "expenses": [[round(rnd.uniform(1, 5000), 2), rnd.choice(EXPENSE_TYPES)] for _ in range(n)],
+        "limits": {cat: 1e9 for cat in EXPENSE_TYPES},
+        "savings_goals": {},
+    }
+    print(f"записей: {n + n // 10}")
+    run("память", BudgetEngine(), data)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = SQLiteEngine(os.path.join(tmp, "bench.db"))
+        try:
+            run("SQLite", engine, data)
+        finally:
+            engine.close()
+
+
+if __name__ == "__main__":
+    main()
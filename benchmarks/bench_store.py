@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_engine import EXPENSE_TYPES
+from budget_money import to_kopecks
+from budget_store import RecordStore
+
+# Сравнение памяти на запись и скорости агрегатов: список кортежей против RecordStore.
+# Запуск: python benchmarks/bench_store.py [количество записей]
+
+
+def make_rows(n, seed=1):
+    rnd = random.Random(seed)
+    return [(round(rnd.uniform(1, 5000), 2), rnd.choice(EXPENSE_TYPES)) for _ in range(n)]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def tuple_sums(rows):
+    sums = {}
+    for value, cat in rows:
+        sums[cat] = sums.get(cat, 0) + value
+    return sums
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rows = make_rows(n)
+    payload = [[v, c] for v, c in rows]
+    del rows
+
+    tuples, tuple_mem, tuple_build = measure(lambda: [(float(v), str(c)) for v, c in payload])
+    store, store_mem, store_build = measure(lambda: RecordStore((to_kopecks(v), str(c)) for v, c in payload))
+
+    start = time.perf_counter()
+    tuple_sums(tuples)
+    tuple_agg = time.perf_counter() - start
+    start = time.perf_counter()
+    store.category_sums()
+    store_agg = time.perf_counter() - start
+
+    print(f"записей: {n}")
+    print(f"список кортежей: {tuple_mem / n:.1f} байт/запись, построение {tuple_build:.3f} с, суммы {tuple_agg:.3f} с")
+    print(f"RecordStore:     {store_mem / n:.1f} байт/запись, построение {store_build:.3f} с, суммы {store_agg:.3f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_engine import BudgetEngine, year_period
+from budget_store import np
+from make_ledger import END_DAY, write_ledger_file
+
+# Набор бенчмарков без окна: импорт, суммы, лимиты, цели, отчёт и экспорт на синтетических файлах
+# (см. make_ledger.py). Для каждого этапа — лучшее время из нескольких повторов и пик памяти
+# отдельным прогоном под tracemalloc (чтобы трассировка не искажала время).
+# Результат — JSON; с --baseline сравнивается с прежним результатом, и при замедлении
+# больше порога команда завершается с кодом 1.
+# Запуск: python benchmarks/bench_suite.py [--sizes 10000,100000] [-o результат.json] [--baseline прежний.json]
+
+RESULT_FORMAT = 1
+DEFAULT_SIZES = "10000,100000"
+# Допустимое замедление относительно базового прогона (доля) и разница, меньше которой — шум, с
+DEFAULT_THRESHOLD = 0.25
+MIN_DELTA = 0.002
+
+
+def ledger_files(data_dir, n, args):
+    # Сгенерированные файлы переиспользуются между запусками с теми же параметрами
+    stem = f"ledger_{n}_s{args.skew:g}_l{args.limits:g}_g{args.goals}_{args.seed}"
+    paths = {}
+    for ext in (".json", ".budget"):
+        path = paths[ext] = os.path.join(data_dir, stem + ext)
+        if not os.path.exists(path):
+            write_ledger_file(path, n, args.skew, args.limits, args.goals, args.seed)
+    return paths
+
+
+def stages(paths, out_dir):
+    # [(этап, подготовка или None, замеряемая функция)]; этапы после импорта работают с загруженным движком
+    engine = BudgetEngine()
+    engine.import_file(paths[".budget"])
+    last_year = year_period(END_DAY)
+
+    def import_file(path):
+        def run():
+            fresh = BudgetEngine()
+            fresh.import_file(path)
+        return run
+
+    def goals():
+        engine.goal_progress()
+        engine.goal_plan()
+
+    return [
+        ("import_json", None, import_file(paths[".json"])),
+        ("import_binary", None, import_file(paths[".budget"])),
+        ("aggregate", None, engine.rebuild_totals),
+        ("aggregate_period", None, lambda: engine.records("expenses").category_sums(last_year)),
+        ("period_report", None, engine.period_report),
+        ("limits", None, lambda: (engine.check_all_limits(), engine.limit_warnings())),
+        ("goals", engine.clear_report_cache, goals),
+        ("calculate", engine.clear_report_cache, engine.format_report),
+        ("export_json", None, lambda: engine.export_file(os.path.join(out_dir, "export.json"))),
+        ("export_binary", None, lambda: engine.export_file(os.path.join(out_dir, "export.budget"))),
+    ]
+
+
+def measure(setup, fn, repeat, memory):
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {"seconds": round(best, 6)}
+    if memory:
+        tracemalloc.start()
+        if setup:
+            setup()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        result["peak_kib"] = round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def run_size(n, args, data_dir):
+    paths = ledger_files(data_dir, n, args)
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, setup, fn in stages(paths, out_dir):
+            results[name] = measure(setup, fn, args.repeat, not args.no_memory)
+            peak = f", пик {results[name]['peak_kib'] / 1024:8.1f} МиБ" if "peak_kib" in results[name] else ""
+            print(f"{n:>10} {name:<17} {results[name]['seconds'] * 1000:10.2f} мс{peak}", file=sys.stderr)
+    return results
+
+
+def compare(baseline, current, threshold):
+    # [(размер, этап, было с, стало с, регрессия ли)] для этапов, которые есть в обоих прогонах
+    rows = []
+    for size, stages_now in current["results"].items():
+        stages_before = baseline["results"].get(size, {})
+        for name, now in stages_now.items():
+            before = stages_before.get(name)
+            if before is None:
+                continue
+            old, new = before["seconds"], now["seconds"]
+            regressed = new > old * (1 + threshold) and new - old > MIN_DELTA
+            rows.append((size, name, old, new, regressed))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'Записей':>10} {'Этап':<17} {'Было, мс':>10} {'Стало, мс':>10} {'Изменение':>10}"]
+    for size, name, old, new, regressed in rows:
+        change = (new - old) * 100 / old if old else 0
+        mark = "  РЕГРЕССИЯ" if regressed else ""
+        lines.append(f"{size:>10} {name:<17} {old * 1000:10.2f} {new * 1000:10.2f} {change:+9.1f}%{mark}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки операций бюджета на синтетических данных")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"размеры через запятую (по умолчанию {DEFAULT_SIZES})")
+    parser.add_argument("--skew", type=float, default=1.0, help="неравномерность категорий (см. make_ledger.py)")
+    parser.add_argument("--limits", type=float, default=0.5, help="доля категорий расходов с лимитом")
+    parser.add_argument("--goals", type=int, default=5, help="число целей накопления")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="повторов каждого этапа (берётся лучшее время)")
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пик памяти")
+    parser.add_argument("--data-dir", help="каталог для сгенерированных файлов (по умолчанию временный)")
+    parser.add_argument("-o", "--output", help="файл для результата JSON (по умолчанию стандартный вывод)")
+    parser.add_argument("--baseline", help="прежний результат JSON для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"допустимое замедление, доля (по умолчанию {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    result = {
+        "format": RESULT_FORMAT,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": np is not None,
+        "params": {"skew": args.skew, "limits": args.limits, "goals": args.goals, "seed": args.seed,
+                   "repeat": args.repeat},
+        "results": {},
+    }
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        for n in sizes:
+            result["results"][str(n)] = run_size(n, args, args.data_dir)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for n in sizes:
+                result["results"][str(n)] = run_size(n, args, data_dir)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != result["params"]:
+            print("Внимание: параметры данных отличаются от базового прогона", file=sys.stderr)
+        rows = compare(baseline, result, args.threshold)
+        print(format_comparison(rows), file=sys.stderr)
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
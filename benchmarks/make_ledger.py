@@ -0,0 +1,87 @@
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import date
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_binary import save_ledger
+from budget_engine import EXPENSE_TYPES, INCOME_TYPES
+from budget_io import format_day
+from budget_store import RecordStore
+
+# Синтетический файл экспорта для бенчмарков: записи по датам за несколько лет, неравномерные категории,
+# лимиты и цели. При одинаковых параметрах и seed файл получается одинаковым байт в байт
+# (используется только модуль random, без numpy).
+# Запуск: python benchmarks/make_ledger.py ФАЙЛ [-n записей] [--skew 1.0] [--limits 0.5] [--goals 5]
+
+# Последний день данных фиксирован, чтобы файл не зависел от даты запуска
+END_DAY = date(2025, 12, 31).toordinal()
+YEARS = 5
+# Доля доходов среди записей
+INCOME_SHARE = 10
+
+
+def category_weights(categories, skew):
+    # Закон Ципфа: вес k-й категории 1 / k**skew; skew = 0 — равномерно
+    return list(accumulate(1 / (k ** skew) for k in range(1, len(categories) + 1)))
+
+
+def make_store(n, categories, skew, median, rnd):
+    # Суммы — логнормальные вокруг median рублей, даты — равномерно по порядку за YEARS лет
+    start = END_DAY - 365 * YEARS
+    span = END_DAY - start
+    cum_weights = category_weights(categories, skew)
+    chosen = rnd.choices(categories, cum_weights=cum_weights, k=n)
+    mu = math.log(median)
+    return RecordStore((max(1, int(rnd.lognormvariate(mu, 1.0) * 100)), category, start + i * span // max(1, n))
+                       for i, category in enumerate(chosen))
+
+
+def make_limits(expenses, share, rnd):
+    # Лимиты для доли share категорий: от 60% до 140% фактических трат, чтобы были и «почти», и «переполнение»
+    totals, _ = expenses.category_sums()
+    categories = sorted(totals)
+    picked = rnd.sample(categories, round(len(categories) * share))
+    return {cat: max(1, int(totals[cat] * rnd.uniform(0.6, 1.4))) for cat in sorted(picked)}
+
+
+def make_goals(count, rnd):
+    goals = {}
+    for i in range(count):
+        target = rnd.randint(10_000, 2_000_000) * 100
+        deadline = format_day(END_DAY + rnd.randint(-30, 3 * 365)) if i % 4 != 3 else ""
+        goals[f"Цель {i + 1}"] = {"target": target, "deadline_str": deadline, "saved": rnd.randint(0, target)}
+    return goals
+
+
+def make_ledger(n, skew=1.0, limit_share=0.5, goals=5, seed=1):
+    rnd = random.Random(seed)
+    incomes = make_store(n // INCOME_SHARE, INCOME_TYPES, skew, 40000, rnd)
+    expenses = make_store(n - n // INCOME_SHARE, EXPENSE_TYPES, skew, 1500, rnd)
+    return incomes, expenses, make_limits(expenses, limit_share, rnd), make_goals(goals, rnd)
+
+
+def write_ledger_file(file_path, n, skew=1.0, limit_share=0.5, goals=5, seed=1):
+    # Формат по расширению, как при экспорте: *.budget — двоичный, иначе JSON
+    save_ledger(file_path, *make_ledger(n, skew, limit_share, goals, seed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетического файла экспорта для бенчмарков")
+    parser.add_argument("path", help="файл результата (JSON или *.budget)")
+    parser.add_argument("-n", "--records", type=int, default=100_000, help="число записей (доходы и расходы)")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="неравномерность категорий (показатель закона Ципфа, 0 — равномерно)")
+    parser.add_argument("--limits", type=float, default=0.5, help="доля категорий расходов с лимитом (0..1)")
+    parser.add_argument("--goals", type=int, default=5, help="число целей накопления")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    write_ledger_file(args.path, args.records, args.skew, args.limits, args.goals, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,47 @@
+import argparse
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog, simpledialog
-import json
+from bisect import bisect_left
 from datetime import datetime
 
+from budget_engine import (BudgetEngine, LIMIT_OVER, limit_warning_text, month_period, period_label,
+                           quarter_period, today, year_period)
+from budget_binary import BINARY_EXT, load_ledger
+from budget_csv import add_records, make_mapping, parse_csv
+from budget_goals import format_scenarios, scenario_incomes
+from budget_history import DEFAULT_LIMIT_MB, History
+from budget_io import OperationCancelled, format_day, parse_amounts, parse_day
+from budget_journal import open_ledger
+from budget_money import format_money, parse_money
+from budget_profile import (APP_OPERATIONS, ENGINE_OPERATIONS, LIST_OPERATIONS, PROFILE_MODES, Profiler,
+                            mode_from_env)
+from budget_remote import RemoteEngine
+from budget_sqlite import SQLiteEngine
+from budget_store import NO_DATE
+from budget_widgets import VirtualList
+
+# Период опроса очереди фоновой операции, мс (примерно один кадр)
+JOB_POLL_MS = 15
+# Как часто окно-клиент сервера применяет изменения других клиентов, мс
+REMOTE_POLL_MS = 500
+
+PERIOD_ALL = "Всё время"
+PERIOD_CUSTOM = "Другой период..."
+PERIODS = {
+    PERIOD_ALL: lambda: None,
+    "Этот месяц": lambda: month_period(today()),
+    "Прошлый месяц": lambda: month_period(month_period(today())[0] - 1),
+    "Этот квартал": lambda: quarter_period(today()),
+    "Этот год": lambda: year_period(today()),
+}
+PERIOD_CHOICES = list(PERIODS) + [PERIOD_CUSTOM]
+
+LEDGER_FILETYPES = [("JSON", "*.json"), ("Двоичный формат", "*" + BINARY_EXT)]
+
 class EditDialog(tk.Toplevel):
-    def __init__(self, master, value, category, categories, callback):
+    def __init__(self, master, value, category, categories, callback, day=NO_DATE):
         super().__init__(master)
         self.title("Редактировать запись")
         self.resizable(False, False)
@@ -13,14 +50,19 @@ class EditDialog(tk.Toplevel):
         tk.Label(self, text="Сумма:").grid(row=0, column=0, padx=8, pady=8, sticky="w")
         self.value_entry = tk.Entry(self)
         self.value_entry.grid(row=0, column=1, padx=8, pady=8)
-        self.value_entry.insert(0, str(value))
+        self.value_entry.insert(0, format_money(value))
 
         tk.Label(self, text="Категория:").grid(row=1, column=0, padx=8, pady=8, sticky="w")
         self.category_var = tk.StringVar(value=category)
         self.category_menu = ttk.Combobox(self, textvariable=self.category_var, values=categories, state="readonly")
         self.category_menu.grid(row=1, column=1, padx=8, pady=8)
 
-        tk.Button(self, text="Сохранить", command=self.save).grid(row=2, column=0, columnspan=2, pady=12, sticky="ew")
+        tk.Label(self, text="Дата (ДД.ММ.ГГГГ):").grid(row=2, column=0, padx=8, pady=8, sticky="w")
+        self.date_entry = tk.Entry(self)
+        self.date_entry.grid(row=2, column=1, padx=8, pady=8)
+        self.date_entry.insert(0, format_day(day))
+
+        tk.Button(self, text="Сохранить", command=self.save).grid(row=3, column=0, columnspan=2, pady=12, sticky="ew")
 
         self.value_entry.focus()
         self.grab_set()
@@ -28,14 +70,107 @@ class EditDialog(tk.Toplevel):
 
     def save(self):
         try:
-            value = float(self.value_entry.get())
+            value = parse_money(self.value_entry.get())
             if value < 0:
                 raise ValueError
         except ValueError:
             messagebox.showerror("Ошибка", "Введите корректную сумму!")
             return
+        date_str = self.date_entry.get().strip()
+        try:
+            day = parse_day(date_str) if date_str else NO_DATE
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректную дату в формате ДД.ММ.ГГГГ!")
+            return
         category = self.category_var.get()
-        self.callback(value, category)
+        self.callback(value, category, day)
+        self.destroy()
+
+class CategoryDialog(tk.Toplevel):
+    def __init__(self, master, count, category, categories, callback):
+        super().__init__(master)
+        self.title("Сменить категорию")
+        self.resizable(False, False)
+        self.callback = callback
+
+        tk.Label(self, text=f"Новая категория для записей ({count}):").grid(row=0, column=0, padx=8, pady=8, sticky="w")
+        self.category_var = tk.StringVar(value=category)
+        self.category_menu = ttk.Combobox(self, textvariable=self.category_var, values=categories, state="readonly")
+        self.category_menu.grid(row=0, column=1, padx=8, pady=8)
+
+        tk.Button(self, text="Сохранить", command=self.save).grid(row=1, column=0, columnspan=2, pady=12, sticky="ew")
+
+        self.category_menu.focus()
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+    def save(self):
+        self.callback(self.category_var.get())
+        self.destroy()
+
+class FilterDialog(tk.Toplevel):
+    # Фильтр списков: категории (ничего не выбрано — все), суммы от и до, подстрока в названии категории
+    def __init__(self, master, categories, current, callback):
+        super().__init__(master)
+        self.title("Фильтр записей")
+        self.resizable(False, False)
+        self.callback = callback
+        self.categories = categories
+        current = current or {}
+
+        tk.Label(self, text="Категории:").grid(row=0, column=0, padx=8, pady=8, sticky="nw")
+        self.category_list = tk.Listbox(self, selectmode=tk.MULTIPLE, exportselection=False,
+                                        height=min(10, len(categories)))
+        self.category_list.grid(row=0, column=1, padx=8, pady=8, sticky="ew")
+        for i, cat in enumerate(categories):
+            self.category_list.insert(tk.END, cat)
+            if cat in (current.get("categories") or ()):
+                self.category_list.selection_set(i)
+
+        low, high = current.get("amount_range") or (None, None)
+        tk.Label(self, text="Сумма от:").grid(row=1, column=0, padx=8, pady=5, sticky="w")
+        self.low_entry = tk.Entry(self)
+        self.low_entry.grid(row=1, column=1, padx=8, pady=5)
+        self.low_entry.insert(0, "" if low is None else format_money(low))
+        tk.Label(self, text="Сумма до:").grid(row=2, column=0, padx=8, pady=5, sticky="w")
+        self.high_entry = tk.Entry(self)
+        self.high_entry.grid(row=2, column=1, padx=8, pady=5)
+        self.high_entry.insert(0, "" if high is None else format_money(high))
+        tk.Label(self, text="Категория содержит:").grid(row=3, column=0, padx=8, pady=5, sticky="w")
+        self.text_entry = tk.Entry(self)
+        self.text_entry.grid(row=3, column=1, padx=8, pady=5)
+        self.text_entry.insert(0, current.get("text", ""))
+
+        tk.Button(self, text="Применить", command=self.save).grid(row=4, column=0, padx=8, pady=12, sticky="ew")
+        tk.Button(self, text="Сбросить фильтр", command=self.reset).grid(row=4, column=1, padx=8, pady=12, sticky="ew")
+
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+    def save(self):
+        bounds = []
+        for entry in (self.low_entry, self.high_entry):
+            text = entry.get().strip()
+            try:
+                bounds.append(parse_money(text) if text else None)
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректную сумму!")
+                return
+        if None not in bounds and bounds[0] > bounds[1]:
+            messagebox.showerror("Ошибка", "Сумма «от» больше суммы «до»!")
+            return
+        selected = [self.categories[i] for i in self.category_list.curselection()]
+        text = self.text_entry.get().strip()
+        if not selected and bounds == [None, None] and not text:
+            self.reset()
+            return
+        self.callback({"categories": selected or None,
+                       "amount_range": None if bounds == [None, None] else tuple(bounds),
+                       "text": text})
+        self.destroy()
+
+    def reset(self):
+        self.callback(None)
         self.destroy()
 
 class LimitDialog(tk.Toplevel):
@@ -49,7 +184,7 @@ class LimitDialog(tk.Toplevel):
         row = 0
         for cat in expense_types:
             tk.Label(self, text=cat).grid(row=row, column=0, padx=8, pady=5, sticky="w")
-            var = tk.StringVar(value=str(limits.get(cat, "")))
+            var = tk.StringVar(value=format_money(limits[cat]) if cat in limits else "")
             entry = tk.Entry(self, textvariable=var, width=12)
             entry.grid(row=row, column=1, padx=8, pady=5)
             self.entries[cat] = entry
@@ -65,7 +200,7 @@ class LimitDialog(tk.Toplevel):
             val = entry.get().strip()
             if val:
                 try:
-                    lim = float(val)
+                    lim = parse_money(val)
                     if lim < 0:
                         raise ValueError
                     new_limits[cat] = lim
@@ -76,12 +211,14 @@ class LimitDialog(tk.Toplevel):
         self.destroy()
 
 class SavingsGoalDialog(tk.Toplevel):
-    def __init__(self, master, goals, callback):
+    def __init__(self, master, goals, callback, engine=None):
         super().__init__(master)
         self.title("Копилки и цели накопления")
         self.resizable(False, False)
         self.callback = callback
-        self.goals = goals.copy()  # словарь: {название: {target, deadline_str, saved}}
+        self.engine = engine
+        # Словарь {название: {target, deadline_str, saved}} с копиями целей: правки в окне не меняют данные движка
+        self.goals = {name: dict(info) for name, info in goals.items()}
 
         self.tree = ttk.Treeview(self, columns=("target", "deadline", "saved"), show="headings", height=8)
         self.tree.heading("target", text="Цель (руб.)")
@@ -89,6 +226,12 @@ class SavingsGoalDialog(tk.Toplevel):
         self.tree.heading("saved", text="Накоплено (руб.)")
         self.tree.grid(row=0, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
 
+        # План пересчитывается после каждого изменения целей в окне
+        self.plan_label = tk.Label(self, text="", justify=tk.LEFT, anchor="w")
+        self.plan_label.grid(row=2, column=0, columnspan=4, padx=5, pady=5, sticky="ew")
+        if engine is not None:
+            tk.Button(self, text="Сценарии дохода", command=self.show_scenarios).grid(row=3, column=0, columnspan=4, padx=5, pady=5, sticky="ew")
+
         self.update_tree()
 
         tk.Button(self, text="Добавить цель", command=self.add_goal).grid(row=1, column=0, padx=5, pady=5, sticky="ew")
@@ -103,13 +246,20 @@ class SavingsGoalDialog(tk.Toplevel):
         self.tree.delete(*self.tree.get_children())
         for name, info in self.goals.items():
             self.tree.insert("", tk.END, iid=name, values=(
-                f"{info['target']:.2f}",
+                format_money(info['target']),
                 info['deadline_str'],
-                f"{info['saved']:.2f}"
+                format_money(info['saved'])
             ))
+        if self.engine is not None:
+            self.plan_label.config(text=self.engine.format_goal_plan(self.engine.goal_plan(self.goals)))
+
+    def show_scenarios(self):
+        plan = self.engine.goal_plan(self.goals)
+        rows = self.engine.goal_scenarios(scenario_incomes(plan), self.goals)
+        TextReport(self, "Сценарии дохода", format_scenarios(rows))
 
     def add_goal(self):
-        dlg = GoalEditDialog(self, "", 0.0, "", 0.0)
+        dlg = GoalEditDialog(self, "", 0, "", 0)
         self.wait_window(dlg)
         if dlg.result:
             name, target, deadline_str, saved = dlg.result
@@ -165,7 +315,7 @@ class GoalEditDialog(tk.Toplevel):
         tk.Label(self, text="Сумма для накопления (руб.):").grid(row=1, column=0, padx=8, pady=8, sticky="w")
         self.target_entry = tk.Entry(self)
         self.target_entry.grid(row=1, column=1, padx=8, pady=8)
-        self.target_entry.insert(0, f"{target:.2f}" if target else "")
+        self.target_entry.insert(0, format_money(target) if target else "")
 
         tk.Label(self, text="Крайний срок (ДД.ММ.ГГГГ):").grid(row=2, column=0, padx=8, pady=8, sticky="w")
         self.deadline_entry = tk.Entry(self)
@@ -175,7 +325,7 @@ class GoalEditDialog(tk.Toplevel):
         tk.Label(self, text="Накоплено (руб.):").grid(row=3, column=0, padx=8, pady=8, sticky="w")
         self.saved_entry = tk.Entry(self)
         self.saved_entry.grid(row=3, column=1, padx=8, pady=8)
-        self.saved_entry.insert(0, f"{saved:.2f}" if saved else "0.00")
+        self.saved_entry.insert(0, format_money(saved))
 
         tk.Button(self, text="Сохранить", command=self.save).grid(row=4, column=0, columnspan=2, pady=12, sticky="ew")
 
@@ -189,7 +339,7 @@ class GoalEditDialog(tk.Toplevel):
             messagebox.showerror("Ошибка", "Введите название цели!")
             return
         try:
-            target = float(self.target_entry.get())
+            target = parse_money(self.target_entry.get())
             if target <= 0:
                 raise ValueError
         except ValueError:
@@ -202,7 +352,7 @@ class GoalEditDialog(tk.Toplevel):
             messagebox.showerror("Ошибка", "Введите корректную дату в формате ДД.ММ.ГГГГ!")
             return
         try:
-            saved = float(self.saved_entry.get())
+            saved = parse_money(self.saved_entry.get())
             if saved < 0:
                 raise ValueError
         except ValueError:
@@ -214,20 +364,96 @@ class GoalEditDialog(tk.Toplevel):
         self.result = (name, target, deadline_str, saved)
         self.destroy()
 
+class TextReport(tk.Toplevel):
+    def __init__(self, master, title, text):
+        super().__init__(master)
+        self.title(title)
+        widget = tk.Text(self, width=60, height=20, font="TkFixedFont")
+        widget.insert("1.0", text)
+        widget.config(state=tk.DISABLED)
+        widget.grid(row=0, column=0, padx=8, pady=8, sticky="nsew")
+        tk.Button(self, text="Закрыть", command=self.destroy).grid(row=1, column=0, pady=(0, 8))
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+class DiagnosticsPanel(tk.Toplevel):
+    COLUMNS = (("calls", "Вызовы"), ("total", "Всего, мс"), ("mean", "Среднее, мс"), ("max", "Максимум, мс"),
+               ("allocated", "Память, КиБ"))
+
+    def __init__(self, master, profiler, engine):
+        super().__init__(master)
+        self.title(f"Диагностика ({profiler.mode})")
+        self.profiler = profiler
+        self.engine = engine
+
+        self.tree = ttk.Treeview(self, columns=[key for key, _ in self.COLUMNS], height=15)
+        self.tree.heading("#0", text="Операция")
+        self.tree.column("#0", width=240)
+        for key, title in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=100, anchor="e")
+        self.tree.grid(row=0, column=0, columnspan=3, padx=5, pady=5, sticky="nsew")
+
+        tk.Button(self, text="Обновить", command=self.update_tree).grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+        tk.Button(self, text="Сбросить", command=self.reset).grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        tk.Button(self, text="Сохранить...", command=self.save).grid(row=1, column=2, padx=5, pady=5, sticky="ew")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_columnconfigure(2, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.update_tree()
+
+    def update_tree(self):
+        self.tree.delete(*self.tree.get_children())
+        for name, calls, total, mean, longest, allocated in self.profiler.rows():
+            memory = f"{allocated:.1f}" if self.profiler.track_memory else "-"
+            self.tree.insert("", tk.END, text=name,
+                             values=(calls, f"{total:.2f}", f"{mean:.3f}", f"{longest:.3f}", memory))
+
+    def reset(self):
+        self.profiler.reset()
+        self.update_tree()
+
+    def save(self):
+        file_path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                                 title="Сохранить профиль")
+        if not file_path:
+            return
+        try:
+            self.profiler.dump(file_path, ledger_sizes(self.engine))
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить профиль: {e}", parent=self)
+
+def ledger_sizes(engine):
+    # Размер данных в профиле: без него времена разных запусков не сравнить
+    return {"incomes": len(engine.incomes), "expenses": len(engine.expenses)}
+
 class BudgetApp:
-    def __init__(self, root):
+    def __init__(self, root, engine=None, profiler=None, undo_mb=DEFAULT_LIMIT_MB):
         self.root = root
         root.title("Калькулятор бюджета")
 
-        self.incomes = []
-        self.expenses = []
-
-        self.income_types = ["Зарплата", "Подарки", "Дополнительный доход", "Другое"]
-        self.expense_types = ["Транспорт", "Супермаркет", "Развлечения", "Кафе", "Коммуналка", "Другое"]
-        self.limits = {}
-
-        # Копилки и цели накопления — словарь {название: {target, deadline_str, saved}}
-        self.savings_goals = {}
+        # Методы подменяются до создания кнопок: command хранит уже обёрнутый метод
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.instrument(self, APP_OPERATIONS)
+
+        self.engine = engine or BudgetEngine()
+        if profiler is not None:
+            profiler.instrument(self.engine, ENGINE_OPERATIONS, "engine.")
+        # История отмены (undo_mb — её предел в МБ, 0 — без неё). У клиента сервера истории нет:
+        # данные меняют и другие клиенты, и отмена по позициям записей задела бы их изменения
+        self.history = None
+        if undo_mb > 0 and not isinstance(self.engine, RemoteEngine):
+            self.history = History(self.engine, undo_mb << 20)
+        self.income_types = self.engine.income_types
+        self.expense_types = self.engine.expense_types
+
+        # Фильтр списков (параметры engine.find) и позиции подходящих записей по видам, пока данные не менялись
+        self.filter = None
+        self.views = {}
+        self.engine.add_listener(self.on_engine_change)
 
         tk.Label(root, text="Доходы").grid(row=0, column=0, padx=8, pady=5, sticky="w")
         self.income_entry = tk.Entry(root)
@@ -235,12 +461,14 @@ class BudgetApp:
         self.income_type_var = tk.StringVar(value=self.income_types[0])
         self.income_type_menu = ttk.Combobox(root, textvariable=self.income_type_var, values=self.income_types, state="readonly", width=20)
         self.income_type_menu.grid(row=0, column=2)
-        tk.Button(root, text="Добавить", command=self.add_income).grid(row=0, column=3, padx=3)
+        self.income_date_entry = self.make_date_entry(row=0)
+        tk.Button(root, text="Добавить", command=self.add_income).grid(row=0, column=4, padx=3)
 
-        self.income_listbox = tk.Listbox(root, width=45)
-        self.income_listbox.grid(row=1, column=0, columnspan=4, padx=10, pady=2, sticky="ew")
+        self.income_listbox = self.make_list("incomes")
+        self.income_listbox.grid(row=1, column=0, columnspan=5, padx=10, pady=2, sticky="ew")
         tk.Button(root, text="Редактировать доход", command=self.edit_income).grid(row=2, column=0, columnspan=2, padx=10, pady=4, sticky="ew")
-        tk.Button(root, text="Удалить доход", command=self.delete_income).grid(row=2, column=2, columnspan=2, padx=10, pady=4, sticky="ew")
+        tk.Button(root, text="Сменить категорию", command=self.recategorize_incomes).grid(row=2, column=2, padx=10, pady=4, sticky="ew")
+        tk.Button(root, text="Удалить доход", command=self.delete_income).grid(row=2, column=3, columnspan=2, padx=10, pady=4, sticky="ew")
 
         tk.Label(root, text="Расходы").grid(row=3, column=0, padx=8, pady=5, sticky="w")
         self.expense_entry = tk.Entry(root)
@@ -248,16 +476,23 @@ class BudgetApp:
         self.expense_type_var = tk.StringVar(value=self.expense_types[0])
         self.expense_type_menu = ttk.Combobox(root, textvariable=self.expense_type_var, values=self.expense_types, state="readonly", width=20)
         self.expense_type_menu.grid(row=3, column=2)
-        tk.Button(root, text="Добавить", command=self.add_expense).grid(row=3, column=3, padx=3)
+        self.expense_date_entry = self.make_date_entry(row=3)
+        tk.Button(root, text="Добавить", command=self.add_expense).grid(row=3, column=4, padx=3)
 
-        self.expense_listbox = tk.Listbox(root, width=45)
-        self.expense_listbox.grid(row=4, column=0, columnspan=4, padx=10, pady=2, sticky="ew")
+        self.expense_listbox = self.make_list("expenses")
+        self.expense_listbox.grid(row=4, column=0, columnspan=5, padx=10, pady=2, sticky="ew")
         tk.Button(root, text="Редактировать расход", command=self.edit_expense).grid(row=5, column=0, columnspan=2, padx=10, pady=4, sticky="ew")
-        tk.Button(root, text="Удалить расход", command=self.delete_expense).grid(row=5, column=2, columnspan=2, padx=10, pady=4, sticky="ew")
-
-        tk.Button(root, text="Рассчитать", command=self.calculate).grid(row=6, column=0, columnspan=4, pady=8, sticky="ew")
+        tk.Button(root, text="Сменить категорию", command=self.recategorize_expenses).grid(row=5, column=2, padx=10, pady=4, sticky="ew")
+        tk.Button(root, text="Удалить расход", command=self.delete_expense).grid(row=5, column=3, columnspan=2, padx=10, pady=4, sticky="ew")
+
+        tk.Label(root, text="Период:").grid(row=6, column=0, padx=8, pady=8, sticky="w")
+        self.period_var = tk.StringVar(value=PERIOD_ALL)
+        self.period_menu = ttk.Combobox(root, textvariable=self.period_var, values=PERIOD_CHOICES, state="readonly", width=20)
+        self.period_menu.grid(row=6, column=1, padx=8, pady=8, sticky="ew")
+        self.period_menu.bind("<<ComboboxSelected>>", self.select_period)
+        tk.Button(root, text="Рассчитать", command=self.calculate).grid(row=6, column=2, columnspan=3, padx=10, pady=8, sticky="ew")
         self.result_label = tk.Label(root, text="")
-        self.result_label.grid(row=7, column=0, columnspan=4, pady=3)
+        self.result_label.grid(row=7, column=0, columnspan=5, pady=3)
 
         self.export_btn = tk.Button(root, text="Экспорт", command=self.export_data)
         self.import_btn = tk.Button(root, text="Импорт", command=self.import_data)
@@ -270,291 +505,594 @@ class BudgetApp:
         self.savings_btn = tk.Button(root, text="Копилки и цели", command=self.set_savings_goals)
         self.savings_btn.grid(row=8, column=3, padx=10, pady=15, sticky="ew")
 
+        self.period_report_btn = tk.Button(root, text="Отчёт по месяцам", command=self.show_period_report)
+        self.period_report_btn.grid(row=8, column=4, padx=10, pady=15, sticky="ew")
+
+        self.csv_btn = tk.Button(root, text="Импорт выписки CSV", command=self.import_csv)
+        self.csv_btn.grid(row=9, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="ew")
+        self.filter_btn = tk.Button(root, text="Фильтр записей...", command=self.show_filter)
+        self.filter_btn.grid(row=9, column=3, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+
+        if self.history is not None:
+            self.undo_btn = tk.Button(root, text="Отменить (Ctrl+Z)", command=self.undo)
+            self.undo_btn.grid(row=10, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+            self.redo_btn = tk.Button(root, text="Повторить (Ctrl+Y)", command=self.redo)
+            self.redo_btn.grid(row=10, column=2, columnspan=3, padx=10, pady=(0, 10), sticky="ew")
+            # Вторые привязки — для русской раскладки
+            for sequence in ("<Control-z>", "<Control-Cyrillic_ya>"):
+                root.bind(sequence, lambda e: self.undo())
+            for sequence in ("<Control-y>", "<Control-Cyrillic_en>"):
+                root.bind(sequence, lambda e: self.redo())
+
+        # Кнопки, которые блокируются на время фоновой операции
+        self.action_buttons = [w for w in root.winfo_children() if isinstance(w, tk.Button)]
+        self.job = None
+        self.cancel_btn = tk.Button(root, text="Отмена", command=self.cancel_job)
+        self.cancel_btn.grid(row=11, column=0, columnspan=5, padx=10, pady=(0, 10), sticky="ew")
+        self.cancel_btn.grid_remove()
+
+        if profiler is not None:
+            profiler.instrument(self.income_listbox, LIST_OPERATIONS, "incomes_list.")
+            profiler.instrument(self.expense_listbox, LIST_OPERATIONS, "expenses_list.")
+            tk.Button(root, text="Диагностика (F12)", command=self.show_diagnostics).grid(
+                row=12, column=0, columnspan=5, padx=10, pady=(0, 10), sticky="ew")
+            root.bind("<F12>", lambda e: self.show_diagnostics())
+
         root.grid_columnconfigure(1, weight=1)
         root.grid_columnconfigure(2, weight=1)
         root.grid_columnconfigure(3, weight=1)
+        root.grid_columnconfigure(4, weight=1)
+
+        self.refresh_lists()
+        if self.history is not None:
+            self.history.add_listener(self.update_undo_buttons)
+            self.update_undo_buttons()
+        if isinstance(self.engine, RemoteEngine):
+            self.root.after(REMOTE_POLL_MS, self.poll_remote)
+
+    @staticmethod
+    def format_row(value, category, day=NO_DATE):
+        row = f"{format_money(value)} руб. ({category})"
+        return f"{format_day(day)}  {row}" if day != NO_DATE else row
+
+    def make_date_entry(self, row):
+        entry = tk.Entry(self.root, width=11)
+        entry.grid(row=row, column=3, padx=3)
+        entry.insert(0, format_day(today()))
+        return entry
+
+    def entry_day(self, entry):
+        # Пустое поле — сегодняшняя дата
+        text = entry.get().strip()
+        return parse_day(text) if text else today()
+
+    def make_list(self, kind):
+        # При фильтре строка списка idx — запись view[idx]; правка и удаление идут по номерам записей
+        def row_count():
+            view = self.record_view(kind)
+            return len(self.engine.records(kind)) if view is None else len(view)
+
+        def row_text(idx):
+            view = self.record_view(kind)
+            return self.format_row(*self.engine.records(kind)[idx if view is None else view[idx]])
+
+        return VirtualList(self.root, row_count=row_count, row_text=row_text)
+
+    def refresh_lists(self):
+        self.income_listbox.refresh()
+        self.expense_listbox.refresh()
+
+    # --- фильтр ---
+
+    def record_view(self, kind):
+        # Позиции записей, которые показывает список при фильтре, или None — показываются все
+        if self.filter is None:
+            return None
+        view = self.views.get(kind)
+        if view is None:
+            view = self.views[kind] = self.engine.find(kind, **self.filter)
+        return view
+
+    def selected_records(self, kind, listbox):
+        selected = listbox.curselection()
+        view = self.record_view(kind)
+        return selected if view is None else tuple(view[idx] for idx in selected)
+
+    def show_record(self, kind, listbox, idx):
+        # Прокрутить список к записи idx, если она видна при текущем фильтре
+        view = self.record_view(kind)
+        if view is not None:
+            row = bisect_left(view, idx)
+            if row == len(view) or view[row] != idx:
+                return
+            idx = row
+        listbox.see(idx)
+
+    def on_engine_change(self, op, payload):
+        # После изменения позиции фильтра пересчитываются; выделение в отфильтрованном списке сбрасывается,
+        # потому что прежние номера строк могут указывать уже на другие записи
+        self.views.clear()
+        if self.filter is not None:
+            self.income_listbox.selected.clear()
+            self.expense_listbox.selected.clear()
+
+    def show_filter(self):
+        categories = list(dict.fromkeys(self.income_types + self.expense_types))
+        FilterDialog(self.root, categories, self.filter, self.apply_filter)
+
+    def apply_filter(self, query):
+        self.filter = query
+        self.views.clear()
+        self.refresh_lists()
+        if query is None:
+            self.filter_btn.config(text="Фильтр записей...")
+            self.result_label.config(text="")
+            return
+        found = {kind: len(self.record_view(kind)) for kind in ("incomes", "expenses")}
+        self.filter_btn.config(text="Фильтр записей (включён)...")
+        self.result_label.config(text=f"Фильтр: доходов {found['incomes']} из {len(self.engine.incomes)}, "
+                                      f"расходов {found['expenses']} из {len(self.engine.expenses)}")
+
+    def show_limit_warnings(self, categories):
+        warnings = self.engine.limit_warnings(categories)
+        if warnings:
+            messagebox.showinfo("Лимиты", "\n".join(warnings))
 
     def add_income(self):
+        if not self.ensure_idle():
+            return
         try:
-            value = float(self.income_entry.get())
-            category = self.income_type_var.get()
-            self.incomes.append((value, category))
-            self.income_listbox.insert(tk.END, f"{value:.2f} руб. ({category})")
-            self.income_entry.delete(0, tk.END)
+            day = self.entry_day(self.income_date_entry)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректную дату в формате ДД.ММ.ГГГГ!")
+            return
+        try:
+            values = parse_amounts(self.income_entry.get())
+            if not values:
+                raise ValueError
         except ValueError:
             messagebox.showerror("Ошибка", "Введите корректное число для дохода!")
+            return
+        # Несколько сумм добавляются одним пакетом: одно обновление списка
+        category = self.income_type_var.get()
+        added = self.engine.add_many("incomes", [(value, category, day) for value in values])
+        self.income_listbox.refresh(keep_selection=True)
+        self.show_record("incomes", self.income_listbox, added[-1])
+        self.income_entry.delete(0, tk.END)
 
     def add_expense(self):
+        if not self.ensure_idle():
+            return
         try:
-            value = float(self.expense_entry.get())
-            category = self.expense_type_var.get()
-            self.expenses.append((value, category))
-            self.expense_listbox.insert(tk.END, f"{value:.2f} руб. ({category})")
-            self.expense_entry.delete(0, tk.END)
-            self.check_limit_for_category(category)
+            day = self.entry_day(self.expense_date_entry)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректную дату в формате ДД.ММ.ГГГГ!")
+            return
+        try:
+            values = parse_amounts(self.expense_entry.get())
+            if not values:
+                raise ValueError
         except ValueError:
             messagebox.showerror("Ошибка", "Введите корректное число для расхода!")
+            return
+        # Лимит категории проверяется один раз на весь пакет
+        category = self.expense_type_var.get()
+        added = self.engine.add_many("expenses", [(value, category, day) for value in values])
+        self.expense_listbox.refresh(keep_selection=True)
+        self.show_record("expenses", self.expense_listbox, added[-1])
+        self.expense_entry.delete(0, tk.END)
+        self.check_limit_for_category(category)
 
     def edit_income(self):
-        selected = self.income_listbox.curselection()
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("incomes", self.income_listbox)
         if not selected:
             messagebox.showwarning("Редактирование", "Выберите запись для редактирования!")
             return
         idx = selected[0]
-        value, category = self.incomes[idx]
-        def callback(new_value, new_category):
-            self.incomes[idx] = (new_value, new_category)
-            self.income_listbox.delete(idx)
-            self.income_listbox.insert(idx, f"{new_value:.2f} руб. ({new_category})")
-        EditDialog(self.root, value, category, self.income_types, callback)
+        value, category, day = self.engine.incomes[idx]
+        def callback(new_value, new_category, new_day):
+            self.engine.edit("incomes", idx, new_value, new_category, new_day)
+            self.income_listbox.refresh(keep_selection=True)
+        EditDialog(self.root, value, category, self.income_types, callback, day)
 
     def edit_expense(self):
-        selected = self.expense_listbox.curselection()
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("expenses", self.expense_listbox)
         if not selected:
             messagebox.showwarning("Редактирование", "Выберите запись для редактирования!")
             return
         idx = selected[0]
-        value, category = self.expenses[idx]
-        old_category = category
-
-        def callback(new_value, new_category):
-            self.expenses[idx] = (new_value, new_category)
-            self.expense_listbox.delete(idx)
-            self.expense_listbox.insert(idx, f"{new_value:.2f} руб. ({new_category})")
-            warnings = []
-            for cat in {new_category, old_category}:
-                msg = self.check_limit_for_category(cat, return_message=True)
-                if msg:
-                    warnings.append(msg)
-            if warnings:
-                messagebox.showinfo("Лимиты", "\n".join(warnings))
+        value, category, day = self.engine.expenses[idx]
 
-        EditDialog(self.root, value, category, self.expense_types, callback)
+        def callback(new_value, new_category, new_day):
+            _, old_category, _ = self.engine.edit("expenses", idx, new_value, new_category, new_day)
+            self.expense_listbox.refresh(keep_selection=True)
+            self.show_limit_warnings({new_category, old_category})
+
+        EditDialog(self.root, value, category, self.expense_types, callback, day)
 
     def delete_income(self):
-        selected = self.income_listbox.curselection()
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("incomes", self.income_listbox)
         if not selected:
             messagebox.showwarning("Удаление", "Выберите запись для удаления!")
             return
-        for idx in reversed(selected):
-            self.income_listbox.delete(idx)
-            del self.incomes[idx]
+        self.engine.delete("incomes", selected)
+        self.income_listbox.refresh()
 
     def delete_expense(self):
-        selected = self.expense_listbox.curselection()
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("expenses", self.expense_listbox)
         if not selected:
             messagebox.showwarning("Удаление", "Выберите запись для удаления!")
             return
-        affected_cats = set()
-        for idx in selected:
-            affected_cats.add(self.expenses[idx][1])
-        for idx in reversed(selected):
-            self.expense_listbox.delete(idx)
-            del self.expenses[idx]
-        warnings = []
-        for cat in affected_cats:
-            msg = self.check_limit_for_category(cat, return_message=True)
-            if msg:
-                warnings.append(msg)
-        if warnings:
-            messagebox.showinfo("Лимиты", "\n".join(warnings))
+        affected_cats = self.engine.delete("expenses", selected)
+        self.expense_listbox.refresh()
+        self.show_limit_warnings(affected_cats)
+
+    def recategorize_incomes(self):
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("incomes", self.income_listbox)
+        if not selected:
+            messagebox.showwarning("Смена категории", "Выберите записи!")
+            return
+
+        def callback(category):
+            self.engine.recategorize("incomes", selected, category)
+            self.income_listbox.refresh(keep_selection=True)
+
+        CategoryDialog(self.root, len(selected), self.engine.incomes[selected[0]][1], self.income_types, callback)
+
+    def recategorize_expenses(self):
+        if not self.ensure_idle():
+            return
+        selected = self.selected_records("expenses", self.expense_listbox)
+        if not selected:
+            messagebox.showwarning("Смена категории", "Выберите записи!")
+            return
+
+        def callback(category):
+            affected_cats = self.engine.recategorize("expenses", selected, category)
+            self.expense_listbox.refresh(keep_selection=True)
+            self.show_limit_warnings(affected_cats)
+
+        CategoryDialog(self.root, len(selected), self.engine.expenses[selected[0]][1], self.expense_types, callback)
 
     def calculate(self):
-        total_income = sum(income[0] for income in self.incomes)
-        total_expense = sum(expense[0] for expense in self.expenses)
-        balance = total_income - total_expense
-
-        income_cat = {}
-        for amount, cat in self.incomes:
-            income_cat[cat] = income_cat.get(cat, 0) + amount
-
-        expense_cat = {}
-        for amount, cat in self.expenses:
-            expense_cat[cat] = expense_cat.get(cat, 0) + amount
-
-        warnings = self.check_all_limits(return_messages=True)
-
-        message = (f"Доходы: {total_income:.2f} руб.\n"
-                   f"Расходы: {total_expense:.2f} руб.\n"
-                   f"Баланс: {balance:.2f} руб.\n\n"
-                   f"Доходы по категориям:\n")
-        for cat, amount in income_cat.items():
-            message += f"  {cat}: {amount:.2f} руб.\n"
-        message += "Расходы по категориям:\n"
-        for cat, amount in expense_cat.items():
-            message += f"  {cat}: {amount:.2f} руб.\n"
-        if warnings:
-            message += "\n".join(warnings) + "\n"
-
-        if self.savings_goals:
-            message += "\nЦели накопления:\n"
-            now = datetime.now()
-            for name, info in self.savings_goals.items():
-                target = info['target']
-                saved = info['saved']
-                try:
-                    deadline = datetime.strptime(info['deadline_str'], "%d.%m.%Y")
-                    days_left = (deadline - now).days
-                except Exception:
-                    days_left = "неизвестно"
-                progress_percent = (saved / target) * 100 if target > 0 else 0
-                status = "Выполнено!" if saved >= target else "В процессе"
-                time_warning = ""
-                if isinstance(days_left, int):
-                    if days_left < 0:
-                        time_warning = "Просрочено!"
-                    elif 0 <= days_left <= 7:
-                        time_warning = "Срок близко!"
-
-                message += f"  {name}: {saved:.2f} / {target:.2f} руб., срок: {info['deadline_str']} ({days_left} дн.) {status}"
-                if time_warning:
-                    message += f" - {time_warning}"
-                message += f" ({progress_percent:.1f}%)\n"
-
-        if balance > 0:
-            message += "Поздравляем! У вас положительный баланс."
-        elif balance < 0:
-            message += "Внимание! Расходы превышают доходы."
+        if not self.ensure_idle():
+            return
+        message = self.engine.cached_report_text()
+        if message is not None:
+            # Данные не менялись с прошлого расчёта — фоновая задача не нужна
+            self.result_label.config(text=message)
+            return
+        self.run_job("Расчёт",
+                     lambda progress, cancel: self.engine.format_report(),
+                     lambda message: self.result_label.config(text=message),
+                     lambda e: messagebox.showerror("Ошибка", str(e)))
+
+    def select_period(self, event=None):
+        # Пока идёт фоновый расчёт, период не меняется: иначе в кэш отчёта попадут разделы за прежний период
+        if not self.ensure_idle():
+            self.show_current_period()
+            return
+        choice = self.period_var.get()
+        if choice == PERIOD_CUSTOM:
+            period = self.ask_custom_period()
+            if period is None:
+                self.show_current_period()
+                return
+            self.period_var.set(period_label(period))
         else:
-            message += "Баланс равен нулю."
-        self.result_label.config(text=message)
+            period = PERIODS[choice]()
+        self.engine.set_period(period)
+        self.result_label.config(text="")
+
+    def show_current_period(self):
+        self.period_var.set(PERIOD_ALL if self.engine.period is None else period_label(self.engine.period))
+
+    def ask_custom_period(self):
+        start = simpledialog.askstring("Период", "Начало периода (ДД.ММ.ГГГГ):", parent=self.root)
+        if not start:
+            return None
+        end = simpledialog.askstring("Период", "Конец периода (ДД.ММ.ГГГГ):", parent=self.root)
+        if not end:
+            return None
+        try:
+            period = parse_day(start.strip()), parse_day(end.strip())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Введите корректную дату в формате ДД.ММ.ГГГГ!")
+            return None
+        if period[0] > period[1]:
+            messagebox.showerror("Ошибка", "Начало периода позже его конца!")
+            return None
+        return period
+
+    def show_period_report(self):
+        if not self.ensure_idle():
+            return
+
+        def done(text):
+            self.result_label.config(text="")
+            TextReport(self.root, "Отчёт по месяцам", text)
+
+        self.run_job("Отчёт по месяцам",
+                     lambda progress, cancel: self.engine.format_period_report(self.engine.period_report()),
+                     done,
+                     lambda e: messagebox.showerror("Ошибка", str(e)))
 
     def set_limits(self):
-        LimitDialog(self.root, self.expense_types, self.limits, self.save_limits)
+        if not self.ensure_idle():
+            return
+        LimitDialog(self.root, self.expense_types, self.engine.limits, self.save_limits)
 
     def save_limits(self, limits_dict):
-        self.limits = limits_dict
+        self.engine.set_limits(limits_dict)
         messagebox.showinfo("Лимиты", "Лимиты расходов обновлены.")
 
     def check_all_limits(self, return_messages=False):
-        cat_sums = {}
-        messages = []
-        for value, cat in self.expenses:
-            cat_sums[cat] = cat_sums.get(cat, 0) + value
-
-        for cat, limit in self.limits.items():
-            spent = cat_sums.get(cat, 0)
-            if spent >= limit:
-                msg = f"Переполнение лимита по '{cat}': потрачено {spent:.2f} из {limit:.2f} руб.!"
-                if return_messages:
-                    messages.append("ВНИМАНИЕ. " + msg)
-                else:
-                    messagebox.showwarning("Лимит превышен", msg)
-            elif spent >= 0.9 * limit:
-                msg = f"Внимание: почти израсходован лимит по '{cat}' ({spent:.2f} из {limit:.2f} руб.)"
-                if return_messages:
-                    messages.append(msg)
-                else:
-                    messagebox.showinfo("Лимит бюджета", msg)
-        return messages
+        if return_messages:
+            return self.engine.limit_warnings()
+        for level, msg in self.engine.check_all_limits():
+            self._show_limit(level, msg)
+        return []
 
     def check_limit_for_category(self, cat, return_message=False):
-        if cat not in self.limits:
+        status = self.engine.check_limit(cat)
+        if status is None:
             return None
-        spent = sum(v for v, c in self.expenses if c == cat)
-        limit = self.limits[cat]
-        if spent >= limit:
-            msg = f"Переполнение лимита по '{cat}': потрачено {spent:.2f} из {limit:.2f} руб.!"
-            if return_message:
-                return "ВНИМАНИЕ. " + msg
+        if return_message:
+            return limit_warning_text(*status)
+        self._show_limit(*status)
+        return None
+
+    def _show_limit(self, level, msg):
+        if level == LIMIT_OVER:
+            messagebox.showwarning("Лимит превышен", msg)
+        else:
+            messagebox.showinfo("Лимит бюджета", msg)
+
+    # --- фоновые операции ---
+
+    def run_job(self, title, work, on_done, on_error):
+        # work(progress, cancel) выполняется в отдельном потоке; результат и ход работы
+        # передаются в главный поток через очередь, которую опрашивает root.after
+        self.job_cancel = threading.Event()
+        self.job_queue = queue.Queue()
+        if self.profiler is not None:
+            # Сама работа идёт в фоне; обёртка метода окна меряет только запуск
+            work = self.profiler.wrap(f"фон: {title}", work)
+        job_queue = self.job_queue
+
+        def progress(done, total):
+            job_queue.put(("progress", done, total))
+
+        def target():
+            try:
+                result = work(progress, self.job_cancel)
+            except Exception as e:
+                job_queue.put(("error", e))
             else:
-                messagebox.showwarning("Лимит превышен", msg)
-        elif spent >= 0.9 * limit:
-            msg = f"Внимание: почти израсходован лимит по '{cat}' ({spent:.2f} из {limit:.2f} руб.)"
-            if return_message:
-                return msg
+                job_queue.put(("done", result))
+
+        self.set_busy(True)
+        self.result_label.config(text=f"{title}...")
+        self.job = threading.Thread(target=target, daemon=True)
+        self.job.start()
+        self.root.after(JOB_POLL_MS, self.poll_job, title, on_done, on_error)
+
+    def poll_job(self, title, on_done, on_error):
+        last_progress = None
+        while True:
+            try:
+                message = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                last_progress = message
+                continue
+            self.job = None
+            self.set_busy(False)
+            if message[0] == "done":
+                on_done(message[1])
+            elif isinstance(message[1], OperationCancelled):
+                self.result_label.config(text=f"{title}: отменено")
             else:
-                messagebox.showinfo("Лимит бюджета", msg)
-        return None
+                on_error(message[1])
+            return
+        if last_progress and last_progress[2]:
+            self.result_label.config(text=f"{title}: {last_progress[1] * 100 // last_progress[2]}%")
+        self.root.after(JOB_POLL_MS, self.poll_job, title, on_done, on_error)
+
+    def set_busy(self, busy):
+        state = tk.DISABLED if busy else tk.NORMAL
+        for button in self.action_buttons:
+            button.config(state=state)
+        self.period_menu.config(state=tk.DISABLED if busy else "readonly")
+        if busy:
+            self.cancel_btn.grid()
+        else:
+            self.cancel_btn.grid_remove()
+            self.update_undo_buttons()
+
+    def cancel_job(self):
+        if self.job is not None:
+            self.job_cancel.set()
+
+    def ensure_idle(self):
+        # Пока идёт фоновая операция, данные менять нельзя
+        if self.job is not None:
+            messagebox.showwarning("Подождите", "Дождитесь завершения текущей операции или отмените её.")
+            return False
+        return True
 
     def export_data(self):
-        data = {
-            "incomes": [list(item) for item in self.incomes],
-            "expenses": [list(item) for item in self.expenses],
-            "limits": self.limits,
-            "savings_goals": self.savings_goals,
-        }
-        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")], title="Сохранить как")
+        if not self.ensure_idle():
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=LEDGER_FILETYPES, title="Сохранить как")
         if not file_path:
             return
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+
+        def done(_):
+            self.result_label.config(text="")
             messagebox.showinfo("Экспорт завершён", f"Данные успешно сохранены в: {file_path}")
-        except Exception as e:
-            messagebox.showerror("Ошибка экспорта", str(e))
+
+        self.run_job("Экспорт",
+                     lambda progress, cancel: self.engine.export_file(file_path, progress=progress, cancel=cancel),
+                     done,
+                     lambda e: messagebox.showerror("Ошибка экспорта", str(e)))
 
     def import_data(self):
-        file_path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")], title="Открыть данные")
+        if not self.ensure_idle():
+            return
+        file_path = filedialog.askopenfilename(filetypes=LEDGER_FILETYPES, title="Открыть данные")
         if not file_path:
             return
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            self.incomes = []
-            for item in data.get("incomes", []):
-                if isinstance(item, (list, tuple)) and len(item) == 2:
-                    value, category = item
-                    try:
-                        value = float(value)
-                        category = str(category)
-                        self.incomes.append((value, category))
-                    except (ValueError, TypeError):
-                        continue 
-
-            self.expenses = []
-            for item in data.get("expenses", []):
-                if isinstance(item, (list, tuple)) and len(item) == 2:
-                    value, category = item
-                    try:
-                        value = float(value)
-                        category = str(category)
-                        self.expenses.append((value, category))
-                    except (ValueError, TypeError):
-                        continue 
-
-            self.limits = {}
-            for cat, val in data.get("limits", {}).items():
-                try:
-                    self.limits[str(cat)] = float(val)
-                except (ValueError, TypeError):
-                    continue 
 
-            self.savings_goals = {}
-            for name, info in data.get("savings_goals", {}).items():
-                try:
-                    target = float(info["target"])
-                    saved = float(info.get("saved", 0))
-                    deadline_str = str(info["deadline_str"])
-                    self.savings_goals[str(name)] = {"target": target, "deadline_str": deadline_str, "saved": saved}
-                except (ValueError, KeyError, TypeError):
-                    continue
-
-            self.income_listbox.delete(0, tk.END)
-            for value, category in self.incomes:
-                self.income_listbox.insert(tk.END, f"{value:.2f} руб. ({category})")
-
-            self.expense_listbox.delete(0, tk.END)
-            for value, category in self.expenses:
-                self.expense_listbox.insert(tk.END, f"{value:.2f} руб. ({category})")
+        def done(data):
+            # Разбор и проверка шли в фоне, а данные заменяются в главном потоке: движок, история
+            # и подписчики на изменения не рассчитаны на вызовы из других потоков
+            self.engine.replace_all(data["incomes"], data["expenses"], data["limits"], data["savings_goals"])
+            self.refresh_lists()
+            self.result_label.config(text="")
 
             messagebox.showinfo("Импорт завершён", f"Данные успешно загружены из: {file_path}")
+            report = data["validation"]
+            if not report.clean():
+                messagebox.showwarning("Проверка данных", report.format())
 
-            warnings = self.check_all_limits(return_messages=True)
+            warnings = self.engine.limit_warnings()
             if warnings:
                 messagebox.showinfo("Лимиты", "\n".join(warnings))
-        except Exception as e:
-            messagebox.showerror("Ошибка импорта", f"Ошибка при импорте данных: {e}")
+
+        self.run_job("Импорт",
+                     lambda progress, cancel: load_ledger(file_path, progress=progress, cancel=cancel,
+                                                          categories=self.engine.known_categories()),
+                     done,
+                     lambda e: messagebox.showerror("Ошибка импорта", f"Ошибка при импорте данных: {e}"))
+
+    def import_csv(self):
+        # Колонки угадываются по заголовку, категории — по правилам по умолчанию (см. budget_csv)
+        if not self.ensure_idle():
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("CSV", "*.csv"), ("Все файлы", "*.*")],
+                                               title="Открыть выписку")
+        if not file_path:
+            return
+        try:
+            mapping = make_mapping(file_path, {})
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Ошибка импорта", f"Не удалось разобрать заголовок выписки: {e}")
+            return
+
+        def done(result):
+            records, report = result
+            # Как и при импорте данных, записи добавляются в главном потоке
+            add_records(self.engine, records)
+            self.refresh_lists()
+            self.result_label.config(text="")
+            messagebox.showinfo("Импорт завершён", f"Добавлено доходов: {len(records['incomes'])}, "
+                                                   f"расходов: {len(records['expenses'])}")
+            if not report.clean():
+                messagebox.showwarning("Проверка данных", report.format())
+            self.show_limit_warnings(self.engine.limits)
+
+        self.run_job("Импорт выписки",
+                     lambda progress, cancel: parse_csv(file_path, mapping, progress=progress, cancel=cancel),
+                     done,
+                     lambda e: messagebox.showerror("Ошибка импорта", f"Ошибка при импорте выписки: {e}"))
 
     def set_savings_goals(self):
-        SavingsGoalDialog(self.root, self.savings_goals, self.save_savings_goals)
+        if not self.ensure_idle():
+            return
+        SavingsGoalDialog(self.root, self.engine.savings_goals, self.save_savings_goals, self.engine)
 
     def save_savings_goals(self, goals_dict):
-        self.savings_goals = goals_dict
+        self.engine.set_savings_goals(goals_dict)
         messagebox.showinfo("Копилки и цели", "Данные копилок и целей обновлены.")
 
-if __name__ == "__main__":
+    def undo(self):
+        if self.history is None or not self.ensure_idle():
+            return
+        label = self.history.undo()
+        if label is not None:
+            self.refresh_lists()
+            self.result_label.config(text=f"Отменено: {label}")
+
+    def redo(self):
+        if self.history is None or not self.ensure_idle():
+            return
+        label = self.history.redo()
+        if label is not None:
+            self.refresh_lists()
+            self.result_label.config(text=f"Повторено: {label}")
+
+    def update_undo_buttons(self):
+        # Кнопки активны, только когда есть что отменять или повторять и нет фоновой операции
+        if self.history is None:
+            return
+        for button, label in ((self.undo_btn, self.history.undo_label()), (self.redo_btn, self.history.redo_label())):
+            button.config(state=tk.NORMAL if label is not None and self.job is None else tk.DISABLED)
+
+    def show_diagnostics(self):
+        DiagnosticsPanel(self.root, self.profiler, self.engine)
+
+    def poll_remote(self):
+        # Изменения других клиентов: обновить списки и показать лимиты, сменившие уровень
+        changed, limit_events = self.engine.poll_events()
+        if changed:
+            self.on_engine_change("remote", {})
+            self.income_listbox.refresh(keep_selection=True)
+            self.expense_listbox.refresh(keep_selection=True)
+            if self.job is None:
+                self.result_label.config(text="")
+        for level, msg in limit_events:
+            self._show_limit(level, msg)
+        self.root.after(REMOTE_POLL_MS, self.poll_remote)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Калькулятор бюджета")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument("--journal", metavar="ФАЙЛ",
+                         help="хранить данные в файле с журналом изменений (сохранение после каждой операции)")
+    storage.add_argument("--db", metavar="ФАЙЛ", help="хранить данные в базе SQLite")
+    storage.add_argument("--server", metavar="АДРЕС",
+                         help="работать с общим бюджетом на сервере budget_server.py, например 127.0.0.1:8765")
+    parser.add_argument("--profile", nargs="?", const="time", choices=PROFILE_MODES, default=mode_from_env(),
+                        help="замерять время операций (memory — ещё и выделенную память); "
+                             "по умолчанию из переменной окружения BUDGET_PROFILE")
+    parser.add_argument("--profile-out", metavar="ФАЙЛ", help="сохранить профиль в JSON при выходе")
+    parser.add_argument("--undo-mb", type=int, default=DEFAULT_LIMIT_MB, metavar="МБ",
+                        help=f"предел памяти истории отмены (по умолчанию {DEFAULT_LIMIT_MB}, 0 — без отмены)")
+    args = parser.parse_args(argv)
+    if args.profile_out and not args.profile:
+        args.profile = "time"
+
+    engine, journal = None, None
+    if args.journal:
+        engine, journal = open_ledger(args.journal)
+    elif args.db:
+        engine = SQLiteEngine(args.db)
+    elif args.server:
+        engine = RemoteEngine(args.server)
+    profiler = Profiler(args.profile) if args.profile else None
     root = tk.Tk()
-    app = BudgetApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = BudgetApp(root, engine, profiler, args.undo_mb)
+    try:
+        root.mainloop()
+    finally:
+        if args.profile_out:
+            profiler.dump(args.profile_out, ledger_sizes(app.engine))
+        if journal:
+            journal.close()
+        if args.db or args.server:
+            engine.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from budget_io import (OperationCancelled, RECORD_KEYS, ValidationReport, limits_item, parse_limits,
+                       parse_savings_goals, read_ledger, savings_goals_item, write_ledger)
+from budget_money import to_kopecks
+from budget_store import RecordStore, np
+
+# Двоичный формат экспорта (*.budget):
+#   8 байт    сигнатура BUDGETB1
+#   4 байта   длина заголовка (uint32, little-endian)
+#   заголовок JSON в UTF-8: число записей и таблица категорий для incomes/expenses,
+#   лимиты и цели (в рублях, как в файле JSON)
+#   выравнивание нулями до 8 байт
+#   для incomes, затем expenses — колонки фиксированной ширины:
+#   суммы float64[n] в копейках (как в RecordStore; целые до 2**53 в float64 точны),
+#   коды категорий uint32[n], даты int32[n] (порядковые номера дней)
+# Колонки загружаются копированием байтов из mmap в array без разбора каждой записи.
+# Старые версии читаются с преобразованием сумм: в версии 1 суммы — float64 в рублях,
+# в версии 2 — int64 в копейках.
+
+MAGIC = b"BUDGETB1"
+FORMAT_VERSION = 3
+BINARY_EXT = ".budget"
+_HEADER_LEN = struct.Struct("<I")
+# Порядок колонок в блоке записей
+_COLUMNS = ("amounts", "codes", "days")
+_SWAP = sys.byteorder != "little"
+# Тип колонки сумм в файлах старых версий
+_OLD_AMOUNT_TYPECODES = {1: "d", 2: "q"}
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def is_binary(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_binary(file_path, incomes, expenses, limits, savings_goals, extra=None, progress=None, cancel=None):
+    # Как и write_ledger: запись во временный файл с заменой в конце
+    stores = {key: records if isinstance(records, RecordStore) else RecordStore(records)
+              for key, records in (("incomes", incomes), ("expenses", expenses))}
+    total = sum(len(store) for store in stores.values())
+    header = {"format": FORMAT_VERSION}
+    for key, store in stores.items():
+        header[key] = {"count": len(store), "categories": store.category_names}
+    header["limits"] = limits_item(limits)
+    header["savings_goals"] = savings_goals_item(savings_goals)
+    header.update(extra or {})
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    prefix_len = len(MAGIC) + _HEADER_LEN.size + len(header_bytes)
+
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LEN.pack(len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (_aligned(prefix_len) - prefix_len))
+            done = 0
+            for store in stores.values():
+                if cancel is not None and cancel.is_set():
+                    raise OperationCancelled()
+                for name in _COLUMNS:
+                    column = getattr(store, name)
+                    if _SWAP:
+                        column = column[:]
+                        column.byteswap()
+                    f.write(column)
+                done += len(store)
+                if progress:
+                    progress(done, total)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress:
+        progress(total, total)
+
+
+def _float_column(column):
+    # Колонка int64 в копейках (версия 2) — в колонку float64 хранилища
+    if np is not None:
+        return array("d", np.frombuffer(column, dtype=np.int64).astype(np.float64).tobytes())
+    return array("d", column)
+
+
+def _read_store(view, offset, count, categories, version):
+    store = RecordStore()
+    for name in _COLUMNS:
+        if name == "amounts" and version in _OLD_AMOUNT_TYPECODES:
+            column = array(_OLD_AMOUNT_TYPECODES[version])
+        else:
+            column = getattr(store, name)
+        end = offset + column.itemsize * count
+        if end > len(view):
+            raise ValueError("Файл повреждён: записи обрываются")
+        column.frombytes(view[offset:end])
+        if _SWAP:
+            column.byteswap()
+        if name == "amounts" and version == 1:
+            store.amounts = array("d", map(to_kopecks, column))
+        elif name == "amounts" and version == 2:
+            store.amounts = _float_column(column)
+        offset = end
+    names = [str(name) for name in categories]
+    if count and max(store.codes) >= len(names):
+        raise ValueError("Файл повреждён: неизвестный код категории")
+    store.category_names = names
+    store.category_index = {name: code for code, name in enumerate(names)}
+    return store, offset
+
+
+def _validate_store(store, section, report, categories, strict):
+    # Форма и даты в двоичном файле заданы колонками; проверяются знак суммы и категории
+    if np is not None and len(store):
+        negative = np.flatnonzero(np.frombuffer(store.amounts, dtype=np.float64) < 0).tolist()
+    else:
+        negative = [i for i, value in enumerate(store.amounts) if value < 0]
+    if categories is not None:
+        known = set(categories)
+        unknown = sorted(i for name in store.category_names if name not in known
+                         for i in store.category_positions(name))
+        if negative:
+            rejected = set(negative)
+            unknown = [i for i in unknown if i not in rejected]
+        report.warn(section, "category", unknown)
+    report.reject(section, "negative", negative)
+    if negative:
+        store.delete_many(negative)
+    report.accepted[section] = len(store)
+    report.check_strict(strict)
+
+
+def read_binary(file_path, progress=None, cancel=None, categories=None, strict=False):
+    # Возвращает словарь того же вида, что и read_ledger
+    prefix_len = len(MAGIC) + _HEADER_LEN.size
+    if os.path.getsize(file_path) < prefix_len:
+        raise ValueError("Файл повреждён: нет заголовка")
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("Файл не является двоичным файлом бюджета")
+        (header_len,) = _HEADER_LEN.unpack_from(mm, len(MAGIC))
+        try:
+            header = json.loads(mm[prefix_len:prefix_len + header_len].decode("utf-8"))
+        except ValueError:
+            raise ValueError("Файл повреждён: некорректный заголовок")
+        version = header.get("format")
+        if version not in (*_OLD_AMOUNT_TYPECODES, FORMAT_VERSION):
+            raise ValueError(f"Неподдерживаемая версия формата: {header.get('format')}")
+        categories = categories or {}
+        report = ValidationReport()
+        data = {"limits": parse_limits(header.get("limits", {}), report, categories.get("expenses"), strict),
+                "savings_goals": parse_savings_goals(header.get("savings_goals", {}), report, strict),
+                "validation": report}
+        if "journal_seq" in header:
+            data["journal_seq"] = header["journal_seq"]
+        total = sum(header[key]["count"] for key in RECORD_KEYS)
+        offset = _aligned(prefix_len + header_len)
+        done = 0
+        with memoryview(mm) as view:
+            for key in RECORD_KEYS:
+                if cancel is not None and cancel.is_set():
+                    raise OperationCancelled()
+                section = header[key]
+                data[key], offset = _read_store(view, offset, section["count"], section["categories"], version)
+                _validate_store(data[key], key, report, categories.get(key), strict)
+                done += section["count"]
+                if progress:
+                    progress(done, total)
+    return data
+
+
+def load_ledger(file_path, progress=None, cancel=None, categories=None, strict=False):
+    # Формат определяется по сигнатуре, а не по расширению
+    read = read_binary if is_binary(file_path) else read_ledger
+    return read(file_path, progress=progress, cancel=cancel, categories=categories, strict=strict)
+
+
+def save_ledger(file_path, incomes, expenses, limits, savings_goals, extra=None, progress=None, cancel=None):
+    # Формат выбирается по расширению: *.budget — двоичный, остальное — JSON
+    write = write_binary if file_path.endswith(BINARY_EXT) else write_ledger
+    write(file_path, incomes, expenses, limits, savings_goals, extra=extra, progress=progress, cancel=cancel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Преобразование файлов экспорта между JSON и двоичным форматом")
+    parser.add_argument("source", help="исходный файл (JSON или *.budget)")
+    parser.add_argument("target", help="файл результата; формат по расширению (*.budget — двоичный)")
+    args = parser.parse_args(argv)
+
+    data = load_ledger(args.source)
+    extra = {"journal_seq": data["journal_seq"]} if "journal_seq" in data else None
+    save_ledger(args.target, data["incomes"], data["expenses"], data["limits"], data["savings_goals"], extra=extra)
+    print(f"Записей: доходов {len(data['incomes'])}, расходов {len(data['expenses'])}")
+
+
+if __name__ == "__main__":
+    main()
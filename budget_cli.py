@@ -0,0 +1,183 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from budget_binary import BINARY_EXT
+from budget_engine import BudgetEngine
+from budget_io import format_day, parse_day
+from budget_money import format_money, to_rubles
+
+# Пакетный расчёт отчётов по файлам экспорта без графического интерфейса (tkinter не импортируется).
+# Пример: python budget_cli.py exports/ --format csv --jobs 0 -o report.csv
+
+CSV_FIELDS = ["file", "section", "name", "amount", "detail"]
+# Денежные поля плана целей (budget_goals), которые в JSON выводятся в рублях
+PLAN_MONEY_KEYS = ("available", "unallocated", "daily_rate", "required_daily", "required_monthly")
+PLAN_GOAL_MONEY_KEYS = ("remaining", "daily", "monthly", "allocated")
+# Сколько номеров отклонённых записей выводить по каждой причине
+MAX_REPORTED_POSITIONS = 100
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirnames, names in os.walk(path):
+                # Порядок обхода каталогов не зависит от файловой системы
+                dirnames.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith((".json", BINARY_EXT)))
+        else:
+            files.append(path)
+    return files
+
+
+def process_file(file_path, period=None, strict=False):
+    try:
+        engine = BudgetEngine()
+        data = engine.import_file(file_path, strict=strict)
+        engine.set_period(period)
+        report = engine.report()
+    except Exception as e:
+        return {"file": file_path, "error": str(e)}
+    report["file"] = file_path
+    report["validation"] = data["validation"].to_dict(MAX_REPORTED_POSITIONS)
+    return report
+
+
+def _process(args):
+    return process_file(*args)
+
+
+def run(files, period=None, jobs=1, strict=False):
+    tasks = [(file_path, period, strict) for file_path in files]
+    workers = jobs or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        return [_process(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Порядок результатов совпадает с порядком файлов
+        return list(pool.map(_process, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+
+def report_rows(report):
+    file_path = report["file"]
+    if "error" in report:
+        yield {"file": file_path, "section": "error", "name": "", "amount": "", "detail": report["error"]}
+        return
+    for name in ("total_income", "total_expense", "balance"):
+        yield {"file": file_path, "section": "total", "name": name, "amount": format_money(report[name]),
+               "detail": ""}
+    for section, key in (("income", "income_by_category"), ("expense", "expense_by_category")):
+        for cat, amount in report[key].items():
+            yield {"file": file_path, "section": section, "name": cat, "amount": format_money(amount), "detail": ""}
+    for warning in report["limit_warnings"]:
+        yield {"file": file_path, "section": "limit", "name": "", "amount": "", "detail": warning}
+    for goal in report["goals"]:
+        status = "Выполнено!" if goal["done"] else "В процессе"
+        detail = f"{format_money(goal['saved'])} / {format_money(goal['target'])}, {goal['percent']:.1f}%, {status}"
+        if goal["time_warning"]:
+            detail += f", {goal['time_warning']}"
+        yield {"file": file_path, "section": "goal", "name": goal["name"], "amount": format_money(goal["saved"]),
+               "detail": detail}
+    plan = report["goal_plan"]
+    for goal in plan["goals"]:
+        # Нужный взнос в месяц; в detail — успевает ли цель и прогноз даты
+        status = "успевает" if goal["feasible"] else "не успевает"
+        if goal["completion"] is not None:
+            status += f", к {format_day(goal['completion'])}"
+        yield {"file": file_path, "section": "goal_plan", "name": goal["name"],
+               "amount": "" if goal["monthly"] is None else format_money(goal["monthly"]), "detail": status}
+    if plan["goals"]:
+        yield {"file": file_path, "section": "goal_plan", "name": "required_monthly",
+               "amount": "" if plan["required_monthly"] is None else format_money(plan["required_monthly"]),
+               "detail": "хватает" if plan["feasible"] else "не хватает"}
+    for kind, groups in (("rejected", report["validation"]["rejected"]), ("warning", report["validation"]["warnings"])):
+        for section, reasons in groups.items():
+            for reason, issue in reasons.items():
+                yield {"file": file_path, "section": "validation", "name": f"{kind}:{section}:{reason}",
+                       "amount": issue["count"], "detail": " ".join(str(p) for p in issue["positions"])}
+
+
+def json_report(report):
+    # Движок считает в копейках, в выводе JSON суммы в рублях — как в файлах экспорта
+    if "error" in report:
+        return report
+    converted = dict(report)
+    for name in ("total_income", "total_expense", "balance"):
+        converted[name] = to_rubles(report[name])
+    for key in ("income_by_category", "expense_by_category"):
+        converted[key] = {cat: to_rubles(amount) for cat, amount in report[key].items()}
+    converted["goals"] = [{**goal, "target": to_rubles(goal["target"]), "saved": to_rubles(goal["saved"])}
+                          for goal in report["goals"]]
+    plan = report["goal_plan"]
+    converted["goal_plan"] = {**plan, **_rubles(plan, PLAN_MONEY_KEYS),
+                              "goals": [_plan_goal_json(goal) for goal in plan["goals"]]}
+    return converted
+
+
+def _rubles(item, keys):
+    return {key: None if item[key] is None else to_rubles(item[key]) for key in keys}
+
+
+def _plan_goal_json(goal):
+    days = {key: None if goal[key] is None else format_day(goal[key]) for key in ("deadline", "completion")}
+    return {**goal, **_rubles(goal, PLAN_GOAL_MONEY_KEYS), **days}
+
+
+def write_reports(reports, out, fmt):
+    if fmt == "json":
+        json.dump([json_report(report) for report in reports], out, ensure_ascii=False, indent=2)
+        out.write("\n")
+        return
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for report in reports:
+        writer.writerows(report_rows(report))
+
+
+def parse_period(text):
+    # ДД.ММ.ГГГГ:ДД.ММ.ГГГГ
+    try:
+        start, end = text.split(":")
+        period = parse_day(start.strip()), parse_day(end.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError("ожидается период ДД.ММ.ГГГГ:ДД.ММ.ГГГГ")
+    if period[0] > period[1]:
+        raise argparse.ArgumentTypeError("начало периода позже его конца")
+    return period
+
+
+def job_count(text):
+    # 0 — по числу ядер, отрицательное число процессов — ошибка
+    jobs = int(text)
+    if jobs < 0:
+        raise argparse.ArgumentTypeError("число процессов не может быть отрицательным")
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчёт бюджета по файлам экспорта без графического интерфейса")
+    parser.add_argument("paths", nargs="+", help="файлы экспорта (JSON или *.budget) или каталоги с ними")
+    parser.add_argument("--format", choices=("json", "csv"), default="json", help="формат вывода (по умолчанию json)")
+    parser.add_argument("-o", "--output", help="файл для результата (по умолчанию стандартный вывод)")
+    parser.add_argument("-j", "--jobs", type=job_count, default=1,
+                        help="число процессов для параллельной обработки (0 — по числу ядер)")
+    parser.add_argument("--period", type=parse_period, help="расчёт за период ДД.ММ.ГГГГ:ДД.ММ.ГГГГ")
+    parser.add_argument("--strict", action="store_true",
+                        help="считать ошибкой файл с отклонёнными записями или неизвестными категориями")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+    reports = run(files, args.period, args.jobs, args.strict)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_reports(reports, out, args.format)
+    else:
+        write_reports(reports, sys.stdout, args.format)
+    return 1 if any("error" in report for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
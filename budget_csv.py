@@ -0,0 +1,361 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+from budget_engine import EXPENSE_TYPES, INCOME_TYPES, KINDS, BudgetEngine, load_engine
+from budget_io import OperationCancelled, ValidationReport
+from budget_journal import open_ledger
+from budget_money import parse_money
+from budget_sqlite import SQLiteEngine
+
+# Импорт банковских выписок CSV. Колонки сопоставляются сумме, направлению (доход или расход), дате
+# и описанию; категория выбирается правилами по тексту описания из категорий доходов и расходов.
+# Большой файл делится на куски по байтам (границы — по концу записи) и разбирается в пуле процессов;
+# куски возвращают колонки записей, которые добавляются в данные одним пакетом на раздел (add_many).
+# Перевод строки внутри поля в кавычках не считается концом записи, поэтому такая запись не делится между кусками.
+# Пример: python budget_csv.py выписка.csv -o ledger.json --amount "Сумма операции" --date "Дата операции"
+
+CSV_CHUNK_SIZE = 8 << 20
+DEFAULT_CATEGORY = "Другое"
+# Кэш категорий по описанию в процессе разбора; описания в выписках часто повторяются
+_RULE_CACHE_SIZE = 100_000
+# Пробелы-разделители тысяч и символы валюты в суммах
+_AMOUNT_JUNK = str.maketrans("", "", " \u00a0\u202f'\u2019\u20bd")
+_DEFAULT_DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+
+# Правила по умолчанию: (шаблон регулярного выражения без учёта регистра, раздел или None, категория)
+DEFAULT_RULES = [
+    (r"зарплат|заработн|аванс|salary", "incomes", "Зарплата"),
+    (r"подарок|gift", "incomes", "Подарки"),
+    (r"кешб[эе]к|cashback|процент|вознагражд", "incomes", "Дополнительный доход"),
+    (r"такси|taxi|метро|metro|транспорт|азс|бензин|yandex\.go|uber", "expenses", "Транспорт"),
+    (r"пят[её]рочка|магнит|перекр[её]сток|ашан|лента|дикси|вкусвилл|супермаркет|grocery|auchan", "expenses",
+     "Супермаркет"),
+    (r"кафе|ресторан|кофе|coffee|cafe|бургер|burger|mcdonald|пицц|pizza", "expenses", "Кафе"),
+    (r"кино|cinema|театр|концерт|steam|netflix|игр", "expenses", "Развлечения"),
+    (r"жкх|квартплат|коммунал|электроэнерг|водоканал|газоснабж|\bгаз\b|интернет|мобильн", "expenses", "Коммуналка"),
+]
+
+# Названия колонок, по которым сопоставление угадывается, если колонка не указана явно
+_GUESS = {
+    "amount": ("сумма операции", "сумма", "amount"),
+    "date": ("дата операции", "дата", "date"),
+    "description": ("описание", "назначение платежа", "description", "details", "memo"),
+    "debit": ("расход", "списание", "debit"),
+    "credit": ("приход", "зачисление", "credit"),
+}
+
+
+def parse_rules(items):
+    # [{"pattern": ..., "category": ..., "kind": "incomes" | "expenses" (необязательно)}] -> правила.
+    # Раздел по умолчанию — тот, в списке категорий которого есть категория
+    rules = []
+    for item in items:
+        kind, category = item.get("kind"), item["category"]
+        known = [k for k, types in (("incomes", INCOME_TYPES), ("expenses", EXPENSE_TYPES)) if category in types]
+        if kind is not None and kind not in known or not known:
+            raise ValueError(f"Категория '{category}' не подходит для правила {item['pattern']!r}")
+        re.compile(item["pattern"])
+        rules.append((item["pattern"], kind if kind is not None or len(known) > 1 else known[0], category))
+    return rules
+
+
+def load_rules(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return parse_rules(json.load(f))
+
+
+@lru_cache(maxsize=None)
+def _compiled(rules):
+    return {kind: [(re.compile(pattern, re.IGNORECASE), category)
+                   for pattern, rule_kind, category in rules if rule_kind in (None, kind)]
+            for kind in KINDS}
+
+
+def _column_index(header, column):
+    # Колонка по номеру (с 1) или по названию из заголовка
+    if column is None:
+        return None
+    if isinstance(column, int) or column.isdigit():
+        return int(column) - 1
+    names = [name.strip().lower() for name in header or []]
+    try:
+        return names.index(column.strip().lower())
+    except ValueError:
+        raise ValueError(f"В заголовке нет колонки '{column}'")
+
+
+def guess_columns(header):
+    names = [name.strip().lower() for name in header]
+    found = {}
+    for key, candidates in _GUESS.items():
+        for candidate in candidates:
+            if candidate in names:
+                found[key] = names.index(candidate) + 1
+                break
+    return found
+
+
+def read_header(file_path, encoding="utf-8-sig", delimiter=None):
+    # Первая строка и разделитель (если не задан — угадывается по первой строке); возвращает
+    # (названия колонок, разделитель, смещение начала данных в байтах)
+    with open(file_path, "rb") as f:
+        first = f.readline()
+    text = first.decode(encoding)
+    if delimiter is None:
+        delimiter = max(";,\t|", key=text.count)
+    return next(csv.reader([text], delimiter=delimiter)), delimiter, len(first)
+
+
+def make_mapping(file_path, columns, encoding="utf-8-sig", delimiter=None, has_header=True, date_format=None,
+                 income_values=()):
+    # columns: {"amount" | "debit" | "credit" | "direction" | "date" | "description": номер или название}.
+    # Направление: по знаку суммы (минус — расход), по колонке direction (income_values — значения дохода)
+    # или по отдельным колонкам debit (расход) и credit (доход)
+    header, delimiter, data_start = read_header(file_path, encoding, delimiter)
+    if not has_header:
+        header, data_start = None, 0
+    elif not columns.get("amount") and not (columns.get("debit") or columns.get("credit")):
+        columns = {**guess_columns(header), **{k: v for k, v in columns.items() if v}}
+    mapping = {key: _column_index(header, columns.get(key))
+               for key in ("amount", "debit", "credit", "direction", "date", "description")}
+    if mapping["amount"] is None and mapping["debit"] is None and mapping["credit"] is None:
+        raise ValueError("Не задана колонка суммы (amount или debit/credit)")
+    mapping.update(encoding=encoding, delimiter=delimiter, data_start=data_start,
+                   date_formats=(date_format,) if date_format else _DEFAULT_DATE_FORMATS,
+                   income_values=tuple(value.strip().lower() for value in income_values))
+    return mapping
+
+
+def byte_ranges(file_path, start, chunk_size=CSV_CHUNK_SIZE):
+    # Куски [начало, конец) примерно по chunk_size байт. Конец сдвигается к концу строки, после которого
+    # число кавычек от начала данных чётное, то есть к концу записи, а не к переводу строки внутри поля
+    # в кавычках (удвоенная кавычка внутри поля чётность не меняет)
+    size = os.path.getsize(file_path)
+    ranges = []
+    quotes = 0
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while start < size:
+            end = min(size, start + chunk_size)
+            quotes += f.read(end - start).count(b'"')
+            while end < size:
+                line = f.readline()
+                quotes += line.count(b'"')
+                end += len(line)
+                if quotes % 2 == 0:
+                    break
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _amount(text):
+    return parse_money(text.translate(_AMOUNT_JUNK)) if text and text.strip() else None
+
+
+def _parse_date(text, formats):
+    text = text.strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_chunk(task):
+    # Разбор одного куска в процессе пула. Возвращает колонки по разделам — суммы в копейках (array('q')),
+    # номера категорий в списке категорий раздела (array('H')), дни (array('i')) —
+    # и ошибки [(номер строки в куске, причина)]
+    file_path, start, end, mapping, rules = task
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(mapping["encoding"])
+    compiled = _compiled(rules)
+    codes = {kind: {name: code for code, name in enumerate(INCOME_TYPES if kind == "incomes" else EXPENSE_TYPES)}
+             for kind in KINDS}
+    columns = {kind: (array("q"), array("H"), array("i")) for kind in KINDS}
+    categories = {kind: {} for kind in KINDS}
+    dates = {}
+    errors = []
+    amount_col, debit_col, credit_col = mapping["amount"], mapping["debit"], mapping["credit"]
+    direction_col, date_col, text_col = mapping["direction"], mapping["date"], mapping["description"]
+    income_values, formats = mapping["income_values"], mapping["date_formats"]
+    width = 1 + max(col for col in (amount_col, debit_col, credit_col, direction_col, date_col, text_col)
+                    if col is not None)
+
+    reader = csv.reader(io.StringIO(text, newline=""), delimiter=mapping["delimiter"])
+    line = 0
+    for row in reader:
+        line = reader.line_num
+        if not row or len(row) == 1 and not row[0].strip():
+            continue
+        if len(row) < width:
+            errors.append((line, "shape"))
+            continue
+        try:
+            if amount_col is not None:
+                value = _amount(row[amount_col])
+                if direction_col is not None:
+                    kind = "incomes" if row[direction_col].strip().lower() in income_values else "expenses"
+                    value = abs(value)
+                else:
+                    kind = "expenses" if value < 0 else "incomes"
+                    value = abs(value)
+            else:
+                debit = _amount(row[debit_col]) if debit_col is not None else None
+                credit = _amount(row[credit_col]) if credit_col is not None else None
+                kind, value = ("expenses", debit) if debit else ("incomes", credit)
+                value = abs(value)
+        except (ValueError, TypeError):
+            errors.append((line, "amount"))
+            continue
+
+        day = 0
+        if date_col is not None:
+            day = dates.get(row[date_col])
+            if day is None:
+                day = dates[row[date_col]] = _parse_date(row[date_col], formats) or -1
+            if day == -1:
+                errors.append((line, "date"))
+                continue
+
+        description = row[text_col] if text_col is not None else ""
+        cache = categories[kind]
+        category = cache.get(description)
+        if category is None:
+            category = DEFAULT_CATEGORY
+            for pattern, rule_category in compiled[kind]:
+                if pattern.search(description):
+                    category = rule_category
+                    break
+            if len(cache) >= _RULE_CACHE_SIZE:
+                cache.clear()
+            cache[description] = category
+
+        amounts, kind_codes, days = columns[kind]
+        amounts.append(value)
+        kind_codes.append(codes[kind][category])
+        days.append(day)
+    return {"columns": columns, "errors": errors, "lines": line}
+
+
+def parse_csv(file_path, mapping, rules=DEFAULT_RULES, jobs=0, chunk_size=CSV_CHUNK_SIZE, progress=None, cancel=None):
+    # Разбор всего файла: куски по порядку файла, ошибки — с номерами строк файла (с 1, включая заголовок).
+    # Возвращает ({раздел: [(сумма, категория, день)]}, ValidationReport)
+    rules = tuple(rules)
+    ranges = byte_ranges(file_path, mapping["data_start"], chunk_size)
+    tasks = [(file_path, start, end, mapping, rules) for start, end in ranges]
+    total = ranges[-1][1] if ranges else 0
+    workers = jobs or os.cpu_count() or 1
+    report = ValidationReport()
+    columns = {kind: (array("q"), array("H"), array("i")) for kind in KINDS}
+    line_offset = 1 if mapping["data_start"] else 0
+
+    def merge(result, end):
+        nonlocal line_offset
+        for kind in KINDS:
+            for merged, part in zip(columns[kind], result["columns"][kind]):
+                merged.extend(part)
+        for line, reason in result["errors"]:
+            report.reject("csv", reason, [line_offset + line])
+        line_offset += result["lines"]
+        if progress:
+            progress(end, total)
+
+    if workers == 1 or len(tasks) < 2:
+        for task in tasks:
+            if cancel is not None and cancel.is_set():
+                raise OperationCancelled()
+            merge(parse_chunk(task), task[2])
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            try:
+                for task, result in zip(tasks, pool.map(parse_chunk, tasks)):
+                    if cancel is not None and cancel.is_set():
+                        raise OperationCancelled()
+                    merge(result, task[2])
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    records = {}
+    for kind in KINDS:
+        names = INCOME_TYPES if kind == "incomes" else EXPENSE_TYPES
+        amounts, codes, days = columns[kind]
+        records[kind] = list(zip(amounts, map(names.__getitem__, codes), (day or None for day in days)))
+        report.accepted[kind] = len(records[kind])
+    return records, report
+
+
+def add_records(engine, records):
+    # Добавление в данные одним пакетом на раздел; записи без даты получают сегодняшнюю дату (как в add_many)
+    added = {}
+    for kind in KINDS:
+        if records[kind]:
+            added[kind] = engine.add_many(kind, records[kind])
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт банковской выписки CSV в данные бюджета")
+    parser.add_argument("csv_path", help="файл выписки CSV")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output", metavar="ФАЙЛ",
+                        help="файл экспорта (JSON или *.budget): записи добавляются к его данным, если он есть")
+    target.add_argument("--journal", metavar="ФАЙЛ", help="данные с журналом изменений (см. budget.py --journal)")
+    target.add_argument("--db", metavar="ФАЙЛ", help="база SQLite")
+    for key, help_text in (("amount", "колонка суммы со знаком (минус — расход)"),
+                           ("debit", "колонка суммы расхода"), ("credit", "колонка суммы дохода"),
+                           ("direction", "колонка направления операции (см. --income-values)"),
+                           ("date", "колонка даты"), ("description", "колонка описания для правил категорий")):
+        parser.add_argument("--" + key, help=help_text + "; номер с 1 или название из заголовка")
+    parser.add_argument("--income-values", default="", help="значения колонки направления для дохода, через запятую")
+    parser.add_argument("--date-format", help="формат даты strptime (по умолчанию ДД.ММ.ГГГГ и ГГГГ-ММ-ДД)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="кодировка файла (например cp1251)")
+    parser.add_argument("--delimiter", help="разделитель колонок (по умолчанию угадывается)")
+    parser.add_argument("--no-header", action="store_true", help="в файле нет строки заголовка")
+    parser.add_argument("--rules", help="правила категорий JSON: [{\"pattern\", \"category\", \"kind\"}]")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="число процессов (0 — по числу ядер)")
+    parser.add_argument("--chunk-mb", type=int, default=CSV_CHUNK_SIZE >> 20, help="размер куска, МБ")
+    args = parser.parse_args(argv)
+
+    columns = {key: getattr(args, key) for key in ("amount", "debit", "credit", "direction", "date", "description")}
+    mapping = make_mapping(args.csv_path, columns, args.encoding, args.delimiter, not args.no_header,
+                           args.date_format, [value for value in args.income_values.split(",") if value.strip()])
+    rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+    records, report = parse_csv(args.csv_path, mapping, rules, args.jobs, args.chunk_mb << 20)
+
+    journal = None
+    if args.journal:
+        engine, journal = open_ledger(args.journal)
+    elif args.db:
+        engine = SQLiteEngine(args.db)
+    else:
+        engine = load_engine(args.output) if os.path.exists(args.output) else BudgetEngine()
+    try:
+        add_records(engine, records)
+        if args.output:
+            engine.export_file(args.output)
+    finally:
+        if journal:
+            journal.close()
+        if args.db:
+            engine.close()
+    print(f"Добавлено доходов: {len(records['incomes'])}, расходов: {len(records['expenses'])}")
+    if not report.clean():
+        print(report.format(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,559 @@
+from datetime import date, datetime
+
+from budget_binary import load_ledger, save_ledger
+from budget_goals import RATE_WINDOW_DAYS, format_plan, goal_items, plan_goals, sweep_incomes
+from budget_io import (DATE_FORMAT, ValidationReport, format_day, limits_item, parse_limits, parse_records,
+                       parse_savings_goals, record_item, savings_goals_item)
+from budget_money import format_money
+from budget_store import RecordStore
+
+# Ядро бюджета без графического интерфейса: данные, агрегаты, лимиты и цели.
+# Модуль не импортирует tkinter и подходит для пакетной обработки.
+
+INCOME_TYPES = ["Зарплата", "Подарки", "Дополнительный доход", "Другое"]
+EXPENSE_TYPES = ["Транспорт", "Супермаркет", "Развлечения", "Кафе", "Коммуналка", "Другое"]
+KINDS = ("incomes", "expenses")
+
+LIMIT_OVER = "over"
+LIMIT_NEAR = "near"
+
+
+def limit_warning_text(level, msg):
+    return "ВНИМАНИЕ. " + msg if level == LIMIT_OVER else msg
+
+
+# --- периоды: пары (первый день, последний день) в порядковых номерах дней ---
+
+def today():
+    return date.today().toordinal()
+
+
+def month_period(day):
+    d = date.fromordinal(day)
+    start = d.replace(day=1)
+    next_month = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return start.toordinal(), next_month.toordinal() - 1
+
+
+def quarter_period(day):
+    d = date.fromordinal(day)
+    first_month = (d.month - 1) // 3 * 3 + 1
+    start = date(d.year, first_month, 1).toordinal()
+    return start, month_period(date(d.year, first_month + 2, 1).toordinal())[1]
+
+
+def year_period(day):
+    year = date.fromordinal(day).year
+    return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+
+
+def period_label(period):
+    return f"{format_day(period[0])} — {format_day(period[1])}"
+
+
+class BudgetEngine:
+    def __init__(self):
+        self.income_types = list(INCOME_TYPES)
+        self.expense_types = list(EXPENSE_TYPES)
+
+        self.incomes = RecordStore()
+        self.expenses = RecordStore()
+        # Все суммы (записи, лимиты, цели) — целые копейки, см. budget_money
+        self.limits = {}
+        # Копилки и цели накопления — словарь {название: {target, deadline_str, saved}}
+        self.savings_goals = {}
+
+        # Накопительные суммы и количество записей по категориям, чтобы не пересчитывать списки целиком
+        self.totals = {kind: {} for kind in KINDS}
+        self.counts = {kind: {} for kind in KINDS}
+
+        # Выбранный период (первый день, последний день) или None — за всё время
+        self.period = None
+
+        # Кэш разделов отчёта; раздел пересчитывается, только если его сбросило изменение данных
+        self._report_cache = {}
+        # Сроки целей разбираются один раз при создании или импорте: {название: datetime или None}
+        self._goal_deadlines = {}
+
+        # Подписчики на изменения: функция(op, payload) вызывается после каждой операции
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def _emit(self, op, **payload):
+        self._invalidate_report(op, payload)
+        for listener in self.listeners:
+            listener(op, payload)
+
+    def _invalidate_report(self, op, payload):
+        cache = self._report_cache
+        if op in ("add", "add_many", "insert", "edit", "delete", "recategorize"):
+            sections = ["totals", "categories", "funding", "plan"]
+            if payload["kind"] == "expenses":
+                sections.append("limits")
+        elif op == "limits":
+            sections = ["limits"]
+        elif op == "goals":
+            sections = ["goals", "plan"]
+        else:
+            cache.clear()
+            return
+        for section in sections:
+            cache.pop(section, None)
+        cache.pop("text", None)
+
+    def clear_report_cache(self):
+        # Следующий отчёт считается заново целиком (бенчмарки, сверка с кэшем)
+        self._report_cache.clear()
+
+    def _cached(self, section, build, key=None):
+        entry = self._report_cache.get(section)
+        if entry is None or entry[0] != key:
+            entry = self._report_cache[section] = (key, build())
+        return entry[1]
+
+    def records(self, kind):
+        if kind not in KINDS:
+            raise ValueError(f"Неизвестный тип записей: {kind}")
+        return getattr(self, kind)
+
+    def categories(self, kind):
+        return self.income_types if kind == "incomes" else self.expense_types
+
+    # --- изменение данных ---
+
+    def add(self, kind, value, category, day=None):
+        # day — порядковый номер дня; по умолчанию сегодняшняя дата
+        day = today() if day is None else day
+        self.records(kind).append(value, category, day)
+        self._totals_add(kind, value, category)
+        self._emit("add", kind=kind, value=value, category=category, day=day)
+        return len(self.records(kind)) - 1
+
+    def add_many(self, kind, records):
+        # Пакетное добавление записей (сумма, категория[, день]) с одним уведомлением на пакет;
+        # возвращает диапазон индексов новых записей
+        store = self.records(kind)
+        default_day = today()
+        added = [(item[0], item[1], item[2] if len(item) > 2 and item[2] is not None else default_day)
+                 for item in records]
+        start = len(store)
+        store.extend(added)
+        for value, category, _ in added:
+            self._totals_add(kind, value, category)
+        self._emit("add_many", kind=kind, records=added)
+        return range(start, len(store))
+
+    def edit(self, kind, idx, value, category, day=None):
+        records = self.records(kind)
+        old_value, old_category, old_day = records[idx]
+        day = old_day if day is None else day
+        self._totals_remove(kind, old_value, old_category)
+        self._totals_add(kind, value, category)
+        records[idx] = (value, category, day)
+        self._emit("edit", kind=kind, idx=idx, value=value, category=category, day=day)
+        return old_value, old_category, old_day
+
+    def insert_many(self, kind, positions, records):
+        # Вставка записей (сумма, категория, день) на позиции positions по возрастанию — отмена удаления
+        positions = sorted(positions)
+        records = list(records)
+        self.records(kind).insert_many(positions, records)
+        for value, category, _ in records:
+            self._totals_add(kind, value, category)
+        self._emit("insert", kind=kind, positions=positions, records=records)
+
+    def delete(self, kind, indices):
+        indices = set(indices)
+        affected = set()
+        for value, category in self.records(kind).delete_many(indices):
+            self._totals_remove(kind, value, category)
+            affected.add(category)
+        self._emit("delete", kind=kind, indices=sorted(indices))
+        return affected
+
+    def recategorize(self, kind, indices, category):
+        # Перенос выбранных записей в категорию category; возвращает затронутые категории
+        indices = sorted(set(indices))
+        changed = self.records(kind).set_category(indices, category)
+        affected = {category}
+        for value, old_category in changed:
+            self._totals_remove(kind, value, old_category)
+            self._totals_add(kind, value, category)
+            affected.add(old_category)
+        self._emit("recategorize", kind=kind, indices=indices, category=category)
+        return affected
+
+    def move_category(self, kind, old_category, new_category):
+        # Перенос всех записей одной категории в другую
+        return self.recategorize(kind, self.records(kind).category_positions(old_category), new_category)
+
+    def set_limits(self, limits):
+        self.limits = dict(limits)
+        self._emit("limits", limits=self.limits)
+
+    def set_savings_goals(self, goals):
+        # Копия с копиями целей: словари целей не делятся с вызывающим (окно целей, история отмены)
+        self.savings_goals = {name: dict(info) for name, info in goals.items()}
+        self._parse_deadlines()
+        self._emit("goals", goals=self.savings_goals)
+
+    def clear(self):
+        self.replace_all(RecordStore(), RecordStore(), {}, {})
+
+    def replace_all(self, incomes, expenses, limits, savings_goals):
+        # Полная замена данных (импорт, очистка)
+        self.incomes = incomes
+        self.expenses = expenses
+        self.limits = limits
+        self.savings_goals = savings_goals
+        self._parse_deadlines()
+        self.rebuild_totals()
+        self._emit("reset")
+
+    # --- накопительные суммы ---
+
+    def _totals_add(self, kind, value, category):
+        totals, counts = self.totals[kind], self.counts[kind]
+        totals[category] = totals.get(category, 0) + value
+        counts[category] = counts.get(category, 0) + 1
+
+    def _totals_remove(self, kind, value, category):
+        totals, counts = self.totals[kind], self.counts[kind]
+        counts[category] -= 1
+        if counts[category] == 0:
+            # Последняя запись категории — сбрасываем сумму, чтобы не копить погрешность
+            del counts[category]
+            del totals[category]
+        else:
+            totals[category] -= value
+
+    def rebuild_totals(self):
+        for kind in KINDS:
+            self.totals[kind], self.counts[kind] = self.records(kind).category_sums()
+
+    def verify_totals(self):
+        # Сверка накопительных сумм с полным пересчётом; возвращает список расхождений
+        problems = []
+        for kind in KINDS:
+            full_totals, full_counts = self.records(kind).category_sums()
+            totals = self.totals[kind]
+            if full_counts != self.counts[kind]:
+                problems.append(f"{kind}: количество записей по категориям не совпадает")
+            for cat in set(full_totals) | set(totals):
+                expected = full_totals.get(cat, 0)
+                actual = totals.get(cat, 0)
+                if expected != actual:
+                    problems.append(f"{kind}: '{cat}' — {format_money(actual)} вместо {format_money(expected)}")
+        return problems
+
+    # Без выбранного периода суммы берутся из накопительных словарей,
+    # с периодом — из среза индекса по дате. Аргумент period — расчёт за другой период без смены выбранного
+    # (сервер считает запросы за период параллельно, не трогая общий движок)
+
+    def set_period(self, period):
+        if period != self.period:
+            self.period = period
+            self._invalidate_report("period", {})
+
+    def category_totals(self, kind, period=None):
+        period = period or self.period
+        if period is not None:
+            return self.records(kind).category_sums(period)[0]
+        return dict(self.totals[kind])
+
+    def category_total(self, kind, category, period=None):
+        period = period or self.period
+        if period is not None:
+            return self.records(kind).category_sum(category, period)
+        return self.totals[kind].get(category, 0)
+
+    def total(self, kind, period=None):
+        period = period or self.period
+        if period is not None:
+            return self.records(kind).total(period)
+        return sum(self.totals[kind].values())
+
+    # --- поиск записей ---
+
+    def find(self, kind, categories=None, amount_range=None, text="", period=None):
+        # Позиции записей по возрастанию (как в списках окна), подходящих под фильтр: категории,
+        # суммы (от, до) в копейках, подстрока и период. Заметок у записей нет — подстрока ищется
+        # без учёта регистра в названиях категорий и сужает список категорий
+        records = self.records(kind)
+        text = text.strip().lower()
+        if text:
+            names = records.category_list() if categories is None else categories
+            categories = [name for name in names if text in name.lower()]
+        return records.query(categories, amount_range, period)
+
+    # --- лимиты ---
+
+    def check_limit(self, cat, period=None):
+        # Возвращает (уровень, сообщение) или None, если лимит не задан или не достигнут
+        if cat not in self.limits:
+            return None
+        spent = self.category_total("expenses", cat, period)
+        limit = self.limits[cat]
+        # Суммы в копейках: сравнения точные, порог 90% — без умножения на дробь
+        if spent >= limit:
+            return LIMIT_OVER, (f"Переполнение лимита по '{cat}': "
+                                f"потрачено {format_money(spent)} из {format_money(limit)} руб.!")
+        if spent * 10 >= limit * 9:
+            return LIMIT_NEAR, (f"Внимание: почти израсходован лимит по '{cat}' "
+                                f"({format_money(spent)} из {format_money(limit)} руб.)")
+        return None
+
+    def check_all_limits(self):
+        results = []
+        for cat in self.limits:
+            status = self.check_limit(cat)
+            if status:
+                results.append(status)
+        return results
+
+    def limit_warnings(self, categories=None, period=None):
+        cats = self.limits if categories is None else categories
+        warnings = []
+        for cat in cats:
+            status = self.check_limit(cat, period)
+            if status:
+                warnings.append(limit_warning_text(*status))
+        return warnings
+
+    # --- цели накопления ---
+
+    def _parse_deadlines(self):
+        deadlines = {}
+        for name, info in self.savings_goals.items():
+            try:
+                deadlines[name] = datetime.strptime(info["deadline_str"], DATE_FORMAT)
+            except (ValueError, TypeError, KeyError):
+                deadlines[name] = None
+        self._goal_deadlines = deadlines
+
+    def goal_progress(self, now=None):
+        now = now or datetime.now()
+        progress = []
+        for name, info in self.savings_goals.items():
+            target = info["target"]
+            saved = info["saved"]
+            deadline = self._goal_deadlines.get(name)
+            days_left = (deadline - now).days if deadline is not None else None
+            time_warning = ""
+            if days_left is not None:
+                if days_left < 0:
+                    time_warning = "Просрочено!"
+                elif days_left <= 7:
+                    time_warning = "Срок близко!"
+            progress.append({
+                "name": name,
+                "target": target,
+                "saved": saved,
+                "deadline_str": info["deadline_str"],
+                "days_left": days_left,
+                "percent": (saved / target) * 100 if target > 0 else 0,
+                "done": saved >= target,
+                "time_warning": time_warning,
+            })
+        return progress
+
+    # --- план целей (см. budget_goals) ---
+
+    def net_daily_rate(self, window_days=RATE_WINDOW_DAYS, day=None):
+        # Средний чистый доход в день за последние window_days дней по датированным записям
+        end = day or today()
+        period = (end - window_days + 1, end)
+        return (self.records("incomes").total(period) - self.records("expenses").total(period)) / window_days
+
+    def goal_funding(self):
+        # Баланс за всё время (без учёта выбранного периода) и средний чистый доход в день
+        def build():
+            balance = self.records("incomes").total() - self.records("expenses").total()
+            return balance, self.net_daily_rate()
+        return self._cached("funding", build, key=date.today())
+
+    def goal_plan(self, goals=None, day=None):
+        # goals — словарь целей (по умолчанию текущие); диалог целей передаёт редактируемую копию.
+        # Свободный остаток — баланс за вычетом уже накопленного по целям
+        goals = self.savings_goals if goals is None else goals
+        balance, daily_rate = self.goal_funding()
+        available = balance - sum(info["saved"] for info in goals.values())
+        return plan_goals(self._goal_items(goals), day or today(), available, daily_rate)
+
+    def goal_scenarios(self, monthly_incomes, goals=None, day=None):
+        goals = self.savings_goals if goals is None else goals
+        balance, _ = self.goal_funding()
+        available = balance - sum(info["saved"] for info in goals.values())
+        return sweep_incomes(self._goal_items(goals), day or today(), available, monthly_incomes)
+
+    def _goal_items(self, goals):
+        # Сроки текущих целей уже разобраны; копию из окна целей могли изменить — её сроки разбираются заново
+        return goal_items(goals, self._goal_deadlines if goals is self.savings_goals else None)
+
+    def format_goal_plan(self, plan=None):
+        return format_plan(plan or self.goal_plan())
+
+    # --- отчёт ---
+
+    def report(self, now=None, period=None):
+        # Разделы берутся из кэша; goals зависят ещё и от текущей даты. Отчёт за другой период (period)
+        # считается заново и кэш не меняет; цели от периода не зависят и берутся из кэша как обычно
+        if period is None or period == self.period:
+            period, cached = self.period, self._cached
+        else:
+            def cached(section, build):
+                return build()
+        total_income, total_expense = cached(
+            "totals", lambda: (self.total("incomes", period), self.total("expenses", period)))
+        income_by_category, expense_by_category = cached(
+            "categories", lambda: (self.category_totals("incomes", period), self.category_totals("expenses", period)))
+        if now is None:
+            goals = self._cached("goals", self.goal_progress, key=date.today())
+            plan = self._cached("plan", self.goal_plan, key=date.today())
+        else:
+            goals = self.goal_progress(now)
+            plan = self.goal_plan(day=now.toordinal())
+        return {
+            "period": period_label(period) if period else None,
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "balance": total_income - total_expense,
+            "income_by_category": dict(income_by_category),
+            "expense_by_category": dict(expense_by_category),
+            "limit_warnings": list(cached("limits", lambda: self.limit_warnings(period=period))),
+            "goals": list(goals),
+            "goal_plan": plan,
+        }
+
+    def format_report(self, report=None):
+        if report is None:
+            return self._cached("text", lambda: self._format_report(self.report()), key=date.today())
+        return self._format_report(report)
+
+    def cached_report_text(self):
+        # Текст отчёта, если с последнего расчёта ничего не менялось, иначе None
+        entry = self._report_cache.get("text")
+        return entry[1] if entry is not None and entry[0] == date.today() else None
+
+    def _format_report(self, report):
+        balance = report["balance"]
+        parts = []
+        if report.get("period"):
+            parts.append(f"Период: {report['period']}\n")
+        parts.append(f"Доходы: {format_money(report['total_income'])} руб.\n"
+                     f"Расходы: {format_money(report['total_expense'])} руб.\n"
+                     f"Баланс: {format_money(balance)} руб.\n\n"
+                     f"Доходы по категориям:\n")
+        parts.extend(f"  {cat}: {format_money(amount)} руб.\n" for cat, amount in report["income_by_category"].items())
+        parts.append("Расходы по категориям:\n")
+        parts.extend(f"  {cat}: {format_money(amount)} руб.\n" for cat, amount in report["expense_by_category"].items())
+        parts.extend(warning + "\n" for warning in report["limit_warnings"])
+
+        if report["goals"]:
+            parts.append("\nЦели накопления:\n")
+            for goal in report["goals"]:
+                days_left = goal["days_left"] if goal["days_left"] is not None else "неизвестно"
+                status = "Выполнено!" if goal["done"] else "В процессе"
+                time_warning = f" - {goal['time_warning']}" if goal["time_warning"] else ""
+                parts.append(f"  {goal['name']}: {format_money(goal['saved'])} / {format_money(goal['target'])} руб., "
+                             f"срок: {goal['deadline_str']} ({days_left} дн.) {status}{time_warning}"
+                             f" ({goal['percent']:.1f}%)\n")
+            parts.append("План целей:\n" + format_plan(report["goal_plan"]) + "\n")
+
+        if balance > 0:
+            parts.append("Поздравляем! У вас положительный баланс.")
+        elif balance < 0:
+            parts.append("Внимание! Расходы превышают доходы.")
+        else:
+            parts.append("Баланс равен нулю.")
+        return "".join(parts)
+
+    def date_span(self):
+        spans = [span for span in (self.records(kind).date_span() for kind in KINDS) if span]
+        if not spans:
+            return None
+        return min(span[0] for span in spans), max(span[1] for span in spans)
+
+    def period_report(self, period=None):
+        # Доходы, расходы и баланс по месяцам внутри периода (по умолчанию — выбранного или всего диапазона дат)
+        period = period or self.period or self.date_span()
+        rows = []
+        if period is None:
+            return rows
+        day = period[0]
+        while day <= period[1]:
+            month = month_period(day)
+            window = (max(month[0], period[0]), min(month[1], period[1]))
+            income = self.records("incomes").total(window)
+            expense = self.records("expenses").total(window)
+            rows.append({
+                "month": date.fromordinal(month[0]).strftime("%m.%Y"),
+                "start": format_day(window[0]),
+                "end": format_day(window[1]),
+                "income": income,
+                "expense": expense,
+                "balance": income - expense,
+            })
+            day = month[1] + 1
+        return rows
+
+    def format_period_report(self, rows):
+        if not rows:
+            return "Нет записей с датами."
+        lines = [f"{'Месяц':<8} {'Доходы':>14} {'Расходы':>14} {'Баланс':>14}"]
+        for row in rows:
+            lines.append(f"{row['month']:<8} {format_money(row['income']):>14} {format_money(row['expense']):>14} "
+                         f"{format_money(row['balance']):>14}")
+        income = sum(row["income"] for row in rows)
+        expense = sum(row["expense"] for row in rows)
+        lines.append(f"{'Итого':<8} {format_money(income):>14} {format_money(expense):>14} "
+                     f"{format_money(income - expense):>14}")
+        return "\n".join(lines)
+
+    # --- импорт / экспорт ---
+
+    def to_dict(self):
+        return {
+            "incomes": [record_item(*item) for item in self.incomes],
+            "expenses": [record_item(*item) for item in self.expenses],
+            "limits": limits_item(self.limits),
+            "savings_goals": savings_goals_item(self.savings_goals),
+        }
+
+    def known_categories(self):
+        return {kind: self.categories(kind) for kind in KINDS}
+
+    def load_dict(self, data, strict=False):
+        # Возвращает отчёт о проверке данных (ValidationReport)
+        report = ValidationReport()
+        categories = self.known_categories()
+        incomes = parse_records(data.get("incomes", []), "incomes", report, categories["incomes"], strict)
+        expenses = parse_records(data.get("expenses", []), "expenses", report, categories["expenses"], strict)
+        limits = parse_limits(data.get("limits", {}), report, categories["expenses"], strict)
+        goals = parse_savings_goals(data.get("savings_goals", {}), report, strict)
+        self.replace_all(incomes, expenses, limits, goals)
+        return report
+
+    def export_file(self, file_path, progress=None, cancel=None, extra=None):
+        # Формат по расширению: *.budget — двоичный, иначе JSON
+        save_ledger(file_path, self.incomes, self.expenses, self.limits, self.savings_goals,
+                    extra=extra, progress=progress, cancel=cancel)
+
+    def import_file(self, file_path, progress=None, cancel=None, strict=False):
+        # Потоковый разбор: данные заменяются только после успешного чтения всего файла.
+        # Отчёт о проверке записей — в data["validation"]; strict прерывает импорт при первом замечании
+        data = load_ledger(file_path, progress=progress, cancel=cancel, categories=self.known_categories(),
+                           strict=strict)
+        self.replace_all(data["incomes"], data["expenses"], data["limits"], data["savings_goals"])
+        return data
+
+
+def load_engine(file_path):
+    engine = BudgetEngine()
+    engine.import_file(file_path)
+    return engine
@@ -0,0 +1,192 @@
+import math
+from bisect import bisect_right
+
+from budget_io import format_day, parse_day
+from budget_money import format_money
+from budget_store import np
+
+# План целей накопления: нужный взнос в день и в месяц, распределение свободного остатка
+# по срокам и проверка, успевают ли все цели при текущем чистом доходе.
+# Цели закрываются по очереди сроков (сначала просроченные и ближайшие, цели без срока — в конце):
+# к сроку k нужно накопить сумму остатков всех целей до неё включительно. При постоянном доходе r
+# в день это возможно, если остаток_k - свободные <= r * дней_до_срока_k — для каждой цели по отдельности.
+# Суммы — в копейках.
+
+# Средняя длина месяца 30.4375 дня = 487 / 16
+_MONTH_NUM, _MONTH_DEN = 487, 16
+DAYS_PER_MONTH = _MONTH_NUM / _MONTH_DEN
+# За сколько последних дней оценивается средний чистый доход
+RATE_WINDOW_DAYS = 90
+# Сценарии дохода для окна целей: число шагов и нижняя граница верхнего дохода (1000 руб.)
+SCENARIO_STEPS = 10
+MIN_SCENARIO_INCOME = 100000
+
+
+def goal_items(goals, deadlines=None):
+    # {название: {target, deadline_str, saved}} -> [(название, цель, накоплено, день срока или None)].
+    # deadlines — уже разобранные сроки {название: datetime или None} (engine._goal_deadlines), чтобы не
+    # разбирать строки на каждый расчёт плана; без них сроки разбираются здесь
+    items = []
+    for name, info in goals.items():
+        if deadlines is not None and name in deadlines:
+            deadline = deadlines[name]
+            deadline = deadline.toordinal() if deadline is not None else None
+        else:
+            try:
+                deadline = parse_day(info["deadline_str"])
+            except (ValueError, TypeError, KeyError):
+                deadline = None
+        items.append((name, info["target"], info["saved"], deadline))
+    return items
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+
+def required_rates(remaining, days_left):
+    # Нужный взнос (день, месяц) с округлением вверх; (None, None) — срок прошёл или не задан
+    if remaining <= 0:
+        return 0, 0
+    if days_left is None or days_left <= 0:
+        return None, None
+    return _ceil_div(remaining, days_left), _ceil_div(remaining * _MONTH_NUM, days_left * _MONTH_DEN)
+
+
+def _queue(items):
+    return sorted(items, key=lambda item: (item[3] is None, item[3] or 0, item[0]))
+
+
+def plan_goals(items, today, available=0, daily_rate=0):
+    # available — свободные деньги сейчас, daily_rate — средний чистый доход в день
+    free = max(0, available)
+    unallocated = free
+    cumulative = 0
+    min_rate = 0
+    min_monthly = 0
+    plans = []
+    for name, target, saved, deadline in _queue(items):
+        remaining = max(0, target - saved)
+        days_left = deadline - today if deadline is not None else None
+        daily, monthly = required_rates(remaining, days_left)
+        allocated = min(unallocated, remaining)
+        unallocated -= allocated
+        cumulative += remaining
+        need = cumulative - free
+        if remaining == 0:
+            completion = None
+        elif need <= 0:
+            completion = today
+        elif daily_rate > 0:
+            completion = today + math.ceil(need / daily_rate)
+        else:
+            completion = None
+        if deadline is not None and remaining > 0 and need > 0 and min_rate is not None:
+            # Минимальный доход в день и в месяц, при котором успевают все цели до этой включительно.
+            # Месячный считается из точных need и days_left, как в required_rates, а не из округлённого дневного
+            if days_left <= 0:
+                min_rate = min_monthly = None
+            else:
+                min_rate = max(min_rate, _ceil_div(need, days_left))
+                min_monthly = max(min_monthly, _ceil_div(need * _MONTH_NUM, days_left * _MONTH_DEN))
+        plans.append({
+            "name": name,
+            "remaining": remaining,
+            "deadline": deadline,
+            "days_left": days_left,
+            "daily": daily,
+            "monthly": monthly,
+            "allocated": allocated,
+            "completion": completion,
+            # Просроченная цель считается успевающей, если её можно закрыть сегодня из свободного остатка
+            "feasible": remaining == 0 or (completion is not None
+                                           and (deadline is None or completion <= max(deadline, today))),
+        })
+    return {
+        "goals": plans,
+        "available": free,
+        "unallocated": unallocated,
+        "daily_rate": daily_rate,
+        "feasible": all(plan["feasible"] for plan in plans),
+        "required_daily": min_rate,
+        "required_monthly": min_monthly,
+    }
+
+
+def _thresholds(items, today, available):
+    # Для целей со сроком — минимальный доход в день, при котором цель успевает (по очереди сроков)
+    free = max(0, available)
+    cumulative = 0
+    thresholds = []
+    for _, target, saved, deadline in _queue(items):
+        remaining = max(0, target - saved)
+        cumulative += remaining
+        if deadline is None:
+            continue
+        need = cumulative - free
+        days_left = deadline - today
+        if remaining == 0 or need <= 0:
+            thresholds.append(-math.inf)
+        elif days_left <= 0:
+            thresholds.append(math.inf)
+        else:
+            thresholds.append(need / days_left)
+    return sorted(thresholds)
+
+
+def sweep_incomes(items, today, available, monthly_incomes):
+    # Сценарии: для каждого чистого дохода в месяц — сколько целей со сроком успевают и успевают ли все.
+    # Пороги считаются один раз, сценарии обрабатываются двоичным поиском (в numpy — одним searchsorted)
+    thresholds = _thresholds(items, today, available)
+    if np is not None:
+        rates = np.asarray(monthly_incomes, dtype=np.float64) / DAYS_PER_MONTH
+        funded = np.searchsorted(np.asarray(thresholds, dtype=np.float64), rates, side="right").tolist()
+    else:
+        funded = [bisect_right(thresholds, income / DAYS_PER_MONTH) for income in monthly_incomes]
+    return [{"monthly_income": income, "funded": count, "dated": len(thresholds), "feasible": count == len(thresholds)}
+            for income, count in zip(monthly_incomes, funded)]
+
+
+def scenario_incomes(plan, steps=SCENARIO_STEPS):
+    # Доходы для сценариев: от нуля до удвоенного большего из нужного и текущего дохода
+    current = round(plan["daily_rate"] * DAYS_PER_MONTH)
+    top = 2 * max(plan["required_monthly"] or 0, current, MIN_SCENARIO_INCOME)
+    return [top * i // steps for i in range(steps + 1)]
+
+
+def format_scenarios(rows):
+    lines = [f"{'Доход, руб./мес':>16} {'Успевают':>10}"]
+    for row in rows:
+        mark = "  все цели" if row["feasible"] else ""
+        lines.append(f"{format_money(row['monthly_income']):>16} {row['funded']:>5} из {row['dated']}{mark}")
+    return "\n".join(lines)
+
+
+def format_plan(plan):
+    lines = []
+    for goal in plan["goals"]:
+        if goal["remaining"] == 0:
+            lines.append(f"  {goal['name']}: собрано")
+            continue
+        if goal["monthly"] is not None:
+            need = f"нужно {format_money(goal['monthly'])} руб./мес ({format_money(goal['daily'])} руб./день)"
+        elif goal["deadline"] is not None:
+            need = f"срок прошёл, осталось {format_money(goal['remaining'])} руб."
+        else:
+            need = f"без срока, осталось {format_money(goal['remaining'])} руб."
+        forecast = f", прогноз {format_day(goal['completion'])}" if goal["completion"] is not None else ""
+        status = "успевает" if goal["feasible"] else "не успевает"
+        lines.append(f"  {goal['name']}: {need}; из остатка {format_money(goal['allocated'])} руб.; "
+                     f"{status}{forecast}")
+    monthly_rate = round(plan["daily_rate"] * DAYS_PER_MONTH)
+    lines.append(f"Свободный остаток: {format_money(plan['available'])} руб., "
+                 f"чистый доход: {format_money(monthly_rate)} руб./мес")
+    if plan["feasible"]:
+        lines.append("Текущего дохода хватает на все цели.")
+    elif plan["required_monthly"] is None:
+        lines.append("Не все цели достижимы: срок части целей уже прошёл.")
+    elif plan["required_monthly"] == 0:
+        lines.append("Для целей без срока нужен положительный чистый доход.")
+    else:
+        lines.append(f"Для всех целей нужен чистый доход не меньше {format_money(plan['required_monthly'])} руб./мес.")
+    return "\n".join(lines)
@@ -0,0 +1,259 @@
+import functools
+from collections import deque
+
+from budget_store import RecordStore
+
+# История отмены и повтора изменений движка. Шаг истории — не снимок данных, а компактное изменение:
+# вставленные или удалённые записи (колоночный RecordStore, 16 байт на запись) с их позициями,
+# прежние категории перенесённых записей, прежние и новые лимиты и цели. При полной замене данных
+# (импорт, очистка) сохраняются прежние хранилища — это и есть объём изменения, без копии на каждый шаг.
+# Объём истории ограничен: при превышении выбрасываются самые старые шаги.
+# Методы изменения подменяются обёртками на конкретном движке (как в budget_profile): обёртка
+# запоминает то, что нужно для отмены, до вызова метода.
+
+DEFAULT_LIMIT_MB = 64
+# Оценка памяти шага: служебная часть, позиция записи, лимит или цель, запись не в RecordStore
+STEP_BYTES = 200
+POSITION_BYTES = 4
+ENTRY_BYTES = 150
+ROW_BYTES = 100
+# Если копируется больше 1/16 записей хранилища без колонок (SQLite), один проход дешевле запросов по одной
+SCAN_RATIO = 16
+
+TRACKED_OPERATIONS = ("add", "add_many", "insert_many", "edit", "delete", "recategorize", "set_limits",
+                      "set_savings_goals", "replace_all")
+KIND_TITLES = {"incomes": "доходов", "expenses": "расходов"}
+
+
+def take_rows(store, positions):
+    # Копия записей на позициях positions (по возрастанию) в компактном RecordStore
+    if isinstance(store, RecordStore):
+        return store.select(positions)
+    if len(positions) * SCAN_RATIO > len(store):
+        wanted = set(positions)
+        return RecordStore(row for i, row in enumerate(store) if i in wanted)
+    return RecordStore(store[i] for i in positions)
+
+
+def detach(store):
+    # Хранилище, которое останется верным после замены данных движка: RecordStore движок больше не меняет,
+    # а записи SQLite после замены удаляются из базы — их нужно скопировать
+    return store if isinstance(store, RecordStore) else RecordStore(store)
+
+
+def rows_bytes(rows):
+    return rows.nbytes() if isinstance(rows, RecordStore) else len(rows) * ROW_BYTES
+
+
+def positions_bytes(positions):
+    return 0 if isinstance(positions, range) else len(positions) * POSITION_BYTES
+
+
+def step_bytes(step, live=()):
+    # live — хранилища, которые держит сам движок: их память занята и без истории, она не считается
+    op = step[0]
+    if op == "records":
+        return STEP_BYTES + positions_bytes(step[4]) + rows_bytes(step[5])
+    if op == "recategorize":
+        return STEP_BYTES + 2 * positions_bytes(step[3])
+    if op in ("limits", "goals"):
+        return STEP_BYTES + ENTRY_BYTES * (len(step[2]) + len(step[3]))
+    if op == "reset":
+        old, new = step[2], step[3]
+        size = STEP_BYTES + ENTRY_BYTES * (len(old[2]) + len(old[3]) + len(new[2]) + len(new[3]))
+        # Новые RecordStore после замены обычно и есть данные движка — считаются только прежние записи
+        for rows in (*old[:2], *(rows for rows in new[:2] if not any(rows is store for store in live))):
+            size += rows_bytes(rows)
+        return size
+    return STEP_BYTES
+
+
+class History:
+    def __init__(self, engine, limit_bytes=DEFAULT_LIMIT_MB << 20):
+        self.engine = engine
+        self.limit_bytes = limit_bytes
+        # Шаги: (операция, описание, ...) вместе с оценкой памяти; новые — в конце
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.nbytes = 0
+        # Вложенные вызовы (move_category -> recategorize) и сами отмена и повтор не записываются
+        self.depth = 0
+        self.applying = False
+        self.listeners = []
+        self.originals = {}
+        for name in TRACKED_OPERATIONS:
+            self._wrap(name)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def _wrap(self, name):
+        method = getattr(self.engine, name)
+        # None — метод класса: при отключении истории обёртка просто удаляется с экземпляра
+        self.originals[name] = vars(self.engine).get(name)
+        capture = getattr(self, "_capture_" + name)
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if self.depth or self.applying:
+                return method(*args, **kwargs)
+            finish = capture(*args, **kwargs)
+            self.depth += 1
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+            step = finish(result)
+            if step is not None:
+                self.push(step)
+            return result
+        setattr(self.engine, name, wrapper)
+
+    def detach(self):
+        for name, method in self.originals.items():
+            if method is None:
+                delattr(self.engine, name)
+            else:
+                setattr(self.engine, name, method)
+        self.originals = {}
+        self.clear()
+
+    # --- запись шагов: capture вызывается до изменения и возвращает функцию, которая строит шаг после ---
+
+    def _capture_add(self, kind, value, category, day=None):
+        return lambda idx: self._inserted(kind, range(idx, idx + 1), "добавление записи " + KIND_TITLES[kind])
+
+    def _capture_add_many(self, kind, records):
+        return lambda added: self._inserted(kind, added, f"добавление записей {KIND_TITLES[kind]}: {len(added)}")
+
+    def _capture_insert_many(self, kind, positions, records):
+        positions = sorted(positions)
+        return lambda _: self._inserted(kind, positions, f"вставка записей {KIND_TITLES[kind]}: {len(positions)}")
+
+    def _inserted(self, kind, positions, label):
+        # Вставленные записи читаются из хранилища уже с подставленной датой
+        if not len(positions):
+            return None
+        return "records", label, kind, True, positions, take_rows(self.engine.records(kind), positions)
+
+    def _capture_delete(self, kind, indices):
+        positions = sorted(set(indices))
+        rows = take_rows(self.engine.records(kind), positions)
+        label = f"удаление записей {KIND_TITLES[kind]}: {len(positions)}"
+        return lambda _: ("records", label, kind, False, positions, rows) if positions else None
+
+    def _capture_edit(self, kind, idx, value, category, day=None):
+        label = "изменение записи " + KIND_TITLES[kind]
+        return lambda old: ("edit", label, kind, idx, old, self.engine.records(kind)[idx])
+
+    def _capture_recategorize(self, kind, indices, category):
+        positions = sorted(set(indices))
+        # Прежние категории хранятся группами позиций: {категория: [позиции]}
+        groups = {}
+        for pos, (_, old_category, _) in zip(positions, take_rows(self.engine.records(kind), positions)):
+            groups.setdefault(old_category, []).append(pos)
+        label = f"смена категории записей {KIND_TITLES[kind]}: {len(positions)}"
+        return lambda _: ("recategorize", label, kind, positions, groups, category) if positions else None
+
+    def _capture_set_limits(self, limits):
+        old = self.engine.limits
+        return lambda _: None if self.engine.limits == old else ("limits", "изменение лимитов", old, self.engine.limits)
+
+    def _capture_set_savings_goals(self, goals):
+        # Движок хранит собственные копии целей и не меняет их на месте, поэтому достаточно ссылок
+        old = self.engine.savings_goals
+        return lambda _: (None if self.engine.savings_goals == old
+                          else ("goals", "изменение целей", old, self.engine.savings_goals))
+
+    def _capture_replace_all(self, incomes, expenses, limits, savings_goals):
+        engine = self.engine
+        old = (detach(engine.incomes), detach(engine.expenses), engine.limits, engine.savings_goals)
+        new = (detach(incomes), detach(expenses), limits, savings_goals)
+        return lambda _: ("reset", "замена всех данных", old, new)
+
+    def push(self, step):
+        for _, size in self.redo_steps:
+            self.nbytes -= size
+        self.redo_steps.clear()
+        size = step_bytes(step, (self.engine.incomes, self.engine.expenses))
+        self.undo_steps.append((step, size))
+        self.nbytes += size
+        # Самые старые шаги выбрасываются первыми; шаг больше всего ограничения не сохраняется вовсе
+        while self.nbytes > self.limit_bytes and self.undo_steps:
+            self.nbytes -= self.undo_steps.popleft()[1]
+        self._notify()
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.nbytes = 0
+        self._notify()
+
+    # --- отмена и повтор ---
+
+    def undo_label(self):
+        return self.undo_steps[-1][0][1] if self.undo_steps else None
+
+    def redo_label(self):
+        return self.redo_steps[-1][0][1] if self.redo_steps else None
+
+    def undo(self):
+        # Отменяет последний шаг; возвращает его описание или None, если отменять нечего
+        if not self.undo_steps:
+            return None
+        entry = self.undo_steps.pop()
+        self._apply(entry[0], undo=True)
+        self.redo_steps.append(entry)
+        self._notify()
+        return entry[0][1]
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+        entry = self.redo_steps.pop()
+        self._apply(entry[0], undo=False)
+        self.undo_steps.append(entry)
+        self._notify()
+        return entry[0][1]
+
+    def _apply(self, step, undo):
+        engine = self.engine
+        op = step[0]
+        self.applying = True
+        try:
+            if op == "records":
+                _, _, kind, inserted, positions, rows = step
+                if inserted == undo:
+                    engine.delete(kind, positions)
+                else:
+                    engine.insert_many(kind, positions, rows)
+            elif op == "edit":
+                _, _, kind, idx, old, new = step
+                engine.edit(kind, idx, *(old if undo else new))
+            elif op == "recategorize":
+                _, _, kind, positions, groups, category = step
+                if undo:
+                    for old_category, group in groups.items():
+                        engine.recategorize(kind, group, old_category)
+                else:
+                    engine.recategorize(kind, positions, category)
+            elif op == "limits":
+                engine.set_limits(step[2] if undo else step[3])
+            elif op == "goals":
+                engine.set_savings_goals(step[2] if undo else step[3])
+            else:
+                engine.replace_all(*(step[2] if undo else step[3]))
+        except Exception:
+            # Данные могли измениться частично — прежние шаги к ним уже не применимы
+            self.clear()
+            raise
+        finally:
+            self.applying = False
+
+    def sizes(self):
+        # Для окна диагностики: число шагов отмены и повтора и оценка занятой памяти
+        return {"undo_steps": len(self.undo_steps), "redo_steps": len(self.redo_steps), "history_bytes": self.nbytes}
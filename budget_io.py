@@ -0,0 +1,507 @@
+import codecs
+import json
+import os
+import re
+from datetime import date, datetime
+
+from budget_money import KOPECKS, parse_money, to_kopecks, to_rubles
+from budget_store import NO_DATE, RecordStore, np
+
+# Чтение и разбор файлов экспорта. Массивы incomes/expenses читаются потоково, по одному элементу,
+# поэтому пиковая память не зависит от размера файла: в буфере держится только текущий кусок.
+# Записи проверяются пачками (см. RecordValidator); отклонённые записи попадают в отчёт ValidationReport.
+
+CHUNK_SIZE = 1 << 16
+WRITE_BATCH = 10000
+RECORD_KEYS = ("incomes", "expenses")
+DATE_FORMAT = "%d.%m.%Y"
+_SKIP_WHITESPACE = re.compile(r"[ \t\n\r]*").match
+_AMOUNT_SEPARATOR = re.compile(r"[\s;]+")
+# Размер пачки проверяемых записей
+VALIDATE_BATCH = 10000
+_SEQUENCES = (list, tuple)
+_NUMBERS = {int, float}
+# Копейки, начиная с которых float64 представляет не все целые
+_FLOAT_EXACT = 2 ** 53
+
+
+def parse_day(text):
+    # Дата ДД.ММ.ГГГГ -> порядковый номер дня
+    return datetime.strptime(text, DATE_FORMAT).toordinal()
+
+
+def format_day(day):
+    return date.fromordinal(day).strftime(DATE_FORMAT) if day != NO_DATE else ""
+
+
+def parse_amounts(text):
+    # Одна или несколько сумм через пробел, «;» или перевод строки (вставка столбца из таблицы);
+    # десятичный разделитель — точка или запятая. Возвращает суммы в копейках
+    return [parse_money(part) for part in _AMOUNT_SEPARATOR.split(text.strip()) if part]
+
+
+def record_item(value, category, day):
+    # Запись в формате файла экспорта (сумма в рублях); у записи без даты третьего элемента нет
+    value = to_rubles(value)
+    return [value, category, format_day(day)] if day != NO_DATE else [value, category]
+
+
+def limits_item(limits):
+    return {cat: to_rubles(value) for cat, value in limits.items()}
+
+
+def savings_goals_item(goals):
+    return {name: {"target": to_rubles(info["target"]), "deadline_str": info["deadline_str"],
+                   "saved": to_rubles(info["saved"])}
+            for name, info in goals.items()}
+
+
+# --- проверка данных импорта ---
+
+# Причины, по которым запись отклоняется, и замечания, с которыми она сохраняется
+REJECT_REASONS = {
+    "shape": "неверная форма записи",
+    "amount": "сумма не является числом",
+    "negative": "отрицательная сумма",
+    "date": "некорректная дата",
+}
+WARNING_REASONS = {
+    "category": "неизвестная категория",
+    "deadline": "некорректный срок цели",
+}
+SECTION_TITLES = {"incomes": "доходы", "expenses": "расходы", "limits": "лимиты", "savings_goals": "цели",
+                  "csv": "строки CSV"}
+
+
+class ValidationError(ValueError):
+    # Строгий режим: импорт прерывается на первой пачке с замечаниями
+    def __init__(self, report):
+        super().__init__("Импорт прерван (строгий режим):\n" + report.format())
+        self.report = report
+
+
+class ValidationReport:
+    def __init__(self):
+        # Принято записей по разделам
+        self.accepted = {}
+        # {раздел: {причина: [номера записей в файле или названия лимитов и целей]}}
+        self.rejected = {}
+        self.warnings = {}
+
+    def reject(self, section, reason, positions):
+        if positions:
+            self.rejected.setdefault(section, {}).setdefault(reason, []).extend(positions)
+
+    def warn(self, section, reason, positions):
+        if positions:
+            self.warnings.setdefault(section, {}).setdefault(reason, []).extend(positions)
+
+    @staticmethod
+    def _count(issues):
+        return sum(len(positions) for reasons in issues.values() for positions in reasons.values())
+
+    def rejected_count(self):
+        return self._count(self.rejected)
+
+    def warning_count(self):
+        return self._count(self.warnings)
+
+    def clean(self):
+        return not self.rejected and not self.warnings
+
+    def check_strict(self, strict):
+        if strict and not self.clean():
+            raise ValidationError(self)
+
+    def to_dict(self, max_positions=None):
+        def issues(groups):
+            return {section: {reason: {"count": len(positions), "positions": positions[:max_positions]}
+                              for reason, positions in reasons.items()}
+                    for section, reasons in groups.items()}
+        return {"accepted": dict(self.accepted), "rejected": issues(self.rejected), "warnings": issues(self.warnings)}
+
+    def format(self, max_positions=10):
+        lines = []
+        for title, groups, reasons_text in (("Отклонено", self.rejected, REJECT_REASONS),
+                                            ("Сохранено с замечаниями", self.warnings, WARNING_REASONS)):
+            for section, reasons in groups.items():
+                for reason, positions in reasons.items():
+                    shown = ", ".join(str(p) for p in positions[:max_positions])
+                    more = f" и ещё {len(positions) - max_positions}" if len(positions) > max_positions else ""
+                    lines.append(f"{title} ({SECTION_TITLES.get(section, section)}, {reasons_text[reason]}): "
+                                 f"{len(positions)} — {shown}{more}")
+        return "\n".join(lines) if lines else "Замечаний нет"
+
+
+def _kopecks_or_none(value):
+    if type(value) is bool:
+        return None
+    try:
+        return to_kopecks(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _day_or_none(text):
+    try:
+        return parse_day(text)
+    except (ValueError, TypeError):
+        return None
+
+
+def kopecks_column(values):
+    # Суммы пачки в копейки, None — не число. Если все суммы — числа JSON, они переводятся
+    # одним вычислением numpy; строки, суммы больше чем с двумя знаками и суммы от 2**53 коп.,
+    # где float64 уже не различает соседние копейки, — через to_kopecks
+    if np is None or not values or not set(map(type, values)) <= _NUMBERS:
+        return [_kopecks_or_none(value) for value in values]
+    try:
+        scaled = np.array(values, dtype=np.float64) * KOPECKS
+    except OverflowError:
+        # Целое больше любого float64
+        return [_kopecks_or_none(value) for value in values]
+    rounded = np.rint(scaled)
+    # NaN и бесконечности тоже попадают в inexact и отклоняются в to_kopecks
+    with np.errstate(invalid="ignore"):
+        inexact = ~(np.abs(scaled - rounded) < 1e-3) | ~(np.abs(scaled) < _FLOAT_EXACT)
+    result = np.where(inexact, 0, rounded).astype(np.int64).tolist()
+    for i in np.flatnonzero(inexact).tolist():
+        result[i] = _kopecks_or_none(values[i])
+    return result
+
+
+class RecordValidator:
+    # Записи раздела (incomes/expenses) копятся пачками по VALIDATE_BATCH и проверяются пачкой целиком:
+    # форма [сумма, категория] или [сумма, категория, "ДД.ММ.ГГГГ"] (в старых файлах даты нет), сумма,
+    # знак, дата, категория. Даты повторяются, поэтому каждая строка даты разбирается один раз.
+    # Записи с неизвестной категорией сохраняются, остальные замечания отклоняют запись
+    def __init__(self, section, report, categories=None, strict=False):
+        self.section = section
+        self.report = report
+        self.known = None if categories is None else set(categories)
+        self.strict = strict
+        self.store = RecordStore()
+        self.batch = []
+        self.start = 0
+        self.days = {}
+
+    def add(self, item):
+        self.batch.append(item)
+        if len(self.batch) >= VALIDATE_BATCH:
+            self.flush()
+
+    def extend(self, items):
+        if not isinstance(items, _SEQUENCES):
+            items = list(items)
+        for i in range(0, len(items), VALIDATE_BATCH):
+            self.batch.extend(items[i:i + VALIDATE_BATCH])
+            self.flush()
+
+    def finish(self):
+        self.flush()
+        self.report.accepted[self.section] = len(self.store)
+        return self.store
+
+    def flush(self):
+        items, start = self.batch, self.start
+        if not items:
+            return
+        self.batch = []
+        self.start += len(items)
+        section, report = self.section, self.report
+
+        good = [i for i, item in enumerate(items) if type(item) in _SEQUENCES and 1 < len(item) < 4]
+        if len(good) < len(items):
+            shaped = set(good)
+            report.reject(section, "shape", [start + i for i in range(len(items)) if i not in shaped])
+            items = [items[i] for i in good]
+
+        amounts = kopecks_column([item[0] for item in items])
+        cache = self.days
+        days = []
+        for item in items:
+            if len(item) == 2:
+                days.append(NO_DATE)
+                continue
+            text = item[2]
+            day = cache.get(text, -1) if type(text) is str else None
+            if day == -1:
+                day = cache[text] = _day_or_none(text)
+            days.append(day)
+        categories = [item[1] if type(item[1]) is str else str(item[1]) for item in items]
+
+        ok_amounts, ok_categories, ok_days = [], [], []
+        bad_amounts, negative, bad_days, unknown = [], [], [], []
+        known = self.known
+        for i, amount, category, day in zip(good, amounts, categories, days):
+            if amount is None:
+                bad_amounts.append(start + i)
+            elif amount < 0:
+                negative.append(start + i)
+            elif day is None:
+                bad_days.append(start + i)
+            else:
+                if known is not None and category not in known:
+                    unknown.append(start + i)
+                ok_amounts.append(amount)
+                ok_categories.append(category)
+                ok_days.append(day)
+        report.reject(section, "amount", bad_amounts)
+        report.reject(section, "negative", negative)
+        report.reject(section, "date", bad_days)
+        report.warn(section, "category", unknown)
+        self.store.extend_columns(ok_amounts, ok_categories, ok_days)
+        report.check_strict(self.strict)
+
+
+def parse_records(items, section="records", report=None, categories=None, strict=False):
+    validator = RecordValidator(section, report if report is not None else ValidationReport(), categories, strict)
+    validator.extend(items)
+    return validator.finish()
+
+
+def parse_limits(items, report=None, categories=None, strict=False):
+    report = report if report is not None else ValidationReport()
+    known = None if categories is None else set(categories)
+    limits = {}
+    for cat, val in items.items():
+        cat = str(cat)
+        amount = _kopecks_or_none(val)
+        if amount is None:
+            report.reject("limits", "amount", [cat])
+        elif amount < 0:
+            report.reject("limits", "negative", [cat])
+        else:
+            if known is not None and cat not in known:
+                report.warn("limits", "category", [cat])
+            limits[cat] = amount
+    report.accepted["limits"] = len(limits)
+    report.check_strict(strict)
+    return limits
+
+
+def parse_savings_goals(items, report=None, strict=False):
+    # Цель без корректного срока сохраняется и считается целью без срока
+    report = report if report is not None else ValidationReport()
+    goals = {}
+    for name, info in items.items():
+        name = str(name)
+        if not isinstance(info, dict) or "target" not in info or "deadline_str" not in info:
+            report.reject("savings_goals", "shape", [name])
+            continue
+        target = _kopecks_or_none(info["target"])
+        saved = _kopecks_or_none(info.get("saved", 0))
+        if target is None or saved is None:
+            report.reject("savings_goals", "amount", [name])
+        elif target < 0 or saved < 0:
+            report.reject("savings_goals", "negative", [name])
+        else:
+            deadline_str = str(info["deadline_str"])
+            if deadline_str and _day_or_none(deadline_str) is None:
+                report.warn("savings_goals", "deadline", [name])
+            goals[name] = {"target": target, "deadline_str": deadline_str, "saved": saved}
+    report.accepted["savings_goals"] = len(goals)
+    report.check_strict(strict)
+    return goals
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+class JSONStreamReader:
+    def __init__(self, f, chunk_size=CHUNK_SIZE, progress=None, total=None, cancel=None):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.total = total
+        self.cancel = cancel
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        if self.cancel is not None and self.cancel.is_set():
+            raise OperationCancelled()
+        chunk = self.f.read(size or self.chunk_size)
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self.eof = True
+        text = self.utf8.decode(chunk, final=self.eof)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        if self.progress:
+            self.progress(self.bytes_read, self.total)
+
+    def peek(self):
+        while True:
+            buf = self.buf
+            pos = self.pos = _SKIP_WHITESPACE(buf, self.pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if self.eof:
+                return ""
+            self.fill()
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"Ожидался символ '{ch}' (позиция {self.bytes_read})")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Значение не поместилось в буфер — дочитываем с запасом, чтобы не разбирать его заново много раз
+                self.fill(max(self.chunk_size, len(self.buf)))
+                continue
+            # Число на границе куска может продолжаться в следующем — дочитываем и разбираем снова
+            if end == len(self.buf) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+    def members(self):
+        # Пары ключ — начало значения верхнего уровня; значение читает вызывающий код
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Ключ объекта должен быть строкой")
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"Ожидался символ ',' или '}}' (позиция {self.bytes_read})")
+
+    def items(self):
+        # Элементы массива по одному
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        raw_decode = self.decoder.raw_decode
+        while True:
+            # Быстрый путь: элемент и разделитель после него целиком в буфере
+            buf = self.buf
+            pos = _SKIP_WHITESPACE(buf, self.pos).end()
+            try:
+                obj, end = raw_decode(buf, pos)
+                sep = _SKIP_WHITESPACE(buf, end).end()
+            except json.JSONDecodeError:
+                sep = len(buf)
+            if sep < len(buf):
+                ch = buf[sep]
+                self.pos = sep + 1
+            else:
+                self.pos = pos
+                obj = self.value()
+                ch = self.peek()
+                self.pos += 1
+            yield obj
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"Ожидался символ ',' или ']' (позиция {self.bytes_read})")
+
+def read_ledger(file_path, progress=None, cancel=None, chunk_size=CHUNK_SIZE, categories=None, strict=False):
+    # Потоковое чтение файла экспорта с теми же правилами проверки, что и load_dict.
+    # categories — {раздел: известные категории} для проверки категорий записей и лимитов;
+    # отчёт о проверке возвращается в data["validation"]
+    categories = categories or {}
+    report = ValidationReport()
+    data = {"incomes": RecordStore(), "expenses": RecordStore(), "limits": {}, "savings_goals": {},
+            "validation": report}
+    total = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        reader = JSONStreamReader(f, chunk_size, progress, total, cancel)
+        if reader.peek() != "{":
+            raise ValueError("Файл должен содержать JSON-объект")
+        for key in reader.members():
+            if key in RECORD_KEYS and reader.peek() == "[":
+                validator = RecordValidator(key, report, categories.get(key), strict)
+                for item in reader.items():
+                    validator.add(item)
+                data[key] = validator.finish()
+            elif key in RECORD_KEYS:
+                value = reader.value()
+                data[key] = parse_records(value if isinstance(value, _SEQUENCES) else [], key, report,
+                                          categories.get(key), strict)
+            elif key == "limits":
+                data[key] = parse_limits(reader.value(), report, categories.get("expenses"), strict)
+            elif key == "savings_goals":
+                data[key] = parse_savings_goals(reader.value(), report, strict)
+            elif key == "journal_seq":
+                # Номер последней записи журнала, вошедшей в снимок (см. budget_journal)
+                data[key] = reader.value()
+            else:
+                reader.value()
+        if reader.peek():
+            raise ValueError("Лишние данные после JSON-объекта")
+    return data
+
+
+def _dump_records(f, records, progress, cancel, done, total):
+    # Записи пишутся по одной на строку пачками, без построения полного списка в памяти
+    # Разделитель ставится перед пачкой, чтобы после последней записи не осталось запятой
+    batch = []
+    separator = ""
+    for record in records:
+        batch.append("    " + json.dumps(record_item(*record), ensure_ascii=False))
+        if len(batch) >= WRITE_BATCH:
+            if cancel is not None and cancel.is_set():
+                raise OperationCancelled()
+            f.write(separator + ",\n".join(batch))
+            separator = ",\n"
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, total)
+    if batch:
+        f.write(separator + ",\n".join(batch))
+        separator = ",\n"
+        done += len(batch)
+    if separator:
+        f.write("\n")
+    return done
+
+
+def write_ledger(file_path, incomes, expenses, limits, savings_goals, extra=None, progress=None, cancel=None):
+    # Запись файла экспорта во временный файл с заменой в конце: при отмене или ошибке старый файл цел
+    total = len(incomes) + len(expenses)
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            done = 0
+            f.write("{\n")
+            for key, records in (("incomes", incomes), ("expenses", expenses)):
+                f.write(f'  "{key}": [\n')
+                done = _dump_records(f, records, progress, cancel, done, total)
+                f.write("  ],\n")
+            tail = {"limits": limits_item(limits), "savings_goals": savings_goals_item(savings_goals),
+                    **(extra or {})}
+            body = json.dumps(tail, ensure_ascii=False, indent=2)
+            f.write(body[body.index("\n") + 1:])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress:
+        progress(total, total)
@@ -0,0 +1,133 @@
+import json
+import os
+
+from budget_engine import BudgetEngine
+from budget_io import limits_item, parse_limits, parse_savings_goals, savings_goals_item
+from budget_money import to_kopecks, to_rubles
+from budget_store import NO_DATE
+
+# Сохранение с журналом: каждое изменение дописывается строкой JSON в файл <снимок>.journal,
+# а полный снимок (обычный формат экспорта) переписывается только при сжатии журнала.
+# При загрузке читается снимок и проигрываются записи журнала после него.
+
+COMPACT_EVERY = 10000
+
+
+def apply_record(engine, record):
+    op = record["op"]
+    if op == "add":
+        engine.add(record["kind"], to_kopecks(record["value"]), record["category"], record.get("day", NO_DATE))
+    elif op == "add_many":
+        records = [(to_kopecks(value), category, day) for value, category, day in record["records"]]
+        engine.add_many(record["kind"], records)
+    elif op == "insert":
+        records = [(to_kopecks(value), category, day) for value, category, day in record["records"]]
+        engine.insert_many(record["kind"], record["positions"], records)
+    elif op == "edit":
+        engine.edit(record["kind"], record["idx"], to_kopecks(record["value"]), record["category"], record.get("day"))
+    elif op == "delete":
+        engine.delete(record["kind"], record["indices"])
+    elif op == "recategorize":
+        engine.recategorize(record["kind"], record["indices"], record["category"])
+    elif op == "limits":
+        engine.set_limits(parse_limits(record["limits"]))
+    elif op == "goals":
+        engine.set_savings_goals(parse_savings_goals(record["goals"]))
+    else:
+        raise ValueError(f"Неизвестная операция журнала: {op}")
+
+
+def file_payload(op, payload):
+    # Суммы в журнале — в рублях, как в файле экспорта
+    if op in ("add", "edit"):
+        return {**payload, "value": to_rubles(payload["value"])}
+    if op in ("add_many", "insert"):
+        records = [(to_rubles(value), category, day) for value, category, day in payload["records"]]
+        return {**payload, "records": records}
+    if op == "limits":
+        return {"limits": limits_item(payload["limits"])}
+    if op == "goals":
+        return {"goals": savings_goals_item(payload["goals"])}
+    return payload
+
+
+class LedgerJournal:
+    def __init__(self, file_path, compact_every=COMPACT_EVERY, sync=True):
+        self.file_path = file_path
+        self.journal_path = file_path + ".journal"
+        self.compact_every = compact_every
+        self.sync = sync
+        self.engine = None
+        self.seq = 0
+        self.pending = 0
+        self.f = None
+
+    def open(self, engine=None):
+        engine = engine or BudgetEngine()
+        snapshot_seq = 0
+        if os.path.exists(self.file_path):
+            snapshot_seq = engine.import_file(self.file_path).get("journal_seq", 0)
+        self.seq = snapshot_seq
+        self.pending = 0
+        valid_size = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    # Оборванная последняя строка после сбоя — запись не была подтверждена
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+                    if record["seq"] <= snapshot_seq:
+                        continue
+                    apply_record(engine, record)
+                    self.seq = record["seq"]
+                    self.pending += 1
+        self.f = open(self.journal_path, "ab")
+        if self.f.tell() != valid_size:
+            self.f.truncate(valid_size)
+        self.engine = engine
+        engine.add_listener(self.record)
+        return engine
+
+    def record(self, op, payload):
+        if op == "reset":
+            # Данные заменены целиком (импорт) — дешевле сразу записать снимок
+            self.compact()
+            return
+        self.seq += 1
+        line = json.dumps({"seq": self.seq, "op": op, **file_payload(op, payload)},
+                          ensure_ascii=False, separators=(",", ":"))
+        self.f.write(line.encode("utf-8") + b"\n")
+        self.f.flush()
+        if self.sync:
+            os.fsync(self.f.fileno())
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Снимок пишется во временный файл и атомарно заменяет старый
+        self.engine.export_file(self.file_path, extra={"journal_seq": self.seq})
+        # Записи с номером не больше journal_seq уже в снимке, поэтому сбой до усечения журнала безопасен
+        self.f.truncate(0)
+        self.f.seek(0)
+        self.pending = 0
+
+    def close(self):
+        if self.f is None:
+            return
+        self.engine.remove_listener(self.record)
+        if self.pending:
+            self.compact()
+        self.f.close()
+        self.f = None
+
+
+def open_ledger(file_path, compact_every=COMPACT_EVERY, sync=True):
+    journal = LedgerJournal(file_path, compact_every, sync)
+    engine = journal.open()
+    return engine, journal
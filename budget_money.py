@@ -0,0 +1,50 @@
+import math
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+# Денежные суммы хранятся и складываются как целое число копеек: суммы по категориям
+# и сравнения с лимитами точные, без накопления погрешности float.
+# В файлах экспорта и журнале суммы остаются в рублях (числа JSON с двумя знаками после точки).
+
+KOPECKS = 100
+
+_MONEY_TEXT = re.compile(r"([+-]?)(\d+)(?:[.,](\d{0,2}))?")
+
+
+def parse_money(text):
+    # Строка с суммой в рублях -> копейки; допускается запятая и не больше двух знаков после неё
+    match = _MONEY_TEXT.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"Некорректная сумма: {text!r}")
+    sign, rubles, kopecks = match.groups()
+    value = int(rubles) * KOPECKS + int((kopecks or "").ljust(2, "0"))
+    return -value if sign == "-" else value
+
+
+def to_kopecks(value):
+    # Сумма в рублях из файла (int, float или строка) -> копейки
+    if isinstance(value, str):
+        return parse_money(value)
+    if isinstance(value, int):
+        return value * KOPECKS
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Некорректная сумма: {value!r}")
+    scaled = value * KOPECKS
+    kopecks = round(scaled)
+    if abs(scaled - kopecks) < 1e-3:
+        # Обычный случай: не больше двух знаков после точки, погрешность умножения много меньше копейки
+        return kopecks
+    # Больше двух знаков — округляем десятичную запись числа, а не её двоичное приближение
+    return int(Decimal(repr(value)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_rubles(kopecks):
+    # Копейки -> float для JSON: ближайшее к k/100 число, repr которого — ровно эта десятичная запись
+    return kopecks / KOPECKS
+
+
+def format_money(kopecks):
+    sign = "-" if kopecks < 0 else ""
+    rubles, rest = divmod(abs(kopecks), KOPECKS)
+    return f"{sign}{rubles}.{rest:02d}"
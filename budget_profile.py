@@ -0,0 +1,171 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Профилирование операций по запросу: число вызовов, время и выделенная память для выбранных методов.
+# Включается переменной окружения BUDGET_PROFILE (1 — только время, memory — ещё и память через tracemalloc)
+# или флагом --profile. Методы подменяются обёртками на конкретных объектах при запуске;
+# если профилирование выключено, ничего не подменяется и накладных расходов нет.
+# Результаты смотрятся в окне диагностики и сохраняются в JSON для сравнения версий:
+#   python budget_profile.py старый.json новый.json
+
+PROFILE_ENV = "BUDGET_PROFILE"
+PROFILE_MODES = ("time", "memory")
+DUMP_FORMAT = 1
+
+# Операции окна, движка и списков, которые оборачиваются при включённом профилировании
+APP_OPERATIONS = ("add_income", "add_expense", "edit_income", "edit_expense", "delete_income", "delete_expense",
+                  "check_limit_for_category", "check_all_limits", "calculate", "import_data", "import_csv",
+                  "export_data", "refresh_lists", "apply_filter", "undo", "redo")
+ENGINE_OPERATIONS = ("add", "add_many", "insert_many", "edit", "delete", "recategorize", "check_limit",
+                     "check_all_limits", "limit_warnings", "report", "format_report", "period_report", "replace_all",
+                     "export_file", "import_file", "find")
+LIST_OPERATIONS = ("refresh", "render")
+
+# Поля статистики одной операции
+CALLS, TOTAL, MAX, ALLOCATED = range(4)
+
+
+def mode_from_env(environ=None):
+    # "", "0", "off" — выключено; "memory" — время и память; любое другое значение — только время
+    value = (environ if environ is not None else os.environ).get(PROFILE_ENV, "").strip().lower()
+    if value in ("", "0", "off", "no", "false"):
+        return None
+    return "memory" if value == "memory" else "time"
+
+
+class Profiler:
+    def __init__(self, mode="time"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+        self.track_memory = mode == "memory"
+        self.started = datetime.now()
+        # {операция: [вызовы, суммарное время, максимальное время, выделено байт]}
+        self.stats = {}
+        # Фоновые операции пишут статистику из своего потока
+        self.lock = threading.Lock()
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def wrap(self, name, fn):
+        track_memory = self.track_memory
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Память считается как прирост занятой за вызов; параллельная фоновая операция попадает в замер
+            before = tracemalloc.get_traced_memory()[0] if track_memory else 0
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                allocated = tracemalloc.get_traced_memory()[0] - before if track_memory else 0
+                self.record(name, elapsed, allocated)
+        return wrapper
+
+    def instrument(self, obj, names, prefix=""):
+        # Подмена методов одного объекта, а не класса: другие экземпляры не затрагиваются
+        for name in names:
+            method = getattr(obj, name, None)
+            if callable(method):
+                setattr(obj, name, self.wrap(prefix + name, method))
+
+    def record(self, name, elapsed, allocated=0):
+        with self.lock:
+            entry = self.stats.get(name)
+            if entry is None:
+                entry = self.stats[name] = [0, 0.0, 0.0, 0]
+            entry[CALLS] += 1
+            entry[TOTAL] += elapsed
+            entry[MAX] = max(entry[MAX], elapsed)
+            entry[ALLOCATED] += allocated
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.started = datetime.now()
+
+    def rows(self):
+        # [(операция, вызовы, всего мс, среднее мс, максимум мс, выделено КиБ)] — самые долгие первыми
+        with self.lock:
+            items = [(name, *entry) for name, entry in self.stats.items()]
+        items.sort(key=lambda item: item[1 + TOTAL], reverse=True)
+        return [(name, calls, total * 1000, total * 1000 / calls, longest * 1000, allocated / 1024)
+                for name, calls, total, longest, allocated in items]
+
+    def to_dict(self, extra=None):
+        data = {
+            "format": DUMP_FORMAT,
+            "mode": self.mode,
+            "started": self.started.isoformat(timespec="seconds"),
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "operations": {name: {"calls": calls, "total_ms": round(total, 3), "mean_ms": round(mean, 3),
+                                  "max_ms": round(longest, 3), "allocated_kib": round(allocated, 1)}
+                           for name, calls, total, mean, longest, allocated in self.rows()},
+        }
+        data.update(extra or {})
+        return data
+
+    def dump(self, file_path, extra=None):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(extra), f, ensure_ascii=False, indent=2)
+
+    def format_table(self):
+        lines = [f"{'Операция':<32} {'Вызовы':>7} {'Всего, мс':>11} {'Среднее':>9} {'Максимум':>9} {'КиБ':>9}"]
+        for name, calls, total, mean, longest, allocated in self.rows():
+            memory = f"{allocated:9.1f}" if self.track_memory else f"{'-':>9}"
+            lines.append(f"{name:<32} {calls:>7} {total:11.2f} {mean:9.3f} {longest:9.3f} {memory}")
+        return "\n".join(lines)
+
+
+def load_dump(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != DUMP_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат профиля: {data.get('format')}")
+    return data
+
+
+def compare_dumps(old, new):
+    # Среднее время операций двух профилей: [(операция, было мс, стало мс, изменение в % или None)]
+    rows = []
+    old_ops, new_ops = old["operations"], new["operations"]
+    for name in sorted(set(old_ops) | set(new_ops)):
+        before = old_ops.get(name, {}).get("mean_ms")
+        after = new_ops.get(name, {}).get("mean_ms")
+        change = (after - before) * 100 / before if before and after is not None else None
+        rows.append((name, before, after, change))
+    return rows
+
+
+def format_comparison(rows):
+    def cell(value):
+        return f"{value:10.3f}" if value is not None else f"{'-':>10}"
+
+    lines = [f"{'Операция':<32} {'Было, мс':>10} {'Стало, мс':>10} {'Изменение':>10}"]
+    for name, before, after, change in rows:
+        percent = f"{change:+9.1f}%" if change is not None else f"{'-':>10}"
+        lines.append(f"{name:<32} {cell(before)} {cell(after)} {percent}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение двух сохранённых профилей калькулятора бюджета")
+    parser.add_argument("old", help="профиль прежней версии (JSON)")
+    parser.add_argument("new", help="профиль новой версии (JSON)")
+    args = parser.parse_args(argv)
+    print(format_comparison(compare_dumps(load_dump(args.old), load_dump(args.new))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import http.client
+import json
+import queue
+import socket
+import threading
+import uuid
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+
+from budget_engine import BudgetEngine, KINDS
+from budget_io import format_day, limits_item, parse_day, parse_limits, parse_savings_goals, record_item, \
+    savings_goals_item
+from budget_money import KOPECKS, to_kopecks, to_rubles
+from budget_store import NO_DATE
+
+# Движок-клиент сервера бюджета (budget_server.py): окно работает с ним так же, как с локальным движком.
+# Изменения отправляются на сервер, записи читаются страницами и кэшируются до следующего изменения,
+# суммы по категориям — одним запросом на версию данных. Изменения других клиентов приходят
+# потоком событий в фоновом потоке и применяются в главном потоке через poll_events().
+
+# Записей в странице для списков окна и для экспорта
+PAGE_SIZE = 500
+EXPORT_PAGE_SIZE = 20000
+TIMEOUT_SECONDS = 30
+# Сервер шлёт пустое событие каждые 15 с; дольше тишины — соединение считается оборванным
+EVENTS_TIMEOUT_SECONDS = 60
+# Пауза перед повторным подключением к потоку событий
+RECONNECT_SECONDS = 2
+# Операции, после которых заново читаются лимиты и цели
+STATE_OPS = ("limits", "goals", "reset")
+
+
+class RemoteError(OSError):
+    pass
+
+
+def record_from_item(item):
+    # [рубли, категория[, "ДД.ММ.ГГГГ"]] -> (копейки, категория, день)
+    return to_kopecks(item[0]), item[1], parse_day(item[2]) if len(item) > 2 and item[2] else NO_DATE
+
+
+def record_to_item(value, category, day=None):
+    # Без дня (None) сервер ставит сегодняшнюю дату при добавлении и оставляет прежнюю при изменении
+    return [to_rubles(value), category] if day is None else record_item(value, category, day)
+
+
+class RemoteRecords:
+    def __init__(self, engine, kind):
+        self.engine = engine
+        self.kind = kind
+        self.pages = {}
+        self.count = None
+
+    def invalidate(self):
+        self.pages = {}
+        self.count = None
+
+    def fetch(self, start, count):
+        data = self.engine.request("GET", f"/records/{self.kind}", start=start, count=count)
+        self.count = data["total"]
+        return [record_from_item(item) for item in data["records"]]
+
+    def page(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = self.fetch(number * PAGE_SIZE, PAGE_SIZE)
+        return page
+
+    def __len__(self):
+        if self.count is None:
+            self.page(0)
+        return self.count
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self.page(idx // PAGE_SIZE)[idx % PAGE_SIZE]
+
+    def __iter__(self):
+        # Экспорт читает крупными страницами мимо кэша списков
+        start = 0
+        while start < len(self):
+            page = self.fetch(start, EXPORT_PAGE_SIZE)
+            if not page:
+                break
+            yield from page
+            start += len(page)
+
+
+class RemoteEngine(BudgetEngine):
+    def __init__(self, url):
+        super().__init__()
+        parts = urlsplit(url if "//" in url else "http://" + url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        # Изменения этого клиента сервер помечает его идентификатором — свои события в потоке пропускаются
+        self.client_id = uuid.uuid4().hex
+        self.local = threading.local()
+        self.incomes = RemoteRecords(self, "incomes")
+        self.expenses = RemoteRecords(self, "expenses")
+        # {период: суммы по категориям} до следующего изменения
+        self._totals_snapshot = {}
+        self.events = queue.Queue()
+        self.closed = threading.Event()
+        self.event_conn = None
+        version = self.load_state()
+        self.event_thread = threading.Thread(target=self.listen_events, args=(version,), daemon=True)
+        self.event_thread.start()
+
+    # --- HTTP ---
+
+    def connection(self):
+        # Отдельное соединение на поток: окно и фоновые операции обращаются к серверу одновременно
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT_SECONDS)
+        return conn
+
+    def request(self, method, path, body=None, **query):
+        url = path + ("?" + urlencode(query) if query else "")
+        data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers = {"X-Client": self.client_id, "Content-Type": "application/json"}
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.request(method, url, data, headers)
+                response = conn.getresponse()
+                payload = json.loads(response.read())
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # Сервер закрыл простаивавшее соединение до получения запроса — повторяем один раз
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+        if response.status == 400:
+            raise ValueError(payload.get("error", "Некорректный запрос"))
+        if response.status != 200:
+            raise RemoteError(f"Сервер бюджета: {response.status} {payload.get('error', '')}")
+        return payload
+
+    def load_state(self):
+        state = self.request("GET", "/state")
+        self.income_types[:] = state["income_types"]
+        self.expense_types[:] = state["expense_types"]
+        self.limits = parse_limits(state["limits"])
+        self.savings_goals = parse_savings_goals(state["savings_goals"])
+        self._parse_deadlines()
+        return state["version"]
+
+    def _changed(self, op, **payload):
+        # После своего изменения: сбросить кэши и уведомить подписчиков, как локальный движок
+        self._forget()
+        self._emit(op, **payload)
+
+    def _forget(self):
+        self._totals_snapshot = {}
+        for kind in KINDS:
+            self.records(kind).invalidate()
+
+    # --- события других клиентов ---
+
+    def listen_events(self, seen_version):
+        # Фоновый поток: читает GET /events и складывает события в очередь. При подключении сервер сообщает
+        # версию данных; если она отличается от последней известной (изменения между чтением состояния
+        # и подключением или во время обрыва), в очередь ставится полная перезагрузка
+        while not self.closed.is_set():
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=EVENTS_TIMEOUT_SECONDS)
+            self.event_conn = conn
+            try:
+                conn.request("GET", "/events", headers={"X-Client": self.client_id})
+                response = conn.getresponse()
+                for line in response:
+                    if not line.startswith(b"data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    if event["type"] == "hello":
+                        if event["version"] != seen_version:
+                            self.events.put({"type": "change", "op": "reset", "kind": None, "origin": None})
+                    else:
+                        self.events.put(event)
+                    seen_version = event["version"]
+            except (OSError, ValueError, http.client.HTTPException):
+                pass
+            finally:
+                conn.close()
+            self.closed.wait(RECONNECT_SECONDS)
+
+    def poll_events(self):
+        # Вызывается из главного потока. Применяет изменения других клиентов; возвращает
+        # (были ли изменения, [(уровень, сообщение)] для лимитов, сменивших уровень из-за чужих изменений)
+        changed = False
+        limit_events = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event.get("origin") == self.client_id:
+                continue
+            if event["type"] == "change":
+                changed = True
+                self._forget()
+                if event["op"] in STATE_OPS:
+                    self.load_state()
+                op = event["op"] if event["op"] in STATE_OPS or event["kind"] else "reset"
+                self._invalidate_report(op, {"kind": event["kind"]})
+            elif event["type"] == "limit" and event["level"]:
+                limit_events.append((event["level"], event["message"]))
+        return changed, limit_events
+
+    def close(self):
+        self.closed.set()
+        conn = self.event_conn
+        if conn is not None and conn.sock is not None:
+            # Прерывает чтение потока событий в фоновом потоке
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # --- изменение данных ---
+
+    def add(self, kind, value, category, day=None):
+        return self.add_many(kind, [(value, category, day)])[0]
+
+    def add_many(self, kind, records):
+        records = list(records)
+        data = self.request("POST", f"/records/{kind}",
+                            {"records": [record_to_item(*item) for item in records]})
+        self._changed("add_many", kind=kind, records=records)
+        return range(data["start"], data["stop"])
+
+    def edit(self, kind, idx, value, category, day=None):
+        data = self.request("PUT", f"/records/{kind}/{idx}",
+                            {"record": record_to_item(value, category, day)})
+        self._changed("edit", kind=kind, idx=idx, value=value, category=category, day=day)
+        return record_from_item(data["old"])
+
+    def delete(self, kind, indices):
+        indices = sorted(set(indices))
+        data = self.request("POST", f"/records/{kind}/delete", {"indices": indices})
+        self._changed("delete", kind=kind, indices=indices)
+        return set(data["affected"])
+
+    def recategorize(self, kind, indices, category):
+        indices = sorted(set(indices))
+        data = self.request("POST", f"/records/{kind}/recategorize",
+                            {"indices": indices, "category": category})
+        self._changed("recategorize", kind=kind, indices=indices, category=category)
+        return set(data["affected"])
+
+    def move_category(self, kind, old_category, new_category):
+        data = self.request("POST", f"/records/{kind}/move",
+                            {"from": old_category, "to": new_category})
+        self._changed("recategorize", kind=kind, category=new_category)
+        return set(data["affected"])
+
+    def set_limits(self, limits):
+        self.request("PUT", "/limits", {"limits": limits_item(limits)})
+        self.limits = dict(limits)
+        self._changed("limits", limits=self.limits)
+
+    def set_savings_goals(self, goals):
+        self.request("PUT", "/goals", {"goals": savings_goals_item(goals)})
+        self.savings_goals = {name: dict(info) for name, info in goals.items()}
+        self._parse_deadlines()
+        self._changed("goals", goals=self.savings_goals)
+
+    def replace_all(self, incomes, expenses, limits, savings_goals):
+        self.request("POST", "/replace", {
+            "incomes": [record_item(*item) for item in incomes],
+            "expenses": [record_item(*item) for item in expenses],
+            "limits": limits_item(limits),
+            "savings_goals": savings_goals_item(savings_goals),
+        })
+        self.load_state()
+        self._changed("reset")
+
+    def find(self, kind, categories=None, amount_range=None, text="", period=None):
+        low, high = amount_range or (None, None)
+        body = {"categories": None if categories is None else list(categories),
+                "min": None if low is None else to_rubles(low), "max": None if high is None else to_rubles(high),
+                "text": text, "period": f"{format_day(period[0])}:{format_day(period[1])}" if period else None}
+        return self.request("POST", f"/records/{kind}/query", body)["positions"]
+
+    # --- суммы: с сервера, одним снимком на версию данных и период ---
+
+    def totals_snapshot(self, period=None):
+        period = period or self.period
+        snapshot = self._totals_snapshot.get(period)
+        if snapshot is None:
+            query = {"period": f"{format_day(period[0])}:{format_day(period[1])}"} if period else {}
+            totals = self.request("GET", "/totals", **query)["totals"]
+            snapshot = self._totals_snapshot[period] = {
+                kind: {cat: to_kopecks(value) for cat, value in totals[kind].items()} for kind in KINDS}
+        return snapshot
+
+    def _totals_add(self, kind, value, category):
+        pass
+
+    def _totals_remove(self, kind, value, category):
+        pass
+
+    def rebuild_totals(self):
+        pass
+
+    def verify_totals(self):
+        # Накопительные суммы держит сервер
+        return []
+
+    def category_totals(self, kind, period=None):
+        return dict(self.totals_snapshot(period)[kind])
+
+    def category_total(self, kind, category, period=None):
+        return self.totals_snapshot(period)[kind].get(category, 0)
+
+    def total(self, kind, period=None):
+        return sum(self.totals_snapshot(period)[kind].values())
+
+    def goal_funding(self):
+        def build():
+            data = self.request("GET", "/funding")
+            return to_kopecks(data["balance"]), data["daily_rate"] * KOPECKS
+        return self._cached("funding", build, key=date.today())
+
+    def period_report(self, period=None):
+        period = period or self.period
+        query = {"period": f"{format_day(period[0])}:{format_day(period[1])}"} if period else {}
+        rows = self.request("GET", "/period-report", **query)["rows"]
+        return [{**row, **{key: to_kopecks(row[key]) for key in ("income", "expense", "balance")}} for row in rows]
@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from budget_cli import json_report, parse_period
+from budget_engine import BudgetEngine, KINDS
+from budget_io import (ValidationReport, format_day, limits_item, parse_day, parse_savings_goals, record_item,
+                       savings_goals_item)
+from budget_journal import open_ledger
+from budget_money import to_kopecks, to_rubles
+from budget_sqlite import SQLiteEngine
+
+# Общий бюджет для нескольких клиентов: локальный HTTP-сервер с JSON API на asyncio (без внешних зависимостей).
+# Все изменения выполняются в цикле событий по одному под исключительной блокировкой, поэтому они строго
+# упорядочены, а каждое изменение увеличивает номер версии данных. Тяжёлые чтения (отчёт, отчёт по месяцам)
+# идут в пуле потоков под разделяемой блокировкой: несколько отчётов считаются одновременно, а записи ждут
+# их окончания, так что каждый ответ — согласованный снимок одной версии. Лёгкие чтения выполняются прямо
+# в цикле событий между изменениями. Запросы за период (?period=) тоже идут в пуле потоков под разделяемой
+# блокировкой: период передаётся в расчёт явно, а выбранный период движка сервер не меняет.
+# Подписчики GET /events (Server-Sent Events) получают изменения и смену уровня лимитов.
+# Суммы в запросах и ответах — в рублях, как в файлах экспорта; даты — ДД.ММ.ГГГГ.
+# Запуск: python budget_server.py [--journal ФАЙЛ | --db ФАЙЛ | --file ФАЙЛ] [--host 127.0.0.1] [--port 8765]
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Записей в одной странице GET /records по умолчанию и максимум
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 100000
+MAX_BODY = 64 << 20
+# Очередь событий подписчика: отстающий подписчик отключается, а не задерживает сервер
+SUBSCRIBER_QUEUE = 1000
+HEARTBEAT_SECONDS = 15
+# Клиент передаёт свой идентификатор, чтобы узнавать свои изменения в потоке событий
+CLIENT_HEADER = "x-client"
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class ReadWriteLock:
+    # Чтения идут параллельно, запись — одна и без чтений; ожидающая запись не пропускает новые чтения
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: not self.writing and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self.cond:
+                self.readers -= 1
+                self.cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        async with self.cond:
+            self.waiting_writers += 1
+            try:
+                await self.cond.wait_for(lambda: not self.writing and not self.readers)
+            finally:
+                self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            async with self.cond:
+                self.writing = False
+                self.cond.notify_all()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_kind(kind):
+    if kind not in KINDS:
+        raise HTTPError(404, f"Неизвестный тип записей: {kind}")
+    return kind
+
+
+def parse_record(item, default_day=None):
+    # [сумма в рублях, категория[, "ДД.ММ.ГГГГ"]] -> (копейки, категория, день или default_day)
+    if not isinstance(item, (list, tuple)) or len(item) not in (2, 3) or not isinstance(item[1], str):
+        raise ValueError(f"Некорректная запись: {item!r}")
+    value = to_kopecks(item[0])
+    if value < 0:
+        raise ValueError(f"Отрицательная сумма: {item[0]!r}")
+    day = parse_day(item[2]) if len(item) == 3 and item[2] else default_day
+    return value, item[1], day
+
+
+def query_period(query):
+    # ?period=ДД.ММ.ГГГГ:ДД.ММ.ГГГГ
+    text = query.get("period", [""])[0]
+    if not text:
+        return None
+    try:
+        return parse_period(text)
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(str(e))
+
+
+def query_int(query, name, default):
+    return int(query.get(name, [default])[0])
+
+
+class BudgetServer:
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = ReadWriteLock()
+        self.version = 0
+        # Идентификатор клиента, чьё изменение сейчас выполняется (попадает в событие)
+        self.origin = None
+        self.subscribers = set()
+        self.limit_levels = self.current_limit_levels()
+        engine.add_listener(self.on_change)
+        # (метод, шаблон пути, обработчик, режим): read — в цикле событий, heavy — в пуле потоков
+        # под разделяемой блокировкой, write — под исключительной. Запрос с ?period= выполняется как heavy
+        self.routes = [(method, re.compile(pattern), handler, mode) for method, pattern, handler, mode in (
+            ("GET", r"/state", self.get_state, "read"),
+            ("GET", r"/records/(?P<kind>\w+)", self.get_records, "heavy"),
+            ("GET", r"/totals", self.get_totals, "read"),
+            ("GET", r"/funding", self.get_funding, "read"),
+            ("GET", r"/limits/warnings", self.get_limit_warnings, "read"),
+            ("GET", r"/report", self.get_report, "heavy"),
+            ("GET", r"/report/text", self.get_report_text, "heavy"),
+            ("GET", r"/period-report", self.get_period_report, "heavy"),
+            ("POST", r"/records/(?P<kind>\w+)", self.add_records, "write"),
+            ("PUT", r"/records/(?P<kind>\w+)/(?P<idx>\d+)", self.edit_record, "write"),
+            ("POST", r"/records/(?P<kind>\w+)/delete", self.delete_records, "write"),
+            ("POST", r"/records/(?P<kind>\w+)/recategorize", self.recategorize_records, "write"),
+            ("POST", r"/records/(?P<kind>\w+)/move", self.move_category, "write"),
+            ("POST", r"/records/(?P<kind>\w+)/query", self.query_records, "read"),
+            ("PUT", r"/limits", self.put_limits, "write"),
+            ("PUT", r"/goals", self.put_goals, "write"),
+            ("POST", r"/replace", self.replace, "write"),
+        )]
+
+    # --- события ---
+
+    def current_limit_levels(self):
+        levels = {}
+        for cat in self.engine.limits:
+            status = self.engine.check_limit(cat)
+            levels[cat] = status[0] if status else None
+        return levels
+
+    def on_change(self, op, payload):
+        # Вызывается движком после каждого изменения, всегда в цикле событий под исключительной блокировкой
+        self.version += 1
+        self.publish({"type": "change", "op": op, "kind": payload.get("kind"), "version": self.version,
+                      "origin": self.origin})
+        if op in ("limits", "reset") or payload.get("kind") == "expenses":
+            # Событие — только при смене уровня лимита категории, а не на каждый расход сверх лимита
+            levels = self.current_limit_levels()
+            for cat, level in levels.items():
+                if level != self.limit_levels.get(cat):
+                    status = self.engine.check_limit(cat)
+                    self.publish({"type": "limit", "category": cat, "level": level,
+                                  "message": status[1] if status else "", "version": self.version,
+                                  "origin": self.origin})
+            self.limit_levels = levels
+
+    def publish(self, event):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Освобождаем место под None: поток событий этого подписчика закроется
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream_events(self, writer):
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self.subscribers.add(queue)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        # Первое событие — текущая версия: по ней клиент после переподключения понимает, пропустил ли изменения
+        writer.write(self.event_bytes({"type": "hello", "version": self.version}))
+        try:
+            while True:
+                await writer.drain()
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                    continue
+                if event is None:
+                    break
+                writer.write(self.event_bytes(event))
+        finally:
+            self.subscribers.discard(queue)
+
+    @staticmethod
+    def event_bytes(event):
+        return b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, http_version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                keep_alive = http_version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if length > MAX_BODY:
+                    self.respond(writer, 413, {"error": "Слишком большой запрос"}, False)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+                url = urlsplit(target)
+                if method == "GET" and url.path == "/events":
+                    await self.stream_events(writer)
+                    break
+                status, payload = await self.dispatch(method, url.path, parse_qs(url.query), body,
+                                                      headers.get(CLIENT_HEADER))
+                self.respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def respond(writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        connection = "keep-alive" if keep_alive else "close"
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: {connection}\r\n\r\n".encode("latin-1") + data)
+
+    async def dispatch(self, method, path, query, body, origin):
+        path_known = False
+        for route_method, pattern, handler, mode in self.routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            path_known = True
+            if route_method != method:
+                continue
+            try:
+                request = {"query": query, "body": json.loads(body) if body else None, **match.groupdict()}
+                if "kind" in request:
+                    parse_kind(request["kind"])
+                result = await self.run(handler, mode, request, origin)
+            except HTTPError as e:
+                return e.status, {"error": str(e)}
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                return 400, {"error": str(e) or type(e).__name__}
+            except Exception as e:
+                return 500, {"error": f"{type(e).__name__}: {e}"}
+            return 200, result
+        if path_known:
+            return 405, {"error": f"Метод {method} не поддерживается для {path}"}
+        return 404, {"error": f"Неизвестный путь: {path}"}
+
+    async def run(self, handler, mode, request, origin):
+        # Изменения всегда относятся ко всем данным; период учитывается только при чтении
+        period = request["period"] = query_period(request["query"]) if mode != "write" else None
+        if mode == "write":
+            async with self.lock.write():
+                self.origin = origin
+                try:
+                    result = handler(request)
+                finally:
+                    self.origin = None
+        elif mode == "heavy" or period is not None:
+            async with self.lock.read():
+                result = await asyncio.get_running_loop().run_in_executor(None, handler, request)
+        else:
+            result = handler(request)
+        result["version"] = self.version
+        return result
+
+    # --- чтение ---
+
+    def get_state(self, request):
+        engine = self.engine
+        return {
+            "income_types": engine.income_types,
+            "expense_types": engine.expense_types,
+            "counts": {kind: len(engine.records(kind)) for kind in KINDS},
+            "limits": limits_item(engine.limits),
+            "savings_goals": savings_goals_item(engine.savings_goals),
+        }
+
+    def get_records(self, request):
+        # Страница записей: ?start=0&count=1000; позиции — как в списках окна
+        records = self.engine.records(request["kind"])
+        total = len(records)
+        start = max(0, query_int(request["query"], "start", 0))
+        count = min(MAX_PAGE_SIZE, max(0, query_int(request["query"], "count", PAGE_SIZE)))
+        stop = min(total, start + count)
+        return {"total": total, "start": start,
+                "records": [record_item(*record) for record in records.rows(start, stop)]}
+
+    def get_totals(self, request):
+        # Суммы по категориям за период ?period= (без него — за всё время) — из них клиент считает итоги
+        # и проверяет лимиты
+        period = request["period"]
+        totals = {kind: self.engine.category_totals(kind, period) for kind in KINDS}
+        return {"period": [format_day(day) for day in period] if period else None,
+                "totals": {kind: {cat: to_rubles(value) for cat, value in totals[kind].items()} for kind in KINDS}}
+
+    def get_funding(self, request):
+        balance, daily_rate = self.engine.goal_funding()
+        return {"balance": to_rubles(balance), "daily_rate": to_rubles(daily_rate)}
+
+    def query_records(self, request):
+        # {"categories": [...] или null, "min": рубли, "max": рубли, "text": "", "period": "ДД.ММ.ГГГГ:ДД.ММ.ГГГГ"}
+        body = request["body"] or {}
+        low, high = (None if body.get(key) is None else to_kopecks(body[key]) for key in ("min", "max"))
+        amount_range = None if low is None and high is None else (low, high)
+        period = query_period({"period": [body.get("period") or ""]})
+        positions = self.engine.find(request["kind"], body.get("categories"), amount_range, body.get("text", ""),
+                                     period)
+        return {"positions": positions}
+
+    def get_limit_warnings(self, request):
+        return {"warnings": self.engine.limit_warnings(period=request["period"])}
+
+    def get_report(self, request):
+        return {"report": json_report(self.engine.report(period=request["period"]))}
+
+    def get_report_text(self, request):
+        period = request["period"]
+        engine = self.engine
+        return {"text": engine.format_report(engine.report(period=period)) if period else engine.format_report()}
+
+    def get_period_report(self, request):
+        rows = self.engine.period_report(request["period"])
+        return {"rows": [{**row, **{key: to_rubles(row[key]) for key in ("income", "expense", "balance")}}
+                         for row in rows],
+                "text": self.engine.format_period_report(rows)}
+
+    # --- изменения ---
+
+    def add_records(self, request):
+        # {"records": [[сумма, категория, "ДД.ММ.ГГГГ"?], ...]}; без даты — сегодняшний день
+        records = [parse_record(item) for item in request["body"]["records"]]
+        added = self.engine.add_many(request["kind"], records)
+        return {"start": added.start, "stop": added.stop}
+
+    def edit_record(self, request):
+        # {"record": [сумма, категория, "ДД.ММ.ГГГГ"?]}; без даты — прежняя дата записи
+        value, category, day = parse_record(request["body"]["record"])
+        old = self.engine.edit(request["kind"], int(request["idx"]), value, category, day)
+        return {"old": record_item(*old)}
+
+    def delete_records(self, request):
+        affected = self.engine.delete(request["kind"], [int(idx) for idx in request["body"]["indices"]])
+        return {"affected": sorted(affected)}
+
+    def recategorize_records(self, request):
+        body = request["body"]
+        affected = self.engine.recategorize(request["kind"], [int(idx) for idx in body["indices"]],
+                                            str(body["category"]))
+        return {"affected": sorted(affected)}
+
+    def move_category(self, request):
+        body = request["body"]
+        affected = self.engine.move_category(request["kind"], str(body["from"]), str(body["to"]))
+        return {"affected": sorted(affected)}
+
+    def put_limits(self, request):
+        limits = {}
+        for cat, value in request["body"]["limits"].items():
+            limits[cat] = to_kopecks(value)
+            if limits[cat] < 0:
+                raise ValueError(f"Отрицательный лимит: {cat}")
+        self.engine.set_limits(limits)
+        return {"warnings": self.engine.limit_warnings()}
+
+    def put_goals(self, request):
+        # Проверка как при импорте: некорректные и отрицательные суммы — отказ (400), неверный срок — цель без срока
+        items = {name: {"deadline_str": "", **info} if isinstance(info, dict) else info
+                 for name, info in request["body"]["goals"].items()}
+        report = ValidationReport()
+        goals = parse_savings_goals(items, report)
+        if report.rejected:
+            raise ValueError(report.format())
+        self.engine.set_savings_goals(goals)
+        return {}
+
+    def replace(self, request):
+        # Полная замена данных, тело — в формате файла экспорта; ?strict=1 — отказ при любом замечании
+        strict = request["query"].get("strict", ["0"])[0] not in ("", "0")
+        report = self.engine.load_dict(request["body"], strict)
+        return {"validation": report.to_dict()}
+
+
+async def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    server = BudgetServer(engine)
+    tcp = await asyncio.start_server(server.handle_connection, host, port)
+    if ready is not None:
+        ready(tcp.sockets[0].getsockname()[1])
+    async with tcp:
+        await tcp.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Общий бюджет для нескольких клиентов: локальный JSON API")
+    storage = parser.add_mutually_exclusive_group()
+    storage.add_argument("--journal", metavar="ФАЙЛ", help="хранить данные в файле с журналом изменений")
+    storage.add_argument("--db", metavar="ФАЙЛ", help="хранить данные в базе SQLite")
+    storage.add_argument("--file", metavar="ФАЙЛ", help="загрузить файл экспорта (изменения не сохраняются)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"адрес (по умолчанию {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"порт (по умолчанию {DEFAULT_PORT}, 0 — любой свободный)")
+    args = parser.parse_args(argv)
+
+    journal = None
+    if args.journal:
+        engine, journal = open_ledger(args.journal)
+    elif args.db:
+        engine = SQLiteEngine(args.db)
+    else:
+        engine = BudgetEngine()
+        if args.file:
+            engine.import_file(args.file)
+    try:
+        asyncio.run(serve(engine, args.host, args.port,
+                          lambda port: print(f"Сервер бюджета: http://{args.host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal:
+            journal.close()
+        if args.db:
+            engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+import argparse
+import sqlite3
+from array import array
+from bisect import bisect_left
+from itertools import chain
+
+from budget_engine import BudgetEngine, KINDS
+from budget_money import format_money
+from budget_store import _BULK_DELETE_THRESHOLD, NO_DATE
+
+# Хранение данных в SQLite: записи не загружаются в память целиком, суммы по категориям
+# и проверки лимитов выполняются агрегатными запросами по индексу (kind, category).
+# В памяти держится только список rowid по порядку записей (8 байт на запись),
+# чтобы позиции в списках окна соответствовали строкам таблицы.
+
+# Суммы хранятся в копейках (INTEGER), агрегаты SUM по ним точные
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    day INTEGER NOT NULL DEFAULT 0
+);
+-- В индекс включена сумма, чтобы агрегаты по категории читались только из индекса
+CREATE INDEX IF NOT EXISTS entries_kind_category ON entries (kind, category, amount);
+-- Фильтр по диапазону сумм без категорий
+CREATE INDEX IF NOT EXISTS entries_kind_amount ON entries (kind, amount);
+CREATE TABLE IF NOT EXISTS limits (
+    category TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS savings_goals (
+    name TEXT PRIMARY KEY,
+    target INTEGER NOT NULL,
+    deadline_str TEXT NOT NULL,
+    saved INTEGER NOT NULL
+);
+"""
+
+# PRAGMA user_version: 1 — суммы в копейках. В базах версии 0 суммы — REAL в рублях,
+# таблицы пересоздаются с переводом в копейки (индексы затем создаёт SCHEMA)
+SCHEMA_VERSION = 1
+KOPECKS_MIGRATION = """
+BEGIN;
+CREATE TABLE entries_new (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    day INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO entries_new (id, kind, amount, category, day)
+    SELECT id, kind, CAST(ROUND(amount * 100) AS INTEGER), category, day FROM entries;
+DROP TABLE entries;
+ALTER TABLE entries_new RENAME TO entries;
+CREATE TABLE limits_new (
+    category TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL
+);
+INSERT INTO limits_new SELECT category, CAST(ROUND(amount * 100) AS INTEGER) FROM limits;
+DROP TABLE limits;
+ALTER TABLE limits_new RENAME TO limits;
+CREATE TABLE savings_goals_new (
+    name TEXT PRIMARY KEY,
+    target INTEGER NOT NULL,
+    deadline_str TEXT NOT NULL,
+    saved INTEGER NOT NULL
+);
+INSERT INTO savings_goals_new
+    SELECT name, CAST(ROUND(target * 100) AS INTEGER), deadline_str, CAST(ROUND(saved * 100) AS INTEGER)
+    FROM savings_goals;
+DROP TABLE savings_goals;
+ALTER TABLE savings_goals_new RENAME TO savings_goals;
+COMMIT;
+"""
+
+# Индекс по дате создаётся после миграции старых баз без колонки day
+DATE_INDEX = "CREATE INDEX IF NOT EXISTS entries_kind_day ON entries (kind, day, category, amount)"
+
+# Ограничение числа параметров в одном запросе SQLite
+_BATCH = 500
+# Шаг id при перенумерации записей, когда для вставки между соседями не осталось свободных id
+_ID_STEP = 1024
+
+
+class SQLiteRecords:
+    def __init__(self, conn, kind):
+        self.conn = conn
+        self.kind = kind
+        self.rowids = array("q", (row[0] for row in conn.execute(
+            "SELECT id FROM entries WHERE kind = ? ORDER BY id", (kind,))))
+
+    def __len__(self):
+        return len(self.rowids)
+
+    def __getitem__(self, idx):
+        return self.conn.execute("SELECT amount, category, day FROM entries WHERE id = ?",
+                                 (self.rowids[idx],)).fetchone()
+
+    def __setitem__(self, idx, record):
+        value, category, day = record
+        self.conn.execute("UPDATE entries SET amount = ?, category = ?, day = ? WHERE id = ?",
+                          (value, category, day, self.rowids[idx]))
+
+    def __iter__(self):
+        return iter(self.conn.execute(
+            "SELECT amount, category, day FROM entries WHERE kind = ? ORDER BY id", (self.kind,)))
+
+    def rows(self, start, stop):
+        # Страница записей одним запросом по диапазону id
+        if start >= stop:
+            return []
+        return self.conn.execute(
+            "SELECT amount, category, day FROM entries WHERE kind = ? AND id BETWEEN ? AND ? ORDER BY id",
+            (self.kind, self.rowids[start], self.rowids[stop - 1])).fetchall()
+
+    def append(self, value, category, day=NO_DATE):
+        cur = self.conn.execute("INSERT INTO entries (kind, amount, category, day) VALUES (?, ?, ?, ?)",
+                                (self.kind, value, category, day))
+        self.rowids.append(cur.lastrowid)
+
+    def extend(self, records):
+        # Одна вставка на пакет; новые id больше всех существующих
+        last = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+        self.conn.executemany("INSERT INTO entries (kind, amount, category, day) VALUES (?, ?, ?, ?)",
+                              ((self.kind, *record) for record in records))
+        self.rowids.extend(row[0] for row in self.conn.execute(
+            "SELECT id FROM entries WHERE kind = ? AND id > ? ORDER BY id", (self.kind, last)))
+
+    def set_category(self, indices, category):
+        ids = [self.rowids[idx] for idx in indices]
+        changed = []
+        for start in range(0, len(ids), _BATCH):
+            batch = ids[start:start + _BATCH]
+            marks = ",".join("?" * len(batch))
+            changed.extend(self.conn.execute(
+                f"SELECT amount, category FROM entries WHERE id IN ({marks}) AND category != ?", (*batch, category)))
+            self.conn.execute(f"UPDATE entries SET category = ? WHERE id IN ({marks})", (category, *batch))
+        return changed
+
+    def category_positions(self, category):
+        # rowids упорядочены по возрастанию, позиция записи находится двоичным поиском
+        rowids = self.rowids
+        return [bisect_left(rowids, row[0]) for row in self.conn.execute(
+            "SELECT id FROM entries WHERE kind = ? AND category = ? ORDER BY id", (self.kind, category))]
+
+    def delete_many(self, indices):
+        removed = sorted(set(indices))
+        ids = [self.rowids[idx] for idx in removed]
+        removed_rows = []
+        for start in range(0, len(ids), _BATCH):
+            batch = ids[start:start + _BATCH]
+            marks = ",".join("?" * len(batch))
+            removed_rows.extend(self.conn.execute(f"SELECT amount, category FROM entries WHERE id IN ({marks})", batch))
+            self.conn.execute(f"DELETE FROM entries WHERE id IN ({marks})", batch)
+        # Как в RecordStore.delete_many: мало позиций — удаление по одной, много — один проход по массиву
+        if len(removed) <= _BULK_DELETE_THRESHOLD:
+            for idx in reversed(removed):
+                del self.rowids[idx]
+        else:
+            removed = set(removed)
+            self.rowids = array("q", (row_id for i, row_id in enumerate(self.rowids) if i not in removed))
+        return removed_rows
+
+    def free_ids(self, positions):
+        # Порядок записей — порядок id, поэтому вставленной записи нужен свободный id между id соседей.
+        # Доходы и расходы делят одну последовательность id: id другого вида в нужном диапазоне читаются
+        # одним запросом, записи в конец получают id больше всех существующих.
+        # None — между какими-то соседями места нет (после замены данных id идут подряд)
+        rowids = self.rowids
+        bounds = []
+        for k, pos in enumerate(positions):
+            before = pos - k
+            bounds.append((rowids[before - 1] if before > 0 else 0, rowids[before] if before < len(rowids) else None))
+        highs = [high for _, high in bounds if high is not None]
+        taken = set()
+        if highs:
+            taken.update(row[0] for row in self.conn.execute(
+                "SELECT id FROM entries WHERE kind != ? AND id > ? AND id < ?", (self.kind, bounds[0][0], highs[-1])))
+        if len(highs) < len(bounds):
+            last = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+        new_ids = []
+        for low, high in bounds:
+            if high is None:
+                low = max(low, last)
+            if new_ids:
+                low = max(low, new_ids[-1])
+            candidate = low + 1
+            while candidate in taken:
+                candidate += 1
+            if high is not None and candidate >= high:
+                return None
+            new_ids.append(candidate)
+        return new_ids
+
+    def insert_many(self, positions, records, new_ids=None):
+        if new_ids is None:
+            new_ids = self.free_ids(positions)
+        if new_ids is None:
+            raise ValueError("Нет свободных id для вставки записей")
+        self.conn.executemany("INSERT INTO entries (id, kind, amount, category, day) VALUES (?, ?, ?, ?, ?)",
+                              ((row_id, self.kind, *record) for row_id, record in zip(new_ids, records)))
+        self.rowids = array("q", sorted(chain(self.rowids, new_ids)))
+
+    def _where(self, period):
+        if period is None:
+            return "kind = ?", (self.kind,)
+        return "kind = ? AND day BETWEEN ? AND ?", (self.kind, *period)
+
+    def total(self, period=None):
+        where, params = self._where(period)
+        return self.conn.execute(f"SELECT COALESCE(SUM(amount), 0) FROM entries WHERE {where}", params).fetchone()[0]
+
+    def category_sum(self, category, period=None):
+        where, params = self._where(period)
+        return self.conn.execute(f"SELECT COALESCE(SUM(amount), 0) FROM entries WHERE {where} AND category = ?",
+                                 (*params, category)).fetchone()[0]
+
+    def category_sums(self, period=None):
+        where, params = self._where(period)
+        sums, counts = {}, {}
+        for category, total, count in self.conn.execute(
+                f"SELECT category, SUM(amount), COUNT(*) FROM entries WHERE {where} "
+                "GROUP BY category ORDER BY MIN(id)", params):
+            sums[category] = total
+            counts[category] = count
+        return sums, counts
+
+    def category_list(self):
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT category FROM entries WHERE kind = ?", (self.kind,))]
+
+    def query(self, categories=None, amount_range=None, period=None):
+        # То же, что RecordStore.query: условия отбирает SQLite по индексам (kind, category, amount),
+        # (kind, amount) или (kind, day), позиции находятся двоичным поиском по rowids
+        where, params = self._where(period)
+        if categories is not None:
+            categories = sorted(set(categories))
+            if not categories:
+                return []
+            where += f" AND category IN ({','.join('?' * len(categories))})"
+            params = (*params, *categories)
+        if amount_range is not None:
+            low, high = amount_range
+            if low is not None:
+                where += " AND amount >= ?"
+                params = (*params, low)
+            if high is not None:
+                where += " AND amount <= ?"
+                params = (*params, high)
+        rowids = self.rowids
+        return [bisect_left(rowids, row[0]) for row in self.conn.execute(
+            f"SELECT id FROM entries WHERE {where} ORDER BY id", params)]
+
+    def date_span(self):
+        row = self.conn.execute("SELECT MIN(day), MAX(day) FROM entries WHERE kind = ? AND day != ?",
+                                (self.kind, NO_DATE)).fetchone()
+        return None if row[0] is None else row
+
+
+class SQLiteEngine(BudgetEngine):
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        # Соединение используется и из фонового потока окна; одновременные изменения окно не допускает
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        existing = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries'").fetchone()
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if "day" not in columns:
+            # База создана до появления дат у записей
+            self.conn.execute(f"ALTER TABLE entries ADD COLUMN day INTEGER NOT NULL DEFAULT {NO_DATE}")
+            self.conn.commit()
+        if existing and version < SCHEMA_VERSION:
+            self.conn.executescript(KOPECKS_MIGRATION)
+            self.conn.executescript(SCHEMA)
+        self.conn.execute(DATE_INDEX)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+        self.incomes = SQLiteRecords(self.conn, "incomes")
+        self.expenses = SQLiteRecords(self.conn, "expenses")
+        self.limits = dict(self.conn.execute("SELECT category, amount FROM limits"))
+        self.savings_goals = {
+            name: {"target": target, "deadline_str": deadline_str, "saved": saved}
+            for name, target, deadline_str, saved in self.conn.execute(
+                "SELECT name, target, deadline_str, saved FROM savings_goals")
+        }
+        self._parse_deadlines()
+
+    def close(self):
+        self.conn.close()
+
+    def _emit(self, op, **payload):
+        # Каждая операция движка заканчивается уведомлением — здесь же фиксируем транзакцию
+        self.conn.commit()
+        super()._emit(op, **payload)
+
+    # Суммы считает SQLite, накопительные словари не нужны
+    def _totals_add(self, kind, value, category):
+        pass
+
+    def _totals_remove(self, kind, value, category):
+        pass
+
+    def rebuild_totals(self):
+        pass
+
+    def verify_totals(self):
+        problems = []
+        for kind in KINDS:
+            expected = {}
+            for value, category, _ in self.records(kind):
+                expected[category] = expected.get(category, 0) + value
+            actual, _ = self.records(kind).category_sums()
+            for cat in set(expected) | set(actual):
+                if expected.get(cat, 0) != actual.get(cat, 0):
+                    problems.append(f"{kind}: '{cat}' — {format_money(actual.get(cat, 0))} "
+                                    f"вместо {format_money(expected.get(cat, 0))}")
+        return problems
+
+    def category_totals(self, kind, period=None):
+        return self.records(kind).category_sums(period or self.period)[0]
+
+    def category_total(self, kind, category, period=None):
+        return self.records(kind).category_sum(category, period or self.period)
+
+    def total(self, kind, period=None):
+        return self.records(kind).total(period or self.period)
+
+    def insert_many(self, kind, positions, records):
+        # Как BudgetEngine.insert_many, но свободные id ищутся один раз и передаются хранилищу
+        # (накопительных сумм у SQLite нет)
+        positions = sorted(positions)
+        records = list(records)
+        store = self.records(kind)
+        new_ids = store.free_ids(positions)
+        if new_ids is None:
+            self._spread_ids(max(_ID_STEP, len(positions) + 1))
+            new_ids = store.free_ids(positions)
+        store.insert_many(positions, records, new_ids)
+        self._emit("insert", kind=kind, positions=positions, records=records)
+
+    def _spread_ids(self, step):
+        # Записи обоих видов перенумеровываются подряд с шагом step в прежнем порядке: между соседями
+        # появляется step - 1 свободных id, а сами id не растут от повторных перенумераций.
+        # Сначала все id делаются отрицательными — чтобы при обновлении не столкнуться с ещё не перенесёнными
+        new_ids = {row_id: (rank + 1) * step
+                   for rank, row_id in enumerate(sorted(chain(self.incomes.rowids, self.expenses.rowids)))}
+        self.conn.execute("UPDATE entries SET id = -id")
+        self.conn.executemany("UPDATE entries SET id = ? WHERE id = ?",
+                              ((new_id, -row_id) for row_id, new_id in new_ids.items()))
+        for kind in KINDS:
+            records = self.records(kind)
+            records.rowids = array("q", (new_ids[row_id] for row_id in records.rowids))
+
+    def set_limits(self, limits):
+        self.conn.execute("DELETE FROM limits")
+        self.conn.executemany("INSERT INTO limits (category, amount) VALUES (?, ?)", dict(limits).items())
+        super().set_limits(limits)
+
+    def set_savings_goals(self, goals):
+        self.conn.execute("DELETE FROM savings_goals")
+        self.conn.executemany(
+            "INSERT INTO savings_goals (name, target, deadline_str, saved) VALUES (?, ?, ?, ?)",
+            ((name, info["target"], info["deadline_str"], info["saved"]) for name, info in goals.items()))
+        super().set_savings_goals(goals)
+
+    def replace_all(self, incomes, expenses, limits, savings_goals):
+        self.conn.execute("DELETE FROM entries")
+        for kind, records in (("incomes", incomes), ("expenses", expenses)):
+            self.conn.executemany("INSERT INTO entries (kind, amount, category, day) VALUES (?, ?, ?, ?)",
+                                  ((kind, *record) for record in records))
+        self.conn.execute("DELETE FROM limits")
+        self.conn.executemany("INSERT INTO limits (category, amount) VALUES (?, ?)", limits.items())
+        self.conn.execute("DELETE FROM savings_goals")
+        self.conn.executemany(
+            "INSERT INTO savings_goals (name, target, deadline_str, saved) VALUES (?, ?, ?, ?)",
+            ((name, info["target"], info["deadline_str"], info["saved"]) for name, info in savings_goals.items()))
+        super().replace_all(SQLiteRecords(self.conn, "incomes"), SQLiteRecords(self.conn, "expenses"),
+                            dict(limits), dict(savings_goals))
+
+
+def migrate(json_path, db_path, progress=None):
+    # Перенос файла экспорта JSON в базу SQLite (существующие данные базы заменяются)
+    engine = SQLiteEngine(db_path)
+    try:
+        engine.import_file(json_path, progress=progress)
+        return len(engine.incomes), len(engine.expenses)
+    finally:
+        engine.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Хранение бюджета в SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("migrate", help="перенести файл экспорта JSON в базу SQLite")
+    p.add_argument("json_path")
+    p.add_argument("db_path")
+    p = sub.add_parser("export", help="выгрузить базу SQLite в файл экспорта JSON")
+    p.add_argument("db_path")
+    p.add_argument("json_path")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        incomes, expenses = migrate(args.json_path, args.db_path)
+        print(f"Перенесено доходов: {incomes}, расходов: {expenses}")
+    else:
+        engine = SQLiteEngine(args.db_path)
+        try:
+            engine.export_file(args.json_path)
+        finally:
+            engine.close()
+
+
+if __name__ == "__main__":
+    main()
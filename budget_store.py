@@ -0,0 +1,404 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен, без него работает чистый Python
+    np = None
+
+# Колоночное хранилище записей: суммы в копейках в array('d'), категории — коды в array('I')
+# со словарём интернированных названий, даты — порядковые номера дней (date.toordinal) в array('i').
+# Запись занимает 16 байт вместо ~100+ у кортежа.
+# Копейки — целые числа, хранимые в float64: такие значения и их суммы точны, пока по модулю меньше
+# 2**53 (~9·10**13 руб.), а sum и bincount по float64 быстрее, чем по целым. Наружу суммы выдаются как int.
+
+# Запись без даты (из старых файлов экспорта); в отчёты за период не попадает
+NO_DATE = 0
+
+# При удалении небольшого числа строк выгоднее удалять их по одной, иначе — пересобрать колонки
+_BULK_DELETE_THRESHOLD = 32
+
+
+class RecordStore:
+    def __init__(self, records=()):
+        self.amounts = array("d")
+        self.codes = array("I")
+        self.days = array("i")
+        self.category_names = []
+        self.category_index = {}
+        # Индекс по дате: позиции записей, упорядоченные по дате, и сами даты в том же порядке.
+        # Строится лениво и сбрасывается изменениями, которые нарушают порядок
+        self._by_day = None
+        self._sorted_days = None
+        # Индексы для фильтров: позиции записей каждой категории по возрастанию ({код: array('I')})
+        # и позиции, упорядоченные по сумме, с суммами в том же порядке. Тоже строятся лениво
+        self._postings = None
+        self._by_amount = None
+        self._sorted_amounts = None
+        self.extend(records)
+
+    def category_code(self, category):
+        code = self.category_index.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_index[category] = code
+        return code
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, idx):
+        return int(self.amounts[idx]), self.category_names[self.codes[idx]], self.days[idx]
+
+    def __setitem__(self, idx, record):
+        value, category, day = record
+        code = self.category_code(category)
+        if self.amounts[idx] != value or self.codes[idx] != code:
+            self._drop_filter_index()
+        self.amounts[idx] = value
+        self.codes[idx] = code
+        if self.days[idx] != day:
+            self.days[idx] = day
+            self._by_day = None
+
+    def __delitem__(self, idx):
+        del self.amounts[idx]
+        del self.codes[idx]
+        del self.days[idx]
+        self._by_day = None
+        self._drop_filter_index()
+
+    def __iter__(self):
+        names = self.category_names
+        for value, code, day in zip(self.amounts, self.codes, self.days):
+            yield int(value), names[code], day
+
+    def rows(self, start, stop):
+        # Записи с позиции start до stop одним срезом колонок (страницы списков и сервера)
+        names = self.category_names
+        return [(int(value), names[code], day)
+                for value, code, day in zip(self.amounts[start:stop], self.codes[start:stop], self.days[start:stop])]
+
+    def append(self, value, category, day=NO_DATE):
+        if self._by_day is not None:
+            if not self._sorted_days or day >= self._sorted_days[-1]:
+                # Записи обычно добавляются по порядку дат — индекс остаётся верным
+                self._by_day.append(len(self.amounts))
+                self._sorted_days.append(day)
+            else:
+                self._by_day = None
+        code = self.category_code(category)
+        if self._postings is not None:
+            self._postings.setdefault(code, array("I")).append(len(self.amounts))
+        if self._by_amount is not None:
+            if not self._sorted_amounts or value >= self._sorted_amounts[-1]:
+                self._by_amount.append(len(self.amounts))
+                self._sorted_amounts.append(value)
+            else:
+                self._by_amount = None
+        self.amounts.append(value)
+        self.codes.append(code)
+        self.days.append(day)
+
+    def extend(self, records):
+        for record in records:
+            self.append(*record)
+
+    def extend_columns(self, amounts, categories, days):
+        # Пакетное добавление уже проверенных записей (импорт)
+        index, code = self.category_index, self.category_code
+        self.amounts.extend(amounts)
+        self.codes.extend([index[c] if c in index else code(c) for c in categories])
+        self.days.extend(days)
+        self._by_day = None
+        self._drop_filter_index()
+
+    def select(self, positions):
+        # Новое хранилище из записей на позициях positions (в их порядке); коды категорий те же
+        result = RecordStore()
+        result.category_names = list(self.category_names)
+        result.category_index = dict(self.category_index)
+        if isinstance(positions, range) and positions.step == 1:
+            window = slice(positions.start, positions.stop)
+            result.amounts, result.codes, result.days = self.amounts[window], self.codes[window], self.days[window]
+        elif np is not None and len(positions):
+            rows = np.asarray(positions, dtype=np.intp)
+            result.amounts = array("d", np.frombuffer(self.amounts, dtype=np.float64)[rows].tobytes())
+            result.codes = array("I", np.frombuffer(self.codes, dtype=np.uint32)[rows].tobytes())
+            result.days = array("i", np.frombuffer(self.days, dtype=np.int32)[rows].tobytes())
+        else:
+            result.amounts = array("d", (self.amounts[i] for i in positions))
+            result.codes = array("I", (self.codes[i] for i in positions))
+            result.days = array("i", (self.days[i] for i in positions))
+        return result
+
+    def set_category(self, indices, category):
+        # Смена категории у набора записей; возвращает (сумма, старая категория) изменённых записей
+        code = self.category_code(category)
+        amounts, codes, names = self.amounts, self.codes, self.category_names
+        changed = []
+        for idx in indices:
+            old = codes[idx]
+            if old != code:
+                changed.append((int(amounts[idx]), names[old]))
+                codes[idx] = code
+        if changed:
+            self._postings = None
+        return changed
+
+    def category_positions(self, category):
+        code = self.category_index.get(category)
+        if code is None or not len(self):
+            return []
+        if np is not None:
+            return np.flatnonzero(np.frombuffer(self.codes, dtype=np.uint32) == code).tolist()
+        return [i for i, c in enumerate(self.codes) if c == code]
+
+    def clear(self):
+        del self.amounts[:]
+        del self.codes[:]
+        del self.days[:]
+        self._by_day = None
+        self._drop_filter_index()
+
+    def delete_many(self, indices):
+        # Возвращает (сумма, категория) удалённых записей
+        indices = sorted(set(indices))
+        amounts, codes, names = self.amounts, self.codes, self.category_names
+        removed_rows = [(int(amounts[idx]), names[codes[idx]]) for idx in indices]
+        if len(indices) <= _BULK_DELETE_THRESHOLD:
+            for idx in reversed(indices):
+                del self[idx]
+            return removed_rows
+        self._by_day = None
+        self._drop_filter_index()
+        if np is not None:
+            keep = np.ones(len(self), dtype=bool)
+            keep[indices] = False
+            self.amounts = array("d", np.frombuffer(self.amounts, dtype=np.float64)[keep].tobytes())
+            self.codes = array("I", np.frombuffer(self.codes, dtype=np.uint32)[keep].tobytes())
+            self.days = array("i", np.frombuffer(self.days, dtype=np.int32)[keep].tobytes())
+            return removed_rows
+        removed = set(indices)
+        self.amounts = array("d", (v for i, v in enumerate(self.amounts) if i not in removed))
+        self.codes = array("I", (c for i, c in enumerate(self.codes) if i not in removed))
+        self.days = array("i", (d for i, d in enumerate(self.days) if i not in removed))
+        return removed_rows
+
+    def insert_many(self, positions, records):
+        # Вставка записей так, чтобы они оказались на позициях positions (по возрастанию) — обратное delete_many
+        positions = list(positions)
+        records = list(records)
+        codes = [self.category_code(category) for _, category, _ in records]
+        self._by_day = None
+        self._drop_filter_index()
+        if len(positions) <= _BULK_DELETE_THRESHOLD:
+            for pos, (value, _, day), code in zip(positions, records, codes):
+                self.amounts.insert(pos, value)
+                self.codes.insert(pos, code)
+                self.days.insert(pos, day)
+            return
+        total = len(self) + len(positions)
+        if np is not None:
+            inserted = np.zeros(total, dtype=bool)
+            inserted[positions] = True
+            columns = []
+            for column, dtype, values in ((self.amounts, np.float64, [r[0] for r in records]),
+                                          (self.codes, np.uint32, codes),
+                                          (self.days, np.int32, [r[2] for r in records])):
+                merged = np.empty(total, dtype=dtype)
+                merged[inserted] = values
+                merged[~inserted] = np.frombuffer(column, dtype=dtype)
+                columns.append(array(column.typecode, merged.tobytes()))
+            self.amounts, self.codes, self.days = columns
+            return
+        amounts, merged_codes, days = array("d"), array("I"), array("i")
+        new, old = 0, 0
+        for pos in range(total):
+            if new < len(positions) and positions[new] == pos:
+                value, _, day = records[new]
+                amounts.append(value)
+                merged_codes.append(codes[new])
+                days.append(day)
+                new += 1
+            else:
+                amounts.append(self.amounts[old])
+                merged_codes.append(self.codes[old])
+                days.append(self.days[old])
+                old += 1
+        self.amounts, self.codes, self.days = amounts, merged_codes, days
+
+    # --- индекс по дате ---
+
+    def _date_index(self):
+        if self._by_day is None:
+            if np is not None:
+                order = np.argsort(np.frombuffer(self.days, dtype=np.int32), kind="stable")
+                self._by_day = array("I", order.astype(np.uint32).tobytes())
+                self._sorted_days = array("i", np.frombuffer(self.days, dtype=np.int32)[order].tobytes())
+            else:
+                days = self.days
+                self._by_day = array("I", sorted(range(len(days)), key=days.__getitem__))
+                self._sorted_days = array("i", (days[i] for i in self._by_day))
+        return self._by_day, self._sorted_days
+
+    def range_bounds(self, start, end):
+        # Границы среза индекса по дате для дней start..end включительно (двоичный поиск)
+        _, sorted_days = self._date_index()
+        return bisect_left(sorted_days, start), bisect_right(sorted_days, end)
+
+    def range_positions(self, start, end):
+        by_day, _ = self._date_index()
+        lo, hi = self.range_bounds(start, end)
+        return by_day[lo:hi]
+
+    def date_span(self):
+        # Первая и последняя дата среди датированных записей или None
+        _, sorted_days = self._date_index()
+        lo = bisect_right(sorted_days, NO_DATE)
+        if lo == len(sorted_days):
+            return None
+        return sorted_days[lo], sorted_days[-1]
+
+    # --- индексы для фильтров ---
+
+    def _drop_filter_index(self):
+        self._postings = None
+        self._by_amount = None
+
+    def _category_postings(self):
+        if self._postings is None:
+            if np is not None and len(self):
+                # Устойчивая сортировка кодов: внутри каждой категории позиции остаются по возрастанию
+                codes = np.frombuffer(self.codes, dtype=np.uint32)
+                order = np.argsort(codes, kind="stable").astype(np.uint32)
+                bounds = np.searchsorted(codes[order], np.arange(len(self.category_names) + 1)).tolist()
+                self._postings = {code: array("I", order[bounds[code]:bounds[code + 1]].tobytes())
+                                  for code in range(len(self.category_names)) if bounds[code + 1] > bounds[code]}
+            else:
+                postings = {}
+                for i, code in enumerate(self.codes):
+                    postings.setdefault(code, array("I")).append(i)
+                self._postings = postings
+        return self._postings
+
+    def _amount_index(self):
+        if self._by_amount is None:
+            if np is not None:
+                order = np.argsort(np.frombuffer(self.amounts, dtype=np.float64), kind="stable")
+                self._by_amount = array("I", order.astype(np.uint32).tobytes())
+                self._sorted_amounts = array("d", np.frombuffer(self.amounts, dtype=np.float64)[order].tobytes())
+            else:
+                amounts = self.amounts
+                self._by_amount = array("I", sorted(range(len(amounts)), key=amounts.__getitem__))
+                self._sorted_amounts = array("d", (amounts[i] for i in self._by_amount))
+        return self._by_amount, self._sorted_amounts
+
+    def category_list(self):
+        return list(self.category_names)
+
+    def query(self, categories=None, amount_range=None, period=None):
+        # Позиции записей по возрастанию, подходящих под все заданные условия (None — условия нет):
+        # категории, суммы (от, до) в копейках включительно (граница None — открытая), период дат.
+        # Кандидаты берутся из самого узкого индекса — списков категорий, среза по сумме или по дате,
+        # остальные условия проверяются только для них: время зависит от размера этого среза, а не всех записей
+        conditions = []
+        if categories is not None:
+            postings = self._category_postings()
+            codes = sorted({self.category_index[c] for c in categories if c in self.category_index})
+            conditions.append(("codes", codes, [postings[code] for code in codes if code in postings]))
+        if amount_range is not None:
+            by_amount, sorted_amounts = self._amount_index()
+            low, high = amount_range
+            lo = 0 if low is None else bisect_left(sorted_amounts, low)
+            hi = len(sorted_amounts) if high is None else bisect_right(sorted_amounts, high)
+            conditions.append(("amounts", amount_range, [by_amount[lo:hi]]))
+        if period is not None:
+            by_day, _ = self._date_index()
+            lo, hi = self.range_bounds(*period)
+            conditions.append(("days", period, [by_day[lo:hi]]))
+        if not conditions:
+            return list(range(len(self)))
+        narrowest = min(conditions, key=lambda condition: sum(map(len, condition[2])))
+        rest = [condition for condition in conditions if condition is not narrowest]
+        if np is not None:
+            parts = [np.frombuffer(part, dtype=np.uint32) for part in narrowest[2] if len(part)]
+            if not parts:
+                return []
+            rows = np.sort(np.concatenate(parts))
+            keep = np.ones(len(rows), dtype=bool)
+            columns = {"codes": np.uint32, "amounts": np.float64, "days": np.int32}
+            for column, bounds, _ in rest:
+                values = np.frombuffer(getattr(self, column), dtype=columns[column])[rows]
+                if column == "codes":
+                    keep &= np.isin(values, bounds)
+                    continue
+                if bounds[0] is not None:
+                    keep &= values >= bounds[0]
+                if bounds[1] is not None:
+                    keep &= values <= bounds[1]
+            return rows[keep].tolist()
+        rows = sorted(chain.from_iterable(narrowest[2]))
+        for column, bounds, _ in rest:
+            values = getattr(self, column)
+            if column == "codes":
+                allowed = set(bounds)
+                rows = [i for i in rows if values[i] in allowed]
+                continue
+            low, high = bounds
+            rows = [i for i in rows if (low is None or values[i] >= low) and (high is None or values[i] <= high)]
+        return rows
+
+    # --- агрегаты ---
+
+    def total(self, period=None):
+        if period is None:
+            return int(sum(self.amounts))
+        amounts = self.amounts
+        return int(sum(amounts[i] for i in self.range_positions(*period)))
+
+    def category_sum(self, category, period=None):
+        code = self.category_index.get(category)
+        if code is None:
+            return 0
+        if period is None:
+            return int(sum(v for v, c in zip(self.amounts, self.codes) if c == code))
+        amounts, codes = self.amounts, self.codes
+        return int(sum(amounts[i] for i in self.range_positions(*period) if codes[i] == code))
+
+    def category_sums(self, period=None):
+        # Суммы и количество записей по категориям в порядке первого появления категории
+        names = self.category_names
+        positions = None if period is None else self.range_positions(*period)
+        if np is not None and len(self):
+            codes = np.frombuffer(self.codes, dtype=np.uint32)
+            amounts = np.frombuffer(self.amounts, dtype=np.float64)
+            if positions is not None:
+                rows = np.sort(np.frombuffer(positions, dtype=np.uint32))
+                codes, amounts = codes[rows], amounts[rows]
+            sums = np.bincount(codes, weights=amounts, minlength=len(names))
+            counts = np.bincount(codes, minlength=len(names))
+            present, first = np.unique(codes, return_index=True)
+            order = present[np.argsort(first)].tolist()
+            return ({names[c]: int(sums[c]) for c in order},
+                    {names[c]: int(counts[c]) for c in order})
+        sums = [0.0] * len(names)
+        counts = [0] * len(names)
+        order = []
+        if positions is None:
+            rows = zip(self.amounts, self.codes)
+        else:
+            amounts, codes = self.amounts, self.codes
+            rows = ((amounts[i], codes[i]) for i in sorted(positions))
+        for value, code in rows:
+            if not counts[code]:
+                order.append(code)
+            sums[code] += value
+            counts[code] += 1
+        return ({names[c]: int(sums[c]) for c in order},
+                {names[c]: counts[c] for c in order})
+
+    def nbytes(self):
+        return sum(col.itemsize * len(col) for col in (self.amounts, self.codes, self.days))
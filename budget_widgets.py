@@ -0,0 +1,134 @@
+import tkinter as tk
+
+# Виртуальный список: в Listbox лежат только видимые строки, текст формируется по запросу
+# из хранилища записей. Время отрисовки не зависит от числа записей.
+# Выделение хранится как множество индексов записей, а не строк виджета.
+
+
+class VirtualList(tk.Frame):
+    def __init__(self, master, row_count, row_text, height=10, width=45):
+        super().__init__(master)
+        self.row_count = row_count
+        self.row_text = row_text
+        self.height = height
+        self.first = 0
+        self.selected = set()
+        self.anchor = None
+
+        self.listbox = tk.Listbox(self, width=width, height=height, selectmode=tk.MULTIPLE,
+                                  activestyle="none", exportselection=False)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+
+        self.listbox.bind("<Button-1>", self.on_click)
+        self.listbox.bind("<Control-Button-1>", self.on_ctrl_click)
+        self.listbox.bind("<Shift-Button-1>", self.on_shift_click)
+        self.listbox.bind("<B1-Motion>", lambda e: "break")
+        self.listbox.bind("<MouseWheel>", self.on_wheel)
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(3))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda e: self.scroll(-self.height))
+        self.listbox.bind("<Next>", lambda e: self.scroll(self.height))
+
+    # --- отрисовка ---
+
+    def refresh(self, keep_selection=False):
+        count = self.row_count()
+        if not keep_selection:
+            self.selected.clear()
+            self.anchor = None
+        else:
+            self.selected = {idx for idx in self.selected if idx < count}
+        self.first = max(0, min(self.first, count - self.height))
+        self.render()
+
+    def render(self):
+        count = self.row_count()
+        last = min(count, self.first + self.height)
+        self.listbox.delete(0, tk.END)
+        for idx in range(self.first, last):
+            self.listbox.insert(tk.END, self.row_text(idx))
+            if idx in self.selected:
+                self.listbox.selection_set(idx - self.first)
+        if count:
+            self.scrollbar.set(self.first / count, last / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        count = self.row_count()
+        first = max(0, min(self.first + rows, count - self.height))
+        if first != self.first:
+            self.first = first
+            self.render()
+        return "break"
+
+    def see(self, idx):
+        if idx < self.first:
+            self.scroll(idx - self.first)
+        elif idx >= self.first + self.height:
+            self.scroll(idx - self.first - self.height + 1)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(amount) * self.row_count()) - self.first)
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def on_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    # --- выделение ---
+
+    def index_at(self, event):
+        row = self.listbox.nearest(event.y)
+        idx = self.first + row
+        return idx if 0 <= row and idx < self.row_count() else None
+
+    def on_click(self, event):
+        self.listbox.focus_set()
+        idx = self.index_at(event)
+        self.selected = {idx} if idx is not None else set()
+        self.anchor = idx
+        self.render()
+        return "break"
+
+    def on_ctrl_click(self, event):
+        idx = self.index_at(event)
+        if idx is not None:
+            self.selected ^= {idx}
+            self.anchor = idx
+            self.render()
+        return "break"
+
+    def on_shift_click(self, event):
+        idx = self.index_at(event)
+        if idx is not None:
+            start = self.anchor if self.anchor is not None else idx
+            self.selected = set(range(min(start, idx), max(start, idx) + 1))
+            self.render()
+        return "break"
+
+    def move_selection(self, step):
+        count = self.row_count()
+        if not count:
+            return "break"
+        current = self.anchor if self.anchor is not None else self.first - step
+        idx = max(0, min(current + step, count - 1))
+        self.selected = {idx}
+        self.anchor = idx
+        self.see(idx)
+        self.render()
+        return "break"
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def select(self, indices):
+        self.selected = set(indices)
+        self.render()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Модули программы лежат в корне репозитория, как и для скриптов benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import budget_store
+
+
+@pytest.fixture(params=["python", "numpy"])
+def numpy_mode(request, monkeypatch):
+    # Хранилище проверяется в обоих вариантах: без numpy и с ним (если numpy установлен)
+    if request.param == "numpy":
+        np = pytest.importorskip("numpy")
+    else:
+        np = None
+    monkeypatch.setattr(budget_store, "np", np)
+    return request.param
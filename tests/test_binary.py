@@ -0,0 +1,102 @@
+import json
+import random
+import struct
+from array import array
+
+import pytest
+
+import budget_binary
+import budget_store
+from budget_binary import MAGIC, main, read_binary, write_binary
+from budget_io import read_ledger, write_ledger
+from budget_money import to_rubles
+from budget_store import NO_DATE, RecordStore
+
+FIRST_DAY = 739000
+LIMITS = {"Кафе": 2500050}
+GOALS = {"Отпуск": {"target": 10000000, "deadline_str": "01.06.2030", "saved": 12345}}
+
+
+@pytest.fixture
+def binary_numpy(numpy_mode, monkeypatch):
+    monkeypatch.setattr(budget_binary, "np", budget_store.np)
+    return numpy_mode
+
+
+def random_store(rnd, count, categories):
+    # Суммы до 10**13 руб.: в float64 копейки ещё точны
+    amounts = [rnd.randint(0, 10 ** 15) for _ in range(count)] + [1, 10, 99, 2 ** 53 - 1]
+    return RecordStore((value, rnd.choice(categories), rnd.choice([NO_DATE, FIRST_DAY + rnd.randint(0, 500)]))
+                       for value in amounts)
+
+
+def rows(store):
+    return [tuple(row) for row in store]
+
+
+def test_json_binary_json_is_lossless(tmp_path, binary_numpy):
+    rnd = random.Random(5)
+    incomes = random_store(rnd, 300, ["Зарплата", "Подарки"])
+    expenses = random_store(rnd, 300, ["Кафе", "Еда", "Такси"])
+    source = str(tmp_path / "ledger.json")
+    write_ledger(source, incomes, expenses, LIMITS, GOALS)
+    main([source, str(tmp_path / "ledger.budget")])
+    main([str(tmp_path / "ledger.budget"), str(tmp_path / "back.json")])
+    with open(source, encoding="utf-8") as f, open(tmp_path / "back.json", encoding="utf-8") as g:
+        assert json.load(g) == json.load(f)
+    data = read_binary(str(tmp_path / "ledger.budget"))
+    assert rows(data["incomes"]) == rows(incomes)
+    assert rows(data["expenses"]) == rows(expenses)
+    assert data["limits"] == LIMITS
+    assert data["savings_goals"] == read_ledger(source)["savings_goals"]
+    assert data["incomes"].amounts.typecode == "d"
+
+
+def write_old_binary(path, version, stores):
+    # Файл старой версии: суммы версии 1 — float64 в рублях, версии 2 — int64 в копейках
+    header = {"format": version, "limits": {cat: to_rubles(value) for cat, value in LIMITS.items()},
+              "savings_goals": {}}
+    for key, store in stores.items():
+        header[key] = {"count": len(store), "categories": store.category_names}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix_len = len(MAGIC) + 4 + len(header_bytes)
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        f.write(b"\0" * (-prefix_len % 8))
+        for store in stores.values():
+            if version == 1:
+                amounts = array("d", (value / 100 for value in store.amounts))
+            else:
+                amounts = array("q", map(int, store.amounts))
+            for column in (amounts, store.codes, store.days):
+                column = column[:]
+                if budget_binary._SWAP:
+                    column.byteswap()
+                f.write(column)
+    return str(path)
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_old_versions_are_read(tmp_path, binary_numpy, version):
+    rnd = random.Random(version)
+    stores = {"incomes": random_store(rnd, 50, ["Зарплата"]), "expenses": random_store(rnd, 50, ["Кафе", "Еда"])}
+    if version == 1:
+        # В рублях float64 точен не для любых копеек
+        for store in stores.values():
+            store.amounts = array("d", (value % 10 ** 12 for value in store.amounts))
+    path = write_old_binary(tmp_path / "old.budget", version, stores)
+    data = read_binary(path)
+    for key, store in stores.items():
+        assert rows(data[key]) == rows(store)
+        assert data[key].amounts.typecode == "d"
+    assert data["limits"] == LIMITS
+    # Пересохранение пишет текущую версию с теми же записями
+    write_binary(str(tmp_path / "new.budget"), data["incomes"], data["expenses"], data["limits"], {})
+    again = read_binary(str(tmp_path / "new.budget"))
+    assert rows(again["expenses"]) == rows(stores["expenses"])
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = write_old_binary(tmp_path / "future.budget", 99, {"incomes": RecordStore(), "expenses": RecordStore()})
+    with pytest.raises(ValueError):
+        read_binary(path)
@@ -0,0 +1,101 @@
+import csv
+import json
+
+import pytest
+
+from budget_cli import main
+
+LEDGER = {
+    "incomes": [[5000.5, "Зарплата", "01.03.2024"], [120.25, "Подарки", "15.03.2024"]],
+    "expenses": [[300.1, "Кафе", "02.03.2024"], [99.99, "Транспорт", "20.04.2024"]],
+    "limits": {"Кафе": 250},
+    "savings_goals": {"Отпуск": {"target": 1000, "deadline_str": "01.06.2030", "saved": 100.5}},
+}
+
+
+def write_ledger(path, data=LEDGER):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def exports(tmp_path):
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    for i in range(5):
+        data = dict(LEDGER, incomes=LEDGER["incomes"] + [[i + 0.01, "Другое"]])
+        write_ledger(folder / f"ledger{i}.json", data)
+    return folder
+
+
+def run_cli(tmp_path, *args):
+    out = tmp_path / "out"
+    code = main([*args, "-o", str(out)])
+    return code, out.read_text(encoding="utf-8")
+
+
+def test_json_report_in_rubles(tmp_path):
+    code, text = run_cli(tmp_path, write_ledger(tmp_path / "ledger.json"))
+    assert code == 0
+    [report] = json.loads(text)
+    assert report["total_income"] == 5120.75
+    assert report["total_expense"] == 400.09
+    assert report["balance"] == 4720.66
+    assert report["income_by_category"] == {"Зарплата": 5000.5, "Подарки": 120.25}
+    assert report["expense_by_category"] == {"Кафе": 300.1, "Транспорт": 99.99}
+    assert report["limit_warnings"] == ["ВНИМАНИЕ. Переполнение лимита по 'Кафе': потрачено 300.10 из 250.00 руб.!"]
+    assert report["goals"][0]["target"] == 1000
+    assert report["goals"][0]["saved"] == 100.5
+    assert report["goal_plan"]["goals"][0]["remaining"] == 899.5
+    assert report["goal_plan"]["goals"][0]["deadline"] == "01.06.2030"
+
+
+def test_csv_report_and_period(tmp_path):
+    code, text = run_cli(tmp_path, write_ledger(tmp_path / "ledger.json"), "--format", "csv",
+                         "--period", "01.03.2024:31.03.2024")
+    assert code == 0
+    rows = list(csv.DictReader(text.splitlines()))
+    totals = {row["name"]: row["amount"] for row in rows if row["section"] == "total"}
+    assert totals == {"total_income": "5120.75", "total_expense": "300.10", "balance": "4820.65"}
+    assert [(row["name"], row["amount"]) for row in rows if row["section"] == "expense"] == [("Кафе", "300.10")]
+    assert [row["section"] for row in rows].count("limit") == 1
+
+
+def test_parallel_run_keeps_file_order(tmp_path, exports):
+    code, serial = run_cli(tmp_path, str(exports), "--jobs", "1")
+    assert code == 0
+    code, parallel = run_cli(tmp_path, str(exports), "--jobs", "0")
+    assert code == 0
+    assert parallel == serial
+    reports = json.loads(serial)
+    assert [report["file"] for report in reports] == [str(exports / f"ledger{i}.json") for i in range(5)]
+
+
+def test_broken_file_is_reported_with_exit_code(tmp_path):
+    good = write_ledger(tmp_path / "good.json")
+    broken = tmp_path / "broken.json"
+    broken.write_text('{"incomes": [[1, ', encoding="utf-8")
+    code, text = run_cli(tmp_path, good, str(broken), "--format", "csv")
+    assert code == 1
+    rows = list(csv.DictReader(text.splitlines()))
+    errors = [row for row in rows if row["section"] == "error"]
+    assert len(errors) == 1
+    assert errors[0]["file"] == str(broken)
+    assert errors[0]["detail"]
+    assert any(row["file"] == good and row["section"] == "total" for row in rows)
+
+
+def test_strict_rejects_unknown_category(tmp_path):
+    data = dict(LEDGER, expenses=LEDGER["expenses"] + [[10, "Непонятно"]])
+    path = write_ledger(tmp_path / "ledger.json", data)
+    code, text = run_cli(tmp_path, path)
+    assert code == 0
+    assert json.loads(text)[0]["validation"]["warnings"]
+    code, text = run_cli(tmp_path, path, "--strict")
+    assert code == 1
+    assert "error" in json.loads(text)[0]
+
+
+def test_negative_jobs_are_rejected(tmp_path):
+    with pytest.raises(SystemExit):
+        main([write_ledger(tmp_path / "ledger.json"), "--jobs", "-1"])
@@ -0,0 +1,116 @@
+import csv
+import random
+from datetime import date
+
+import pytest
+
+from budget_csv import DEFAULT_RULES, byte_ranges, make_mapping, parse_csv, parse_rules
+from budget_money import format_money
+
+DESCRIPTIONS = ["Пятёрочка", "Кафе Ромашка", "Зарплата за май", "Такси", "Перевод\nпо номеру\nтелефона",
+                'ООО "Рога и копыта"\nоплата', "Кино; попкорн"]
+
+
+def write_statement(path, rows, header=("Дата", "Сумма", "Описание")):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def random_rows(count, seed=1):
+    rnd = random.Random(seed)
+    first = date(2024, 1, 1).toordinal()
+    return [(date.fromordinal(first + rnd.randint(0, 300)).strftime("%d.%m.%Y"),
+             format_money(rnd.choice([-1, 1]) * rnd.randint(1, 500000)).replace(".", ","), rnd.choice(DESCRIPTIONS))
+            for _ in range(count)]
+
+
+@pytest.fixture
+def statement(tmp_path):
+    return write_statement(tmp_path / "statement.csv", random_rows(500))
+
+
+def test_chunks_end_outside_quoted_fields(statement):
+    mapping = make_mapping(statement, {})
+    with open(statement, "rb") as f:
+        data = f.read()
+    ranges = byte_ranges(statement, mapping["data_start"], 50)
+    assert len(ranges) > 10
+    assert ranges[0][0] == mapping["data_start"] and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    for _, end in ranges:
+        assert data[:end].count(b'"') % 2 == 0
+        assert data[end - 1:end] == b"\n"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_quoted_newlines_across_chunks(statement, jobs):
+    mapping = make_mapping(statement, {})
+    expected, report = parse_csv(statement, mapping, jobs=1, chunk_size=1 << 30)
+    assert report.clean()
+    assert sum(len(records) for records in expected.values()) == 500
+    records, report = parse_csv(statement, mapping, jobs=jobs, chunk_size=50)
+    assert report.clean()
+    assert records == expected
+
+
+def test_row_numbers_after_merge(tmp_path):
+    rows = random_rows(300, seed=2)
+    # Номер строки файла, на которой заканчивается запись (заголовок — строка 1)
+    bad = {40: ("amount", lambda row: (row[0], "много", row[2])),
+           120: ("date", lambda row: ("31.02.2024", row[1], row[2])),
+           250: ("shape", lambda row: (row[0],))}
+    expected = {}
+    line = 1
+    for i, row in enumerate(rows):
+        if i in bad:
+            reason, spoil = bad[i]
+            row = rows[i] = spoil(row)
+            expected[reason] = [line + 1 + row[-1].count("\n")]
+        line += 1 + row[-1].count("\n")
+    path = write_statement(tmp_path / "statement.csv", rows)
+    mapping = make_mapping(path, {})
+    for chunk_size in (40, 1000, 1 << 30):
+        records, report = parse_csv(path, mapping, jobs=1, chunk_size=chunk_size)
+        assert report.rejected == {"csv": expected}
+        assert sum(report.accepted.values()) == 297
+
+
+def test_mapping_and_rules(tmp_path):
+    rows = [("01.03.2024", "1000,00", "", "ЗАРПЛАТА ЗА ФЕВРАЛЬ"), ("02.03.2024", "", "250,50", "Такси до дома"),
+            ("03.03.2024", "", "99", "Магазин у дома"), ("04.03.2024", "15,5", "", "Подарок от бабушки")]
+    path = write_statement(tmp_path / "statement.csv", rows, ("Дата операции", "Зачисление", "Списание", "Назначение"))
+    mapping = make_mapping(path, {"description": "Назначение"})
+    # Колонки угадываются по заголовку: зачисление — доход, списание — расход
+    assert (mapping["date"], mapping["credit"], mapping["debit"], mapping["description"]) == (0, 1, 2, 3)
+    records, report = parse_csv(path, mapping, jobs=1)
+    assert report.clean()
+    day = date(2024, 3, 1).toordinal()
+    assert records["incomes"] == [(100000, "Зарплата", day), (1550, "Подарки", day + 3)]
+    assert records["expenses"] == [(25050, "Транспорт", day + 1), (9900, "Другое", day + 2)]
+
+    rules = parse_rules([{"pattern": "магазин", "category": "Супермаркет"}]) + DEFAULT_RULES
+    records, _ = parse_csv(path, mapping, rules, jobs=1)
+    assert records["expenses"][1] == (9900, "Супермаркет", day + 2)
+
+
+def test_direction_column(tmp_path):
+    rows = [("05.03.2024", "300", "Приход", "Кешбэк"), ("06.03.2024", "120,10", "Расход", "Кофе")]
+    path = write_statement(tmp_path / "statement.csv", rows, ("Дата", "Сумма", "Тип", "Описание"))
+    mapping = make_mapping(path, {"amount": 2, "direction": "Тип", "date": 1, "description": 4},
+                           income_values=["приход"])
+    records, _ = parse_csv(path, mapping, jobs=1)
+    day = date(2024, 3, 5).toordinal()
+    assert records["incomes"] == [(30000, "Дополнительный доход", day)]
+    assert records["expenses"] == [(12010, "Кафе", day + 1)]
+
+
+def test_rule_category_must_match_kind():
+    with pytest.raises(ValueError):
+        parse_rules([{"pattern": "кафе", "category": "Кафе", "kind": "incomes"}])
+    with pytest.raises(ValueError):
+        parse_rules([{"pattern": "x", "category": "Нет такой"}])
+    assert parse_rules([{"pattern": "x", "category": "Другое"}]) == [("x", None, "Другое")]
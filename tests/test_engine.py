@@ -0,0 +1,178 @@
+import random
+from datetime import date
+
+import pytest
+
+import budget_engine
+from budget_engine import BudgetEngine
+from budget_sqlite import SQLiteEngine
+from budget_store import RecordStore
+
+INCOME_CATEGORIES = ["Зарплата", "Подарки", "Другое"]
+EXPENSE_CATEGORIES = ["Еда", "Кафе", "Такси", "Дом"]
+FIRST_DAY = 739000
+ALL_SECTIONS = {"totals", "categories", "funding", "goals", "plan", "limits", "text"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def engine(request, tmp_path):
+    if request.param == "memory":
+        yield BudgetEngine()
+        return
+    engine = SQLiteEngine(str(tmp_path / "ledger.db"))
+    yield engine
+    engine.close()
+
+
+def random_record(rnd, kind):
+    categories = INCOME_CATEGORIES if kind == "incomes" else EXPENSE_CATEGORIES
+    return rnd.randint(1, 100000), rnd.choice(categories), FIRST_DAY + rnd.randint(0, 300)
+
+
+def random_step(engine, rnd):
+    kind = rnd.choice(["incomes", "expenses"])
+    categories = INCOME_CATEGORIES if kind == "incomes" else EXPENSE_CATEGORIES
+    count = len(engine.records(kind))
+    op = rnd.randrange(7)
+    if op == 0:
+        engine.add(kind, *random_record(rnd, kind))
+    elif op == 1:
+        engine.add_many(kind, [random_record(rnd, kind) for _ in range(rnd.randint(1, 50))])
+    elif op == 2 and count:
+        engine.edit(kind, rnd.randrange(count), *random_record(rnd, kind))
+    elif op == 3 and count:
+        engine.delete(kind, rnd.sample(range(count), rnd.randint(1, min(count, 40))))
+    elif op == 4 and count:
+        engine.recategorize(kind, rnd.sample(range(count), rnd.randint(1, min(count, 40))), rnd.choice(categories))
+    elif op == 5:
+        engine.move_category(kind, rnd.choice(categories), rnd.choice(categories))
+    else:
+        # Импорт: суммы в файле — в рублях
+        engine.load_dict({kind: [[rnd.randint(1, 10 ** 6) / 100, random_record(rnd, kind)[1]]
+                                 for _ in range(rnd.randint(0, 30))] for kind in ("incomes", "expenses")})
+
+
+def test_running_totals_match_recount(engine):
+    rnd = random.Random(7)
+    for _ in range(300):
+        random_step(engine, rnd)
+        assert engine.verify_totals() == []
+    engine.rebuild_totals()
+    assert engine.verify_totals() == []
+
+
+
+def test_sqlite_ledger_keeps_goal_deadlines(tmp_path):
+    engine = SQLiteEngine(str(tmp_path / "ledger.db"))
+    engine.set_savings_goals({"Отпуск": {"target": 100000, "deadline_str": "01.06.2030", "saved": 0}})
+    engine.close()
+    engine = SQLiteEngine(str(tmp_path / "ledger.db"))
+    try:
+        assert engine.goal_progress()[0]["days_left"] is not None
+        assert engine.goal_plan()["goals"][0]["deadline"] == date(2030, 6, 1).toordinal()
+    finally:
+        engine.close()
+
+def test_sqlite_inserts_keep_ids_bounded():
+    engine = SQLiteEngine(":memory:")
+    memory = BudgetEngine()
+    for target in (engine, memory):
+        target.add_many("incomes", [(i, "Зарплата", FIRST_DAY) for i in range(1, 4)])
+        target.add_many("expenses", [(i, "Еда", FIRST_DAY) for i in range(1, 4)])
+    # Каждая вставка между соседями, идущими подряд, требует перенумерации id
+    for i in range(100):
+        for target in (engine, memory):
+            target.insert_many("expenses", [1, 3], [(1000 + i, "Кафе", FIRST_DAY), (2000 + i, "Дом", FIRST_DAY)])
+    assert [tuple(r) for r in engine.expenses] == [tuple(r) for r in memory.expenses]
+    assert [tuple(r) for r in engine.incomes] == [tuple(r) for r in memory.incomes]
+    rows = len(engine.incomes) + len(engine.expenses)
+    assert engine.conn.execute("SELECT MAX(id) FROM entries").fetchone()[0] <= rows * 1024
+    assert list(engine.expenses.rowids) == [row[0] for row in engine.conn.execute(
+        "SELECT id FROM entries WHERE kind = 'expenses' ORDER BY id")]
+    engine.close()
+
+
+# --- кэш разделов отчёта ---
+
+def filled_engine():
+    engine = BudgetEngine()
+    engine.add_many("incomes", [(500000, "Зарплата", FIRST_DAY), (20000, "Подарки", FIRST_DAY + 40)])
+    engine.add_many("expenses", [(30000, "Кафе", FIRST_DAY + 1), (1500, "Еда", FIRST_DAY + 50)])
+    engine.set_limits({"Кафе": 25000})
+    engine.set_savings_goals({"Отпуск": {"target": 1000000, "deadline_str": "01.06.2030", "saved": 2500}})
+    engine.format_report()
+    return engine
+
+
+def fresh_report(engine):
+    engine._report_cache.clear()
+    return engine.report()
+
+
+@pytest.mark.parametrize("change, kept", [
+    (lambda e: e.add("incomes", 100, "Другое", FIRST_DAY), {"goals", "limits"}),
+    (lambda e: e.add("expenses", 100, "Кафе", FIRST_DAY), {"goals"}),
+    (lambda e: e.add_many("expenses", [(100, "Еда", FIRST_DAY)]), {"goals"}),
+    (lambda e: e.edit("incomes", 0, 100, "Другое"), {"goals", "limits"}),
+    (lambda e: e.delete("expenses", [0]), {"goals"}),
+    (lambda e: e.recategorize("expenses", [1], "Кафе"), {"goals"}),
+    (lambda e: e.set_limits({"Еда": 100}), ALL_SECTIONS - {"limits", "text"}),
+    (lambda e: e.set_savings_goals({}), ALL_SECTIONS - {"goals", "plan", "text"}),
+    (lambda e: e.replace_all(RecordStore(), RecordStore(), {}, {}), set()),
+    (lambda e: e.set_period((FIRST_DAY, FIRST_DAY + 30)), set()),
+    (lambda e: e.set_period(None), ALL_SECTIONS),
+])
+def test_change_drops_only_affected_sections(change, kept):
+    engine = filled_engine()
+    assert set(engine._report_cache) == ALL_SECTIONS
+    change(engine)
+    assert set(engine._report_cache) == kept
+    assert engine.report() == fresh_report(engine)
+
+
+def test_cached_report_matches_fresh_after_each_change():
+    engine = filled_engine()
+    rnd = random.Random(3)
+    for _ in range(60):
+        random_step(engine, rnd)
+        if rnd.random() < 0.2:
+            engine.set_period(rnd.choice([None, (FIRST_DAY, FIRST_DAY + 100)]))
+        text = engine.format_report()
+        assert engine.cached_report_text() == text
+        report = engine.report()
+        assert report == fresh_report(engine)
+        assert engine.format_report() == text
+
+
+@pytest.mark.parametrize("make_engine", [BudgetEngine, lambda: SQLiteEngine(":memory:")])
+def test_report_for_other_period_keeps_cache(make_engine):
+    engine = make_engine()
+    engine.add_many("expenses", [(30000, "Кафе", FIRST_DAY + 1), (1500, "Еда", FIRST_DAY + 50)])
+    engine.set_limits({"Кафе": 25000})
+    period = (FIRST_DAY + 10, FIRST_DAY + 100)
+    report = engine.report(period=period)
+    # Разделы за другой период в кэш не попадают
+    assert engine.period is None
+    assert not engine._report_cache.keys() & {"totals", "categories", "limits"}
+    assert engine.limit_warnings(period=period) == []
+    engine.set_period(period)
+    assert report == engine.report()
+
+
+def test_date_rollover_rebuilds_dated_sections(monkeypatch):
+    engine = filled_engine()
+    cache = dict(engine._report_cache)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.fromordinal(date.today().toordinal() + 1)
+
+    monkeypatch.setattr(budget_engine, "date", Tomorrow)
+    assert engine.cached_report_text() is None
+    engine.format_report()
+    # Разделы без даты в ключе не пересчитываются
+    for section in ("totals", "categories", "limits"):
+        assert engine._report_cache[section] is cache[section]
+    for section in ("goals", "plan", "funding", "text"):
+        assert engine._report_cache[section][0] == Tomorrow.today()
@@ -0,0 +1,102 @@
+import math
+
+from budget_goals import DAYS_PER_MONTH, plan_goals, required_rates, sweep_incomes
+
+TODAY = 739000
+
+
+def goals_by_name(plan):
+    return {goal["name"]: goal for goal in plan["goals"]}
+
+
+def test_required_rates_round_up():
+    assert required_rates(1000, 10) == (100, math.ceil(1000 * DAYS_PER_MONTH / 10))
+    assert required_rates(1001, 10)[0] == 101
+    assert required_rates(0, 10) == (0, 0)
+    assert required_rates(-5, 10) == (0, 0)
+    # Срок прошёл или не задан — взнос не определён
+    assert required_rates(1000, 0) == (None, None)
+    assert required_rates(1000, None) == (None, None)
+
+
+def test_feasible_plan_and_completion_dates():
+    items = [("Отпуск", 30000, 0, TODAY + 30), ("Ноутбук", 10000, 4000, TODAY + 10)]
+    plan = plan_goals(items, TODAY, available=0, daily_rate=1500)
+    assert plan["feasible"]
+    # Очередь по срокам: сначала Ноутбук (6000 к 10-му дню), затем Отпуск (ещё 30000 к 30-му)
+    assert [goal["name"] for goal in plan["goals"]] == ["Ноутбук", "Отпуск"]
+    goals = goals_by_name(plan)
+    assert goals["Ноутбук"]["remaining"] == 6000
+    assert goals["Ноутбук"]["daily"] == 600
+    assert goals["Ноутбук"]["completion"] == TODAY + 4
+    assert goals["Отпуск"]["completion"] == TODAY + 24
+    assert plan["required_daily"] == 1200
+    assert plan["required_monthly"] == math.ceil(36000 * DAYS_PER_MONTH / 30)
+
+
+def test_required_monthly_comes_from_exact_need():
+    # 1000 коп. за 3 дня: 334 коп. в день, но в месяц нужно 10146, а не 334 * 30.4375
+    plan = plan_goals([("Подарок", 1000, 0, TODAY + 3)], TODAY)
+    assert plan["required_daily"] == 334
+    assert plan["required_monthly"] == required_rates(1000, 3)[1] == 10146
+
+def test_infeasible_when_income_is_too_low():
+    items = [("Отпуск", 30000, 0, TODAY + 30)]
+    plan = plan_goals(items, TODAY, available=0, daily_rate=500)
+    assert not plan["feasible"]
+    assert goals_by_name(plan)["Отпуск"]["completion"] == TODAY + 60
+    assert plan["required_daily"] == 1000
+    # Без дохода срок выполнения не прогнозируется
+    plan = plan_goals(items, TODAY, available=0, daily_rate=0)
+    assert goals_by_name(plan)["Отпуск"]["completion"] is None
+    assert not plan["feasible"]
+
+
+def test_short_funds_go_to_the_nearest_deadline_first():
+    items = [("Поздняя", 5000, 0, TODAY + 100), ("Без срока", 5000, 0, None), ("Ранняя", 3000, 1000, TODAY + 5)]
+    plan = plan_goals(items, TODAY, available=4000, daily_rate=0)
+    assert [goal["name"] for goal in plan["goals"]] == ["Ранняя", "Поздняя", "Без срока"]
+    goals = goals_by_name(plan)
+    assert goals["Ранняя"]["allocated"] == 2000
+    assert goals["Поздняя"]["allocated"] == 2000
+    assert goals["Без срока"]["allocated"] == 0
+    assert plan["unallocated"] == 0
+    # Ранняя закрывается из остатка сегодня
+    assert goals["Ранняя"]["completion"] == TODAY
+    assert goals["Ранняя"]["feasible"]
+    assert not goals["Поздняя"]["feasible"]
+
+
+def test_past_deadline_and_reached_goals():
+    items = [("Просрочена", 5000, 0, TODAY - 3), ("Собрана", 1000, 1500, TODAY + 10)]
+    plan = plan_goals(items, TODAY, available=0, daily_rate=100)
+    goals = goals_by_name(plan)
+    assert goals["Собрана"]["remaining"] == 0
+    assert goals["Собрана"]["daily"] == 0
+    assert goals["Собрана"]["completion"] is None
+    assert goals["Собрана"]["feasible"]
+    assert goals["Просрочена"]["days_left"] == -3
+    assert goals["Просрочена"]["daily"] is None
+    assert not goals["Просрочена"]["feasible"]
+    # Нужный доход не определён, если срок цели уже прошёл
+    assert plan["required_daily"] is None
+    assert plan["required_monthly"] is None
+    # Просроченную цель можно закрыть сегодня из свободного остатка
+    plan = plan_goals(items, TODAY, available=5000, daily_rate=0)
+    assert goals_by_name(plan)["Просрочена"]["feasible"]
+    assert plan["feasible"]
+
+
+def test_sweep_matches_plan_feasibility():
+    items = [("Отпуск", 30000, 0, TODAY + 30), ("Ноутбук", 10000, 4000, TODAY + 10), ("Машина", 10 ** 7, 0, None)]
+    incomes = [0, 10000, 20000, 30000, 36500, 40000, 100000]
+    rows = sweep_incomes(items, TODAY, 0, incomes)
+    assert [row["monthly_income"] for row in rows] == incomes
+    assert all(row["dated"] == 2 for row in rows)
+    for row in rows:
+        plan = plan_goals(items, TODAY, 0, row["monthly_income"] / DAYS_PER_MONTH)
+        dated = [goal for goal in plan["goals"] if goal["deadline"] is not None]
+        assert row["funded"] == sum(goal["feasible"] for goal in dated)
+        assert row["feasible"] == all(goal["feasible"] for goal in dated)
+    assert rows[0]["funded"] == 0
+    assert rows[-1]["feasible"]
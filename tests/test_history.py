@@ -0,0 +1,169 @@
+import random
+
+import pytest
+
+from budget_engine import BudgetEngine
+from budget_history import History
+from budget_sqlite import SQLiteEngine
+from budget_store import RecordStore
+
+CATEGORIES = ["Еда", "Кафе", "Такси", "Дом"]
+FIRST_DAY = 739000
+
+
+def snapshot(engine):
+    return ([tuple(r) for r in engine.incomes], [tuple(r) for r in engine.expenses], dict(engine.limits),
+            {name: dict(info) for name, info in engine.savings_goals.items()},
+            {kind: engine.category_totals(kind) for kind in ("incomes", "expenses")})
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def engine(request, tmp_path):
+    if request.param == "memory":
+        yield BudgetEngine()
+        return
+    engine = SQLiteEngine(str(tmp_path / "ledger.db"))
+    yield engine
+    engine.close()
+
+
+def random_record(rnd):
+    return rnd.randint(1, 100000), rnd.choice(CATEGORIES), FIRST_DAY + rnd.randint(0, 300)
+
+
+def mutate(engine, rnd):
+    # Одно случайное изменение; False — изменения не было
+    kind = rnd.choice(["incomes", "expenses"])
+    count = len(engine.records(kind))
+    op = rnd.randrange(8)
+    if op == 0:
+        engine.add(kind, *random_record(rnd))
+    elif op == 1:
+        engine.add_many(kind, [random_record(rnd) for _ in range(rnd.randint(1, 60))])
+    elif op == 2 and count:
+        engine.delete(kind, rnd.sample(range(count), rnd.randint(1, min(count, 50))))
+    elif op == 3 and count:
+        engine.edit(kind, rnd.randrange(count), *random_record(rnd))
+    elif op == 4 and count:
+        engine.recategorize(kind, rnd.sample(range(count), rnd.randint(1, min(count, 40))), rnd.choice(CATEGORIES))
+    elif op == 5:
+        engine.set_limits({category: rnd.randint(1, 10 ** 6) for category in rnd.sample(CATEGORIES, 2)})
+    elif op == 6:
+        engine.set_savings_goals({"Отпуск": {"target": rnd.randint(1, 10 ** 6), "deadline_str": "01.01.2030",
+                                             "saved": rnd.randint(0, 1000)}})
+    elif op == 7:
+        engine.replace_all(RecordStore([random_record(rnd) for _ in range(rnd.randint(0, 40))]),
+                           RecordStore([random_record(rnd) for _ in range(rnd.randint(0, 40))]), {"Еда": 100}, {})
+    else:
+        return False
+    return True
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_undo_redo_restores_every_state(engine, seed):
+    rnd = random.Random(seed)
+    engine.add_many("expenses", [random_record(rnd) for _ in range(200)])
+    history = History(engine)
+    states = [snapshot(engine)]
+    while len(states) < 40:
+        if mutate(engine, rnd):
+            states.append(snapshot(engine))
+    assert len(history.undo_steps) == len(states) - 1
+
+    for state in reversed(states[:-1]):
+        assert history.undo() is not None
+        assert snapshot(engine) == state
+    assert history.undo() is None
+    for state in states[1:]:
+        assert history.redo() is not None
+        assert snapshot(engine) == state
+    assert history.redo() is None
+
+
+def test_undo_across_reset_keeps_replaced_data(engine):
+    engine.add_many("incomes", [(100, "Еда", FIRST_DAY), (200, "Кафе", FIRST_DAY + 1)])
+    engine.set_limits({"Еда": 500})
+    history = History(engine)
+    before = snapshot(engine)
+    engine.replace_all(RecordStore([(1, "Дом", FIRST_DAY)]), RecordStore(), {}, {})
+    engine.delete("incomes", [0])
+    engine.add("expenses", 7, "Такси", FIRST_DAY)
+    after = snapshot(engine)
+
+    for _ in range(3):
+        history.undo()
+    assert snapshot(engine) == before
+    for _ in range(3):
+        history.redo()
+    assert snapshot(engine) == after
+
+
+def test_new_change_clears_redo(engine):
+    history = History(engine)
+    engine.add("incomes", 100, "Еда", FIRST_DAY)
+    engine.add("incomes", 200, "Еда", FIRST_DAY)
+    history.undo()
+    assert history.redo_label() is not None
+    engine.add("incomes", 300, "Кафе", FIRST_DAY)
+    assert history.redo_label() is None
+    assert [r[0] for r in engine.incomes] == [100, 300]
+
+
+def test_memory_cap_evicts_oldest_steps():
+    engine = BudgetEngine()
+    history = History(engine, limit_bytes=5000)
+    for i in range(100):
+        engine.add_many("incomes", [(i + 1, "Еда", FIRST_DAY)] * 20)
+    assert history.nbytes <= 5000
+    assert 0 < len(history.undo_steps) < 100
+    kept = len(history.undo_steps)
+    while history.undo() is not None:
+        pass
+    # Отменяются только последние шаги, ранние записи остаются
+    assert len(engine.incomes) == (100 - kept) * 20
+    assert engine.incomes[len(engine.incomes) - 1][0] == 100 - kept
+
+
+def test_large_import_keeps_history():
+    engine = BudgetEngine()
+    history = History(engine, limit_bytes=50000)
+    for i in range(3):
+        engine.add("incomes", i + 1, "Еда", FIRST_DAY)
+    imported = RecordStore([(5, "Дом", FIRST_DAY)] * 10000)
+    assert imported.nbytes() > history.limit_bytes
+    # Новые данные держит сам движок, в истории остаются только прежние три записи
+    engine.replace_all(imported, RecordStore(), {}, {})
+    assert len(history.undo_steps) == 4
+    assert history.nbytes < 5000
+    history.undo()
+    assert [r[0] for r in engine.incomes] == [1, 2, 3]
+    history.redo()
+    assert engine.incomes is imported
+
+
+def test_step_larger_than_cap_is_not_kept():
+    engine = BudgetEngine()
+    history = History(engine, limit_bytes=100)
+    engine.add_many("incomes", [(1, "Еда", FIRST_DAY)] * 1000)
+    assert not history.undo_steps
+    assert history.nbytes == 0
+
+
+def test_nested_and_unchanged_calls_are_one_step():
+    engine = BudgetEngine()
+    engine.add_many("expenses", [(1, "Еда", FIRST_DAY), (2, "Кафе", FIRST_DAY), (3, "Еда", FIRST_DAY)])
+    history = History(engine)
+    engine.move_category("expenses", "Еда", "Дом")
+    engine.set_limits({})
+    assert len(history.undo_steps) == 1
+    history.undo()
+    assert [r[1] for r in engine.expenses] == ["Еда", "Кафе", "Еда"]
+
+
+def test_detach_restores_engine_methods():
+    engine = BudgetEngine()
+    history = History(engine)
+    history.detach()
+    engine.add("incomes", 1, "Еда", FIRST_DAY)
+    assert not history.undo_steps
+    assert "add" not in vars(engine)
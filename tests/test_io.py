@@ -0,0 +1,65 @@
+import json
+import random
+
+import pytest
+
+import budget_io
+import budget_store
+from budget_engine import BudgetEngine
+from budget_io import (ValidationError, ValidationReport, _kopecks_or_none, kopecks_column, parse_day,
+                       parse_records, read_ledger)
+from budget_store import NO_DATE
+
+FIRST_DAY = 739000
+
+
+@pytest.fixture
+def io_numpy(numpy_mode, monkeypatch):
+    monkeypatch.setattr(budget_io, "np", budget_store.np)
+    return numpy_mode
+
+
+def test_kopecks_column_matches_exact_conversion(io_numpy):
+    rnd = random.Random(11)
+    values = [rnd.randint(0, 10 ** 6) / 100 for _ in range(500)] + [rnd.randint(0, 10 ** 6) for _ in range(100)]
+    # Больше двух знаков, на границе и за границей точности float64, огромные целые
+    values += [1.005, 2.675, 0.125, 90071992547409.91, 90071992547409, 10 ** 15 + 0.07, 10 ** 17 + 1, 2 ** 70,
+               -0.01, 1e300, float("nan"), float("inf")]
+    rnd.shuffle(values)
+    assert kopecks_column(values) == [_kopecks_or_none(value) for value in values]
+    assert kopecks_column([10 ** 17 + 1, 0.5]) == [10 ** 19 + 100, 50]
+    assert kopecks_column([10 ** 400]) == [10 ** 402]
+
+
+def test_report_positions_span_batches(monkeypatch):
+    monkeypatch.setattr(budget_io, "VALIDATE_BATCH", 4)
+    items = [[100, "Еда", "01.03.2024"] for _ in range(20)]
+    items[1] = [100]
+    items[5] = ["много", "Еда"]
+    items[6] = [-5, "Еда"]
+    items[9] = [100, "Еда", "31.02.2024"]
+    items[13] = [7, "Непонятно"]
+    items[18] = "не запись"
+    report = ValidationReport()
+    store = parse_records(items, "expenses", report, categories=["Еда"])
+    assert report.rejected == {"expenses": {"shape": [1, 18], "amount": [5], "negative": [6], "date": [9]}}
+    assert report.warnings == {"expenses": {"category": [13]}}
+    assert report.accepted["expenses"] == len(store) == 15
+    assert tuple(store[9]) == (700, "Непонятно", NO_DATE)
+    assert tuple(store[0]) == (10000, "Еда", parse_day("01.03.2024"))
+    assert report.to_dict(max_positions=1)["rejected"]["expenses"]["shape"] == {"count": 2, "positions": [1]}
+
+
+def test_strict_aborts_import(tmp_path):
+    engine = BudgetEngine()
+    engine.add("expenses", 500, "Кафе", FIRST_DAY)
+    path = tmp_path / "ledger.json"
+    path.write_text(json.dumps({"expenses": [[1, "Кафе"], [2, "Непонятно"]]}, ensure_ascii=False), encoding="utf-8")
+    assert read_ledger(str(path), categories=engine.known_categories())["validation"].warnings
+    with pytest.raises(ValidationError) as error:
+        engine.import_file(str(path), strict=True)
+    assert error.value.report.warnings == {"expenses": {"category": [1]}}
+    # Данные движка не заменяются
+    assert list(engine.expenses) == [(500, "Кафе", FIRST_DAY)]
+    with pytest.raises(ValidationError):
+        parse_records([[1, "Кафе"], ["x", "Кафе"]], "expenses", strict=True)
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+from budget_history import History
+from budget_journal import open_ledger
+
+FIRST_DAY = 739000
+
+
+def snapshot(engine):
+    return (list(engine.incomes), list(engine.expenses), dict(engine.limits),
+            {name: dict(info) for name, info in engine.savings_goals.items()})
+
+
+def crash(journal):
+    # Сбой: файл журнала закрыт без сжатия и без записи снимка
+    journal.f.close()
+    journal.f = None
+
+
+def make_changes(engine):
+    engine.add("incomes", 500000, "Зарплата", FIRST_DAY)
+    engine.add_many("expenses", [(1050, "Еда", FIRST_DAY + 1), (99, "Кафе", FIRST_DAY + 2), (700, "Еда", FIRST_DAY)])
+    engine.edit("expenses", 1, 150, "Такси", FIRST_DAY + 3)
+    engine.recategorize("expenses", [0, 2], "Кафе")
+    engine.delete("expenses", [1])
+    engine.set_limits({"Кафе": 2000})
+    engine.set_savings_goals({"Отпуск": {"target": 100000, "deadline_str": "01.06.2030", "saved": 2500}})
+
+
+@pytest.fixture(params=["ledger.json", "ledger.budget"])
+def ledger_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_replay_after_crash(ledger_path):
+    engine, journal = open_ledger(ledger_path, sync=False)
+    make_changes(engine)
+    expected = snapshot(engine)
+    crash(journal)
+    assert not os.path.exists(ledger_path)
+
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    assert journal.pending == 7
+    journal.close()
+
+
+def test_torn_last_line_is_dropped(ledger_path):
+    engine, journal = open_ledger(ledger_path, sync=False)
+    make_changes(engine)
+    expected = snapshot(engine)
+    crash(journal)
+    size = os.path.getsize(ledger_path + ".journal")
+    with open(ledger_path + ".journal", "ab") as f:
+        f.write(b'{"seq":8,"op":"add","kind":"incomes","val')
+
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    assert os.path.getsize(ledger_path + ".journal") == size
+    engine.add("incomes", 1, "Подарки", FIRST_DAY)
+    expected = snapshot(engine)
+    crash(journal)
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    journal.close()
+
+
+def test_replay_after_compaction(ledger_path):
+    engine, journal = open_ledger(ledger_path, compact_every=3, sync=False)
+    make_changes(engine)
+    engine.add("incomes", 1, "Подарки", FIRST_DAY)
+    expected = snapshot(engine)
+    # 8 изменений при сжатии каждые 3: в снимке первые 6, в журнале два последних
+    assert journal.pending == 2
+    crash(journal)
+
+    engine, journal = open_ledger(ledger_path, compact_every=3, sync=False)
+    assert snapshot(engine) == expected
+    assert journal.seq == 8
+    journal.close()
+
+
+def test_crash_between_snapshot_and_truncate(ledger_path):
+    # Снимок уже записан, а журнал не усечён: записи, вошедшие в снимок, не проигрываются повторно
+    engine, journal = open_ledger(ledger_path, sync=False)
+    make_changes(engine)
+    expected = snapshot(engine)
+    with open(ledger_path + ".journal", "rb") as f:
+        lines = f.read()
+    journal.compact()
+    crash(journal)
+    with open(ledger_path + ".journal", "wb") as f:
+        f.write(lines)
+
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    assert journal.pending == 0
+    journal.close()
+
+
+def test_reset_writes_snapshot(ledger_path):
+    # Замена данных пишет снимок вместо записи в журнал
+    engine, journal = open_ledger(ledger_path, sync=False)
+    make_changes(engine)
+    engine.clear()
+    assert os.path.getsize(ledger_path + ".journal") == 0
+    engine.add("expenses", 3, "Дом", FIRST_DAY)
+    expected = snapshot(engine)
+    crash(journal)
+
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    assert journal.pending == 1
+    journal.close()
+
+
+def test_reset_and_undo_are_replayed(ledger_path):
+    engine, journal = open_ledger(ledger_path, sync=False)
+    history = History(engine)
+    make_changes(engine)
+    # Замена данных пишет снимок, отмена удаления после неё — операцию insert в журнал
+    engine.clear()
+    history.undo()
+    engine.delete("expenses", [0, 1])
+    history.undo()
+    expected = snapshot(engine)
+    crash(journal)
+    with open(ledger_path + ".journal", encoding="utf-8") as f:
+        assert [line.split('"op":"')[1].split('"')[0] for line in f] == ["delete", "insert"]
+
+    engine, journal = open_ledger(ledger_path, sync=False)
+    assert snapshot(engine) == expected
+    journal.close()
@@ -0,0 +1,63 @@
+import pytest
+
+from budget_money import format_money, parse_money, to_kopecks, to_rubles
+
+
+@pytest.mark.parametrize("text, kopecks", [
+    ("0", 0),
+    ("12", 1200),
+    ("12.5", 1250),
+    ("12,05", 1205),
+    ("  7.10 ", 710),
+    ("0.01", 1),
+    ("-3.40", -340),
+    ("+3", 300),
+    ("12.", 1200),
+    ("123456789012.34", 12345678901234),
+])
+def test_parse_money(text, kopecks):
+    assert parse_money(text) == kopecks
+
+
+@pytest.mark.parametrize("text", ["", "abc", "1.234", "1,2,3", "1 000", ".5", "1e3", "--1"])
+def test_parse_money_rejects(text):
+    with pytest.raises(ValueError):
+        parse_money(text)
+
+
+@pytest.mark.parametrize("value, kopecks", [
+    (0, 0),
+    (15, 1500),
+    (0.1, 10),
+    (0.29, 29),
+    (1.005, 101),
+    (2.675, 268),
+    (19.99, 1999),
+    (1e9 + 0.07, 100000000007),
+    ("4,20", 420),
+])
+def test_to_kopecks(value, kopecks):
+    assert to_kopecks(value) == kopecks
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf")])
+def test_to_kopecks_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        to_kopecks(value)
+
+
+def test_rubles_round_trip():
+    for kopecks in list(range(-300, 300)) + [10 ** 12 + 1, 123456789]:
+        assert to_kopecks(to_rubles(kopecks)) == kopecks
+        assert parse_money(format_money(kopecks)) == kopecks
+
+
+def test_sum_is_exact():
+    # Десять расходов по 0,10 руб. — ровно 1,00 руб., без погрешности float
+    assert sum(to_kopecks(0.1) for _ in range(10)) == to_kopecks(1.0)
+
+
+@pytest.mark.parametrize("kopecks, text", [(0, "0.00"), (5, "0.05"), (1250, "12.50"), (-1, "-0.01"),
+                                           (-12345, "-123.45")])
+def test_format_money(kopecks, text):
+    assert format_money(kopecks) == text
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from budget_engine import BudgetEngine
+from budget_io import parse_day
+from budget_server import BudgetServer
+
+PERIOD = "01.01.2020:31.12.2020"
+
+
+def make_server():
+    engine = BudgetEngine()
+    engine.add_many("expenses", [(10000, "Кафе", parse_day("10.05.2020")), (50000, "Кафе", parse_day("10.05.2021"))])
+    engine.set_limits({"Кафе": 30000})
+    return engine, BudgetServer(engine)
+
+
+def get(server, path, **query):
+    return server.dispatch("GET", path, {key: [value] for key, value in query.items()}, b"", None)
+
+
+def test_period_request_does_not_change_concurrent_reads():
+    engine, server = make_server()
+    # Отчёт за период останавливается в пуле потоков, пока идут чтения за всё время
+    started, release = threading.Event(), threading.Event()
+    report = engine.report
+
+    def slow_report(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return report(*args, **kwargs)
+
+    engine.report = slow_report
+
+    async def scenario():
+        period_request = asyncio.ensure_future(get(server, "/report", period=PERIOD))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        totals = await get(server, "/totals")
+        warnings = await get(server, "/limits/warnings")
+        release.set()
+        return totals, warnings, await period_request
+
+    (status, totals), (_, warnings), (_, period_report) = asyncio.run(scenario())
+    assert status == 200
+    assert totals["totals"]["expenses"] == {"Кафе": 600.0}
+    assert len(warnings["warnings"]) == 1
+    assert period_report["report"]["expense_by_category"] == {"Кафе": 100.0}
+    assert period_report["report"]["limit_warnings"] == []
+    assert engine.period is None
+
+
+def test_period_reads_match_selected_period():
+    engine, server = make_server()
+
+    async def scenario():
+        return [(await get(server, path, period=PERIOD))[1] for path in ("/totals", "/limits/warnings", "/report/text")]
+
+    totals, warnings, text = asyncio.run(scenario())
+    engine.set_period((parse_day("01.01.2020"), parse_day("31.12.2020")))
+    assert totals["totals"]["expenses"] == {"Кафе": 100.0}
+    assert warnings["warnings"] == engine.limit_warnings() == []
+    assert text["text"] == engine.format_report()
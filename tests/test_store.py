@@ -0,0 +1,160 @@
+import random
+
+from budget_store import NO_DATE, RecordStore
+
+CATEGORIES = ["Еда", "Кафе", "Такси", "Дом"]
+FIRST_DAY = 739000
+
+
+def make_records(count, seed=1):
+    rnd = random.Random(seed)
+    return [(rnd.randint(1, 500000), rnd.choice(CATEGORIES), rnd.choice([NO_DATE, FIRST_DAY + rnd.randint(0, 400)]))
+            for _ in range(count)]
+
+
+def test_columns_round_trip(numpy_mode):
+    records = make_records(200)
+    store = RecordStore(records)
+    assert len(store) == 200
+    assert list(store) == records
+    assert [store[i] for i in range(200)] == records
+    assert store.rows(50, 60) == records[50:60]
+    store[3] = (150, "Новая", FIRST_DAY)
+    assert store[3] == (150, "Новая", FIRST_DAY)
+    assert store.category_names[-1] == "Новая"
+    assert store.nbytes() == 16 * len(store)
+
+
+def test_delete_many_few_and_bulk(numpy_mode):
+    # До 32 позиций записи удаляются по одной, больше — одним проходом по колонкам
+    for count in (5, 500):
+        records = make_records(2000, seed=count)
+        store = RecordStore(records)
+        removed = set(random.Random(count).sample(range(len(records)), count))
+        rows = store.delete_many(removed)
+        assert sorted(rows) == sorted((records[i][0], records[i][1]) for i in removed)
+        assert list(store) == [r for i, r in enumerate(records) if i not in removed]
+
+
+def test_category_sums_keep_first_seen_order(numpy_mode):
+    records = make_records(500)
+    sums, counts = RecordStore(records).category_sums()
+    order = list(dict.fromkeys(category for _, category, _ in records))
+    assert list(sums) == order
+    assert list(counts) == order
+    for category in order:
+        values = [value for value, cat, _ in records if cat == category]
+        assert counts[category] == len(values)
+        assert sums[category] == sum(values)
+
+
+def brute_range(records, start, end):
+    return [i for i, (_, _, day) in enumerate(records) if start <= day <= end]
+
+
+def test_date_index_is_rebuilt_after_changes(numpy_mode):
+    records = make_records(1000)
+    store = RecordStore(records)
+    period = (FIRST_DAY + 100, FIRST_DAY + 200)
+    assert sorted(store.range_positions(*period)) == brute_range(records, *period)
+    assert store.date_span() == (min(d for _, _, d in records if d != NO_DATE), max(d for _, _, d in records))
+
+    # Изменения, нарушающие порядок, сбрасывают ленивый индекс
+    store.append(7, "Еда", FIRST_DAY + 150)
+    store[0] = (records[0][0], records[0][1], FIRST_DAY + 199)
+    store.delete_many([1, 2, 3])
+    expected = list(store)
+    assert sorted(store.range_positions(*period)) == brute_range(expected, *period)
+    assert store.total(period) == sum(expected[i][0] for i in brute_range(expected, *period))
+
+
+def test_category_sums_by_period(numpy_mode):
+    records = make_records(1500)
+    store = RecordStore(records)
+    period = (FIRST_DAY, FIRST_DAY + 120)
+    sums, counts = store.category_sums(period)
+    for category in CATEGORIES:
+        rows = [r for r in records if r[1] == category and period[0] <= r[2] <= period[1]]
+        assert sums.get(category, 0) == sum(r[0] for r in rows)
+        assert counts.get(category, 0) == len(rows)
+        assert store.category_sum(category, period) == sum(r[0] for r in rows)
+    assert store.category_sums()[0] == {c: sum(r[0] for r in records if r[1] == c)
+                                        for c in dict.fromkeys(r[1] for r in records)}
+
+
+def brute_query(records, categories=None, amount_range=None, period=None):
+    low, high = amount_range or (None, None)
+    return [i for i, (value, category, day) in enumerate(records)
+            if (categories is None or category in categories)
+            and (low is None or value >= low) and (high is None or value <= high)
+            and (period is None or period[0] <= day <= period[1])]
+
+
+QUERIES = [
+    {},
+    {"categories": ["Еда"]},
+    {"categories": ["Еда", "Нет такой"]},
+    {"categories": []},
+    {"amount_range": (1000, 50000)},
+    {"amount_range": (None, 20000)},
+    {"amount_range": (400000, None)},
+    {"period": (FIRST_DAY + 10, FIRST_DAY + 40)},
+    {"categories": ["Кафе", "Дом"], "amount_range": (100000, 300000), "period": (FIRST_DAY, FIRST_DAY + 300)},
+    {"categories": ["Такси"], "period": (FIRST_DAY + 500, FIRST_DAY + 600)},
+]
+
+
+def test_query_matches_linear_scan(numpy_mode):
+    records = make_records(3000)
+    store = RecordStore(records)
+    for query in QUERIES:
+        assert store.query(**query) == brute_query(records, **query), query
+
+
+def test_query_indexes_follow_changes(numpy_mode):
+    records = make_records(1000)
+    store = RecordStore(records)
+    query = {"categories": ["Еда"], "amount_range": (10000, 300000)}
+    assert store.query(**query) == brute_query(records, **query)
+    store.set_category([0, 1, 2], "Еда")
+    store[3] = (150000, "Еда", records[3][2])
+    store.delete_many(range(100, 200))
+    store.append(200000, "Еда", FIRST_DAY)
+    assert store.query(**query) == brute_query(list(store), **query)
+
+
+def test_sqlite_query_matches_store(tmp_path):
+    from budget_sqlite import SQLiteEngine
+
+    records = make_records(1000)
+    engine = SQLiteEngine(str(tmp_path / "ledger.db"))
+    engine.add_many("expenses", records)
+    try:
+        for query in QUERIES:
+            assert engine.expenses.query(**query) == brute_query(records, **query), query
+    finally:
+        engine.close()
+
+
+def test_insert_many_restores_deleted_rows(numpy_mode):
+    # До 32 позиций — вставка по одной, больше — слияние колонок (numpy или один проход)
+    for count in (3, 400):
+        records = make_records(2000, seed=count)
+        store = RecordStore(records)
+        positions = sorted(random.Random(count).sample(range(len(records)), count))
+        removed = store.select(positions)
+        assert list(removed) == [records[i] for i in positions]
+        store.delete_many(positions)
+        store.insert_many(positions, list(removed))
+        assert list(store) == records
+        assert store.query(categories=["Еда"]) == brute_query(records, categories=["Еда"])
+        assert sorted(store.range_positions(FIRST_DAY, FIRST_DAY + 50)) == brute_range(records, FIRST_DAY,
+                                                                                      FIRST_DAY + 50)
+
+
+def test_insert_many_new_category_and_tail(numpy_mode):
+    store = RecordStore(make_records(50))
+    store.insert_many([0, 51], [(1, "Новая", NO_DATE), (2, "Новая", FIRST_DAY)])
+    assert store[0] == (1, "Новая", NO_DATE)
+    assert store[51] == (2, "Новая", FIRST_DAY)
+    assert len(store) == 52